@@ -0,0 +1,291 @@
+"""
+Archive des journaux sources
+Conserve chaque journal converti une seule fois, sous son empreinte SHA-256
+(Documents/CSV-MAM/archives/objets), au lieu d'une copie complète par
+conversion. Le dossier d'export du jour reçoit un lien physique vers le
+journal archivé (même contenu en lecture seule, aucun octet recopié) ou, si
+le lien est impossible (volumes différents, partage réseau), une ligne du
+manifeste journaux-archives.csv.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import time
+from datetime import datetime
+
+TAILLE_BLOC_LECTURE = 1024 * 1024
+
+# Mode des journaux archivés : leur nom est leur empreinte, leur contenu ne doit plus changer
+LECTURE_SEULE = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+NOM_MANIFESTE = 'journaux-archives.csv'
+COLONNES_MANIFESTE = ['Heure', 'Fichier', 'Empreinte', 'Taille', 'Archive', 'Lien']
+
+
+def get_archive_path():
+    """
+    Obtient le chemin du dossier des journaux archivés
+    (Documents/CSV-MAM/archives).
+    """
+    dossier = os.path.join(os.path.expanduser("~"), "Documents", "CSV-MAM", "archives")
+    os.makedirs(dossier, exist_ok=True)
+    return dossier
+
+
+class ArchiveJournaux:
+    """
+    Stockage adressé par contenu des journaux sources.
+
+    L'empreinte du journal est calculée en le lisant, sans rien écrire : un
+    contenu déjà archivé n'est ni recopié ni relu dans l'archive (souvent sur
+    un partage réseau). Un contenu nouveau est copié dans un fichier
+    temporaire de l'archive, renommé ensuite sous son empreinte. Un index
+    (chemin, taille, date de modification) évite de relire un journal déjà
+    archivé.
+
+    Args:
+        dossier (str): Dossier de l'archive (par défaut : Documents/CSV-MAM/archives).
+    """
+
+    def __init__(self, dossier=None):
+        self.dossier = dossier or get_archive_path()
+        self.chemin_index = os.path.join(self.dossier, 'index.json')
+        os.makedirs(os.path.join(self.dossier, 'objets'), exist_ok=True)
+
+    def chemin_objet(self, empreinte, extension=''):
+        """
+        Returns:
+            str: Chemin du journal archivé d'empreinte donnée.
+        """
+        return os.path.join(self.dossier, 'objets', empreinte[:2], empreinte + extension.lower())
+
+    def _lire_index(self):
+        try:
+            with open(self.chemin_index, 'r', encoding='utf-8') as fichier:
+                return json.load(fichier)
+        except (OSError, ValueError):
+            return {}
+
+    def _ecrire_index(self, chemin_fichier, signature, empreinte):
+        # L'index n'est qu'un raccourci : une erreur d'écriture est ignorée
+        index = self._lire_index()
+        index[chemin_fichier] = [*signature, empreinte]
+        try:
+            descripteur, chemin_temporaire = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=self.dossier)
+        except OSError:
+            return
+        try:
+            with os.fdopen(descripteur, 'w', encoding='utf-8') as fichier:
+                json.dump(index, fichier)
+            os.replace(chemin_temporaire, self.chemin_index)
+        except OSError:
+            if os.path.exists(chemin_temporaire):
+                os.remove(chemin_temporaire)
+
+    @staticmethod
+    def empreinte_fichier(chemin):
+        """
+        Returns:
+            str: Empreinte SHA-256 du contenu d'un fichier, lu par blocs.
+        """
+        empreinte = hashlib.sha256()
+        with open(chemin, 'rb') as fichier:
+            while bloc := fichier.read(TAILLE_BLOC_LECTURE):
+                empreinte.update(bloc)
+        return empreinte.hexdigest()
+
+    def objet_intact(self, objet, empreinte):
+        """
+        Indique si un journal archivé peut être réutilisé sans être recopié.
+
+        Un journal archivé toujours en lecture seule n'a pas pu être modifié
+        sans que son mode change : il n'est pas relu. Un journal redevenu
+        modifiable est relu et vérifié par son empreinte : remis en lecture
+        seule s'il est intact, supprimé s'il a été altéré (il sera recopié).
+
+        Returns:
+            bool: True si le journal archivé existe et a le contenu attendu.
+        """
+        try:
+            mode = os.stat(objet).st_mode
+        except OSError:
+            return False
+        if not mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH):
+            return True
+        if self.empreinte_fichier(objet) != empreinte:
+            os.remove(objet)
+            return False
+        os.chmod(objet, LECTURE_SEULE)
+        return True
+
+    def _copier(self, chemin_fichier, extension):
+        # Copie dans un fichier temporaire de l'archive, empreinte calculée pendant l'écriture :
+        # l'exemplaire archivé correspond exactement au contenu copié
+        dossier_objets = os.path.join(self.dossier, 'objets')
+        descripteur, chemin_temporaire = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=dossier_objets)
+        try:
+            empreinte = hashlib.sha256()
+            with open(chemin_fichier, 'rb') as source, os.fdopen(descripteur, 'wb') as destination:
+                while bloc := source.read(TAILLE_BLOC_LECTURE):
+                    empreinte.update(bloc)
+                    destination.write(bloc)
+            empreinte = empreinte.hexdigest()
+
+            objet = self.chemin_objet(empreinte, extension)
+            nouveau = not os.path.exists(objet)
+            if self.objet_intact(objet, empreinte):
+                # Archivé entre-temps (journal modifié pendant la lecture, autre conversion)
+                os.remove(chemin_temporaire)
+            else:
+                os.makedirs(os.path.dirname(objet), exist_ok=True)
+                os.chmod(chemin_temporaire, LECTURE_SEULE)
+                try:
+                    os.replace(chemin_temporaire, objet)
+                except PermissionError:
+                    # Archivé au même instant par une autre conversion (Windows : exemplaire en lecture seule)
+                    if not os.path.exists(objet):
+                        raise
+                    os.chmod(chemin_temporaire, stat.S_IREAD | stat.S_IWRITE)
+                    os.remove(chemin_temporaire)
+        except BaseException:
+            if os.path.exists(chemin_temporaire):
+                os.chmod(chemin_temporaire, stat.S_IREAD | stat.S_IWRITE)
+                os.remove(chemin_temporaire)
+            raise
+        return empreinte, objet, nouveau
+
+    def archiver(self, chemin_fichier):
+        """
+        Archive un journal (une seule fois par contenu).
+
+        Les journaux archivés sont en lecture seule. Un journal inchangé depuis
+        son dernier archivage (index) dont l'exemplaire archivé est toujours en
+        lecture seule n'est pas relu. Sinon, le journal est lu une première
+        fois pour calculer son empreinte, sans rien écrire : il n'est copié
+        dans l'archive que si ce contenu n'y est pas encore (ou si
+        l'exemplaire archivé a été altéré, voir objet_intact).
+
+        Args:
+            chemin_fichier (str): Journal à archiver.
+
+        Returns:
+            dict: empreinte, taille, objet (chemin du journal archivé) et
+                nouveau (True si ce contenu n'était pas encore archivé).
+        """
+        chemin_fichier = os.path.abspath(chemin_fichier)
+        extension = os.path.splitext(chemin_fichier)[1]
+        informations = os.stat(chemin_fichier)
+        signature = [informations.st_size, informations.st_mtime_ns]
+
+        # Journal inchangé depuis son dernier archivage : ni le journal ni l'exemplaire archivé ne sont relus
+        connu = self._lire_index().get(chemin_fichier)
+        if connu and connu[:2] == signature:
+            objet = self.chemin_objet(connu[2], extension)
+            if self.objet_intact(objet, connu[2]):
+                return {'empreinte': connu[2], 'taille': informations.st_size, 'objet': objet, 'nouveau': False}
+
+        empreinte = self.empreinte_fichier(chemin_fichier)
+        objet = self.chemin_objet(empreinte, extension)
+        nouveau = not os.path.exists(objet)
+        if not self.objet_intact(objet, empreinte):
+            empreinte, objet, nouveau = self._copier(chemin_fichier, extension)
+
+        self._ecrire_index(chemin_fichier, signature, empreinte)
+        return {'empreinte': empreinte, 'taille': informations.st_size, 'objet': objet, 'nouveau': nouveau}
+
+    @staticmethod
+    def lier(objet, chemin_lien, empreinte):
+        """
+        Crée un lien physique vers un journal archivé dans le dossier d'export.
+
+        Le lien partage le contenu (et la lecture seule) du journal archivé :
+        pour le modifier, il faut l'enregistrer sous un autre nom. Si le nom
+        est déjà pris par une autre version du journal, celle-ci est conservée
+        et le lien prend le nom suivi du début de l'empreinte
+        (Journal-1a2b3c4d.xlsx).
+
+        Args:
+            objet (str): Journal archivé.
+            chemin_lien (str): Chemin souhaité pour le lien.
+            empreinte (str): Empreinte du journal archivé.
+
+        Returns:
+            str: Chemin du lien, ou None si le système de fichiers ne permet
+                pas le lien (volumes différents, partage réseau...).
+        """
+        racine, extension = os.path.splitext(chemin_lien)
+        for chemin in [chemin_lien, f"{racine}-{empreinte[:8]}{extension}"]:
+            if os.path.exists(chemin):
+                if os.path.samefile(objet, chemin):
+                    return chemin
+                continue
+            try:
+                os.link(objet, chemin)
+            except FileExistsError:
+                # Lien créé entre-temps par une autre conversion
+                if os.path.samefile(objet, chemin):
+                    return chemin
+            except OSError:
+                return None
+            else:
+                return chemin
+        return None
+
+    @staticmethod
+    def inscrire_manifeste(dossier_destination, entrees):
+        """
+        Ajoute des journaux archivés au manifeste du dossier d'export
+        (CSV ';', UTF-8 avec BOM, lisible par Excel).
+
+        Args:
+            dossier_destination (str): Dossier d'export.
+            entrees (list): Journaux archivés (voir archiver_journaux).
+
+        Returns:
+            str: Chemin du manifeste.
+        """
+        chemin = os.path.join(dossier_destination, NOM_MANIFESTE)
+        nouveau = not os.path.exists(chemin)
+        heure = datetime.now().strftime('%H:%M:%S')
+        with open(chemin, 'a', encoding='utf-8-sig' if nouveau else 'utf-8', newline='') as fichier:
+            writer = csv.writer(fichier, delimiter=';')
+            if nouveau:
+                writer.writerow(COLONNES_MANIFESTE)
+            for entree in entrees:
+                writer.writerow([heure, entree['fichier'], entree['empreinte'], entree['taille'], entree['objet'], entree['lien'] or ''])
+        return chemin
+
+
+def archiver_journaux(chemins_fichiers, dossier_destination, archive=None):
+    """
+    Archive les journaux convertis et les rattache au dossier d'export du
+    jour : lien physique sous le nom du journal si possible, et une ligne du
+    manifeste dans tous les cas.
+
+    Args:
+        chemins_fichiers (list): Journaux à archiver.
+        dossier_destination (str): Dossier d'export (csv-export/<date>).
+        archive (ArchiveJournaux): Archive (par défaut : Documents/CSV-MAM/archives).
+
+    Returns:
+        dict: journaux (fichier, empreinte, taille, objet, nouveau, lien),
+            manifeste (chemin) et duree (secondes).
+    """
+    debut = time.perf_counter()
+    archive = archive or ArchiveJournaux()
+    os.makedirs(dossier_destination, exist_ok=True)
+
+    entrees = []
+    for chemin_fichier in chemins_fichiers:
+        entree = archive.archiver(chemin_fichier)
+        chemin_lien = os.path.join(dossier_destination, os.path.basename(chemin_fichier))
+        entree['fichier'] = os.path.basename(chemin_fichier)
+        entree['lien'] = archive.lier(entree['objet'], chemin_lien, entree['empreinte'])
+        entrees.append(entree)
+
+    manifeste = archive.inscrire_manifeste(dossier_destination, entrees)
+    return {'journaux': entrees, 'manifeste': manifeste, 'duree': time.perf_counter() - debut}
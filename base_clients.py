@@ -0,0 +1,227 @@
+"""
+Base clients compilée
+Compile clients_siret.csv (modifiable par l'utilisateur) en une base SQLite
+indexée par code client, avec des colonnes texte explicites (les codes
+postaux et SIRET gardent leurs zéros en tête) et le code ISO du pays de
+chaque client déjà résolu. La base est recompilée automatiquement dès que
+clients_siret.csv ou codes_pays.csv change ; une conversion n'en lit que
+les clients présents dans le journal.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+
+# Colonnes de clients_siret.csv, dans l'ordre du fichier ('Cédant' est
+# facultative : vendeur cédant du client, voir traitement.cedants_clients)
+COLONNES_CLIENTS = ['Code', 'Nom', 'Voie', 'Complement', 'CP', 'Ville', 'Pays', 'SIRET', 'Raison sociale', 'Cédant']
+
+# Colonne ajoutée par la compilation : autres codes du fichier donnant la
+# même clé (ex: '012050' et '12050'), séparés par des virgules
+COLONNE_CONFLITS = 'Codes en conflit'
+
+# Version du format de la base : une nouvelle version force la recompilation
+VERSION_BASE = 4
+
+
+def normaliser_codes_clients(valeurs):
+    """
+    Convertit des codes clients en clés texte : un code numérique garde sa
+    valeur (12053, 12053.0, '12053' et '012053' donnent '12053'), un code
+    alphanumérique est conservé sans les espaces autour. Seuls les chiffres
+    0-9 sont numériques ('²' ou '١٢' restent du texte). Une valeur vide
+    devient ''. Seules les valeurs distinctes sont converties.
+
+    Args:
+        valeurs (array-like): Codes clients.
+
+    Returns:
+        list: Clés texte, dans l'ordre des valeurs.
+    """
+    import numpy as np
+    import pandas as pd
+
+    def normaliser(valeur):
+        if isinstance(valeur, float) and valeur.is_integer():
+            return str(int(valeur))
+        texte = str(valeur).strip()
+        return str(int(texte)) if texte.isascii() and texte.isdecimal() else texte
+
+    codes, uniques = pd.factorize(np.asarray(valeurs, dtype=object))
+    textes = [normaliser(valeur) for valeur in uniques] + ['']
+    # Les valeurs manquantes (code -1) pointent sur le dernier élément : ''
+    return [textes[code] for code in codes]
+
+
+class BaseClients:
+    """
+    Base SQLite compilée à partir de clients_siret.csv.
+
+    La base est écrite dans un fichier temporaire puis renommée : une
+    compilation interrompue ou concurrente (plusieurs processus) ne laisse
+    jamais de base incomplète. Une connexion est ouverte à chaque opération.
+
+    Args:
+        chemin_csv (str): Chemin de clients_siret.csv (par défaut : fichier de configuration).
+        chemin_base (str): Chemin de la base compilée (par défaut : à côté du CSV).
+    """
+
+    def __init__(self, chemin_csv=None, chemin_base=None):
+        from traitement import get_data_file_path
+
+        self.chemin_csv = chemin_csv or get_data_file_path('clients_siret.csv')
+        self.chemin_base = chemin_base or os.path.splitext(self.chemin_csv)[0] + '.sqlite'
+        self._empreinte_verifiee = None
+
+    def _connecter(self):
+        return sqlite3.connect(self.chemin_base, timeout=30)
+
+    def empreinte_sources(self):
+        """
+        Returns:
+            str: Empreinte des fichiers sources (date de modification et taille
+                de clients_siret.csv et codes_pays.csv, version du format).
+        """
+        from traitement import get_data_file_path
+
+        sources = []
+        for chemin in [self.chemin_csv, get_data_file_path('codes_pays.csv')]:
+            stat = os.stat(chemin)
+            sources.append([os.path.abspath(chemin), stat.st_mtime_ns, stat.st_size])
+        return json.dumps({'version': VERSION_BASE, 'sources': sources})
+
+    def _empreinte_base(self):
+        try:
+            with closing(self._connecter()) as connexion:
+                ligne = connexion.execute("SELECT valeur FROM meta WHERE cle = 'empreinte'").fetchone()
+        except sqlite3.Error:
+            return None
+        return ligne[0] if ligne else None
+
+    def verifier(self):
+        """
+        Compile la base si elle n'existe pas ou si un fichier source a changé.
+
+        Returns:
+            bool: True si la base a été (re)compilée.
+        """
+        empreinte = self.empreinte_sources()
+        # Déjà vérifiée dans ce processus : pas de lecture de la base
+        if empreinte == self._empreinte_verifiee:
+            return False
+
+        compilee = False
+        if not os.path.exists(self.chemin_base) or self._empreinte_base() != empreinte:
+            self.compiler(empreinte)
+            compilee = True
+        self._empreinte_verifiee = empreinte
+        return compilee
+
+    def compiler(self, empreinte=None):
+        """
+        Compile clients_siret.csv en base SQLite.
+
+        Toutes les colonnes sont lues comme du texte, sans conversion des
+        valeurs 'NA', 'NULL'... en valeurs manquantes. En cas de doublon, la
+        première occurrence du code fait foi. Des codes distincts donnant la
+        même clé ('012050' et '12050') ne sont pas fusionnés en silence : la
+        colonne COLONNE_CONFLITS les liste (voir validation.controler_journal).
+
+        Args:
+            empreinte (str): Empreinte des sources (calculée si absente).
+
+        Returns:
+            int: Nombre de clients compilés.
+        """
+        import pandas as pd
+
+        from traitement import codes_pays_clients
+
+        empreinte = empreinte or self.empreinte_sources()
+        df_clients = pd.read_csv(self.chemin_csv, sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False)
+        df_clients = df_clients.reindex(columns=COLONNES_CLIENTS, fill_value='')
+        cles = normaliser_codes_clients(df_clients['Code'])
+        codes_pays = codes_pays_clients(df_clients['Pays'])
+
+        # Codes distincts (tels qu'écrits dans le fichier) par clé
+        codes_par_cle = {}
+        for cle, code in zip(cles, df_clients['Code'].str.strip()):
+            codes = codes_par_cle.setdefault(cle, [])
+            if code not in codes:
+                codes.append(code)
+
+        lignes = [
+            (cle, *valeurs, code_pays, ', '.join(codes_par_cle[cle]) if len(codes_par_cle[cle]) > 1 else '')
+            for cle, valeurs, code_pays in zip(cles, df_clients.itertuples(index=False, name=None), codes_pays)
+            if cle
+        ]
+
+        dossier = os.path.dirname(os.path.abspath(self.chemin_base))
+        descripteur, chemin_temporaire = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=dossier)
+        os.close(descripteur)
+        try:
+            with closing(sqlite3.connect(chemin_temporaire)) as connexion, connexion:
+                connexion.execute("CREATE TABLE meta (cle TEXT PRIMARY KEY, valeur TEXT)")
+                connexion.execute(
+                    "CREATE TABLE clients ("
+                    " cle TEXT PRIMARY KEY,"
+                    + ''.join(f' "{colonne}" TEXT,' for colonne in COLONNES_CLIENTS)
+                    + f' "Code pays" TEXT, "{COLONNE_CONFLITS}" TEXT)'
+                )
+                connexion.executemany(f"INSERT OR IGNORE INTO clients VALUES ({', '.join(['?'] * (len(COLONNES_CLIENTS) + 3))})", lignes)
+                connexion.execute("INSERT INTO meta VALUES ('empreinte', ?)", (empreinte,))
+            os.replace(chemin_temporaire, self.chemin_base)
+        except BaseException:
+            if os.path.exists(chemin_temporaire):
+                os.remove(chemin_temporaire)
+            raise
+
+        self._empreinte_verifiee = empreinte
+        return len(lignes)
+
+    def rechercher(self, codes_clients):
+        """
+        Recherche des clients par code (recherche indexée sur la clé primaire).
+
+        Args:
+            codes_clients (array-like): Codes clients, tels qu'ils figurent dans le journal.
+
+        Returns:
+            DataFrame: Clients trouvés, indexés par 'Code' (valeurs distinctes de
+                `codes_clients`, telles quelles), colonnes texte de clients_siret.csv
+                (dont 'Code', tel qu'écrit dans le fichier), 'Code pays' (code
+                ISO, None si le pays est introuvable) et COLONNE_CONFLITS (codes
+                du fichier partageant la clé du client, vide sinon).
+        """
+        import numpy as np
+        import pandas as pd
+
+        self.verifier()
+
+        codes = pd.unique(pd.Series(np.asarray(codes_clients, dtype=object)).dropna())
+        cles = normaliser_codes_clients(codes)
+        colonnes = COLONNES_CLIENTS + ['Code pays', COLONNE_CONFLITS]
+
+        # Jointure avec une table temporaire : la recherche utilise la clé primaire
+        with closing(self._connecter()) as connexion:
+            connexion.execute("CREATE TEMP TABLE demandes (position INTEGER, cle TEXT)")
+            connexion.executemany("INSERT INTO demandes VALUES (?, ?)", enumerate(cles))
+            lignes = connexion.execute(
+                "SELECT d.position" + ''.join(f', c."{colonne}"' for colonne in colonnes)
+                + " FROM demandes d JOIN clients c ON c.cle = d.cle ORDER BY d.position"
+            ).fetchall()
+
+        positions = [ligne[0] for ligne in lignes]
+        index = pd.Index(np.asarray(codes, dtype=object)[positions], dtype=object, name='Code')
+        return pd.DataFrame([ligne[1:] for ligne in lignes], index=index, columns=colonnes, dtype=object)
+
+    def nombre_clients(self):
+        """
+        Returns:
+            int: Nombre de clients de la base.
+        """
+        self.verifier()
+        with closing(self._connecter()) as connexion:
+            return connexion.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
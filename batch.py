@@ -0,0 +1,219 @@
+"""
+Conversion en lot, sans interface graphique
+Convertit plusieurs journaux Excel en parallèle (pool de processus) et
+produit un résumé JSON exploitable par un ordonnanceur.
+
+Utilisation :
+    python batch.py "journaux/*.xlsx" --sortie exports --processus 4 --rapport resume.json
+    python batch.py "journaux/*.xlsx" --feuilles toutes --fusionner
+
+Codes de sortie :
+    0 : tous les journaux ont été convertis
+    1 : au moins un journal est en erreur
+    2 : aucun journal trouvé
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from cache_conversions import CacheConversions, get_cache_path
+from registre import RegistreFactures, get_registre_path
+from traitement import executer_pipeline, executer_pipeline_flux
+
+EXTENSIONS_JOURNAL = ['.xlsx', '.xls', '.xlsm']
+
+CODE_SUCCES = 0
+CODE_ECHEC = 1
+CODE_AUCUN_FICHIER = 2
+
+
+def lister_journaux(chemins):
+    """
+    Liste les journaux Excel à partir de dossiers, fichiers ou motifs glob.
+
+    Args:
+        chemins (list): Dossiers, fichiers ou motifs glob.
+
+    Returns:
+        list: Chemins des journaux, triés et sans doublon.
+    """
+    journaux = set()
+
+    for chemin in chemins:
+        if os.path.isdir(chemin):
+            candidats = [os.path.join(chemin, nom) for nom in os.listdir(chemin)]
+        else:
+            candidats = glob.glob(chemin)
+
+        for candidat in candidats:
+            nom = os.path.basename(candidat)
+            # Ignorer les fichiers de verrouillage d'Excel (~$journal.xlsx)
+            if nom.startswith('~$'):
+                continue
+            if os.path.isfile(candidat) and Path(candidat).suffix.lower() in EXTENSIONS_JOURNAL:
+                journaux.add(os.path.abspath(candidat))
+
+    return sorted(journaux)
+
+
+def lire_feuilles(valeur):
+    """
+    Interprète l'option --feuilles.
+
+    Args:
+        valeur (str): 'toutes', ou noms/index de feuilles séparés par des virgules.
+
+    Returns:
+        int|str|list|None: Valeur de `sheet_name` pour convertir_fichier.
+    """
+    if valeur.strip().lower() == 'toutes':
+        return None
+
+    feuilles = [int(feuille) if feuille.strip().isdigit() else feuille.strip() for feuille in valeur.split(',')]
+    return feuilles[0] if len(feuilles) == 1 else feuilles
+
+
+def convertir_journal(chemin_fichier, dossier_sortie, mesurer_memoire=False, taille_bloc=None, profiler=False, chemin_registre=None, dossier_cache=None, sheet_name=0, reexporter=False):
+    """
+    Convertit un journal dans son propre sous-dossier de sortie.
+
+    Les fichiers exportés portent le même nom pour tous les journaux
+    (FBAFH1234561A.JJJ...) : chaque journal a donc son sous-dossier.
+    Une liste de journaux est fusionnée en une seule balance, dans le
+    sous-dossier 'fusion'.
+
+    Args:
+        chemin_fichier (str|list): Chemin du journal, ou liste de journaux à fusionner.
+        dossier_sortie (str): Dossier de sortie commun.
+        mesurer_memoire (bool): Mesure le pic mémoire de chaque étape.
+        taille_bloc (int): Si renseigné, conversion en flux par blocs de cette taille.
+        profiler (bool): Profile la conversion avec cProfile.
+        chemin_registre (str): Si renseigné, registre des factures déjà exportées
+            (conversion incrémentale).
+        dossier_cache (str): Si renseigné, cache des conversions (hors mode flux).
+        sheet_name (int|str|list|None): Feuille(s) à lire (None pour toutes les feuilles).
+        reexporter (bool): Avec un registre, réexporte aussi les factures déjà
+            exportées (le registre est mis à jour).
+
+    Returns:
+        dict: Résumé de la conversion ('statut' vaut 'ok' ou 'erreur').
+    """
+    debut = time.perf_counter()
+    nom_sortie = Path(chemin_fichier).stem if isinstance(chemin_fichier, str) else 'fusion'
+    dossier_destination = os.path.join(dossier_sortie, nom_sortie)
+
+    try:
+        # Le registre est ouvert dans le processus de conversion (connexion SQLite propre)
+        registre = RegistreFactures(chemin_registre, reexporter) if chemin_registre else None
+        if taille_bloc:
+            success, resultat = executer_pipeline_flux(chemin_fichier, dossier_destination, taille_bloc, registre=registre)
+        else:
+            cache = CacheConversions(dossier_cache) if dossier_cache else None
+            success, resultat = executer_pipeline(chemin_fichier, dossier_destination, mesurer_memoire, profiler=profiler, registre=registre, cache=cache, sheet_name=sheet_name)
+    except Exception as e:
+        success, resultat = False, f"Erreur inattendue : {str(e)}"
+
+    if success:
+        resume = {'statut': 'ok', **resultat}
+    else:
+        resume = {'statut': 'erreur', 'fichier': chemin_fichier, 'message': resultat}
+    resume['duree'] = time.perf_counter() - debut
+
+    return resume
+
+
+def convertir_journaux(journaux, dossier_sortie, processus=None, mesurer_memoire=False, taille_bloc=None, profiler=False, chemin_registre=None, dossier_cache=None, sheet_name=0, reexporter=False):
+    """
+    Convertit une liste de journaux en parallèle.
+
+    Args:
+        journaux (list): Chemins des journaux.
+        dossier_sortie (str): Dossier de sortie commun.
+        processus (int): Nombre de processus (par défaut : nombre de cœurs).
+        mesurer_memoire (bool): Mesure le pic mémoire de chaque étape.
+        taille_bloc (int): Si renseigné, conversion en flux par blocs de cette taille.
+        profiler (bool): Profile chaque conversion avec cProfile.
+        chemin_registre (str): Si renseigné, registre des factures déjà exportées.
+            Les journaux sont alors convertis l'un après l'autre : une facture
+            présente dans deux journaux n'est exportée qu'une fois.
+        dossier_cache (str): Si renseigné, cache des conversions (hors mode flux).
+        sheet_name (int|str|list|None): Feuille(s) à lire dans chaque journal.
+        reexporter (bool): Avec un registre, réexporte aussi les factures déjà exportées.
+
+    Returns:
+        list: Résumés de conversion, dans l'ordre des journaux.
+    """
+    if processus == 1 or len(journaux) <= 1 or chemin_registre:
+        return [convertir_journal(journal, dossier_sortie, mesurer_memoire, taille_bloc, profiler, chemin_registre, dossier_cache, sheet_name, reexporter) for journal in journaux]
+
+    with ProcessPoolExecutor(max_workers=processus) as executor:
+        return list(executor.map(convertir_journal, journaux, [dossier_sortie] * len(journaux), [mesurer_memoire] * len(journaux), [taille_bloc] * len(journaux), [profiler] * len(journaux), [None] * len(journaux), [dossier_cache] * len(journaux), [sheet_name] * len(journaux)))
+
+
+def main(argv=None):
+    date_du_jour = datetime.now().strftime("%Y-%m-%d")
+    dossier_defaut = os.path.join(os.path.expanduser("~"), "Documents", "CSV-MAM", "csv-export", date_du_jour)
+
+    parser = argparse.ArgumentParser(description="Conversion en lot de journaux Excel en fichiers FactoFrance")
+    parser.add_argument('chemins', nargs='+', help="Dossiers, fichiers ou motifs glob des journaux Excel")
+    parser.add_argument('--sortie', default=dossier_defaut, help="Dossier de sortie (par défaut : Documents/CSV-MAM/csv-export/<date>)")
+    parser.add_argument('--processus', type=int, default=None, help="Nombre de processus (par défaut : nombre de cœurs)")
+    parser.add_argument('--mesurer-memoire', action='store_true', help="Mesure le pic mémoire de chaque étape (plus lent)")
+    parser.add_argument('--profiler', action='store_true', help="Profile chaque conversion avec cProfile (rapport .prof dans le dossier de sortie)")
+    parser.add_argument('--flux', action='store_true', help="Conversion en flux par blocs, mémoire bornée par la taille des blocs (journaux volumineux)")
+    parser.add_argument('--taille-bloc', type=int, default=50000, help="Nombre de lignes par bloc en mode flux")
+    parser.add_argument('--incremental', action='store_true', help="Ignore les factures déjà exportées (registre Documents/CSV-MAM/registre-factures.sqlite)")
+    parser.add_argument('--registre', default=None, help="Registre des factures exportées à utiliser avec --incremental")
+    parser.add_argument('--reexporter', action='store_true', help="Avec --incremental, réexporte aussi les factures déjà exportées (le registre est mis à jour)")
+    parser.add_argument('--cache', action='store_true', help="Réutilise les résultats des conversions précédentes (cache Documents/CSV-MAM/cache)")
+    parser.add_argument('--feuilles', default='0', help="Feuilles à lire : 'toutes', ou noms/index séparés par des virgules (par défaut : 0, la première)")
+    parser.add_argument('--fusionner', action='store_true', help="Fusionne tous les journaux en une seule balance (sous-dossier 'fusion')")
+    parser.add_argument('--rapport', default=None, help="Fichier JSON du résumé (par défaut : sortie standard)")
+    args = parser.parse_args(argv)
+    sheet_name = lire_feuilles(args.feuilles)
+    if args.flux and (args.fusionner or sheet_name != 0):
+        parser.error("--feuilles et --fusionner ne sont pas disponibles en mode --flux")
+
+    journaux = lister_journaux(args.chemins)
+    if not journaux:
+        print("Aucun journal Excel trouvé", file=sys.stderr)
+        return CODE_AUCUN_FICHIER
+
+    debut = time.perf_counter()
+    chemin_registre = (args.registre or get_registre_path()) if args.incremental else None
+    dossier_cache = get_cache_path() if args.cache else None
+    if args.fusionner:
+        # Une seule conversion : les journaux (et leurs feuilles) sont lus en parallèle puis fusionnés
+        resumes = [convertir_journal(journaux, args.sortie, args.mesurer_memoire, None, args.profiler, chemin_registre, dossier_cache, sheet_name, args.reexporter)]
+    else:
+        resumes = convertir_journaux(journaux, args.sortie, args.processus, args.mesurer_memoire, args.taille_bloc if args.flux else None, args.profiler, chemin_registre, dossier_cache, sheet_name, args.reexporter)
+
+    nb_erreurs = sum(1 for resume in resumes if resume['statut'] != 'ok')
+    rapport = {
+        'sortie': args.sortie,
+        'journaux': len(resumes),
+        'erreurs': nb_erreurs,
+        'lignes': sum(resume.get('lignes', 0) for resume in resumes),
+        'duree': time.perf_counter() - debut,
+        'resultats': resumes
+    }
+
+    contenu = json.dumps(rapport, ensure_ascii=False, indent=2)
+    if args.rapport:
+        with open(args.rapport, 'w', encoding='utf-8') as fichier:
+            fichier.write(contenu)
+    else:
+        print(contenu)
+
+    return CODE_ECHEC if nb_erreurs else CODE_SUCCES
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,648 @@
+"""
+Banc d'essai des fonctions de traitement
+Génère un journal Excel et une base clients synthétiques (mêmes colonnes que
+les exports réels et que datas/clients_siret.csv), mesure chaque fonction de
+la chaîne et la chaîne complète, vérifie l'équivalence des sorties avec les
+anciennes implémentations ligne par ligne, et enregistre/compare des
+résultats de référence.
+
+Utilisation :
+    python benchmark.py --lignes 200000 --clients 5000 --part-export 0.2 --part-avoirs 0.05
+    python benchmark.py --enregistrer reference.json
+    python benchmark.py --comparer reference.json
+
+Codes de sortie :
+    0 : sorties équivalentes (et pas de régression en mode --comparer)
+    1 : sorties différentes, pic mémoire en flux qui grandit avec le journal,
+        ou régression détectée
+"""
+
+import argparse
+import filecmp
+import hashlib
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+import traitement
+from traitement import (
+    convertir_fichier,
+    encoder_csv,
+    executer_pipeline,
+    executer_pipeline_flux,
+    export_dataframe_to_csv,
+    formater_csv,
+    generate_balance_file,
+    generate_tiers_file,
+    get_data_file_path,
+    get_index_clients,
+    invalider_cache_references,
+    separer_clients_par_pays
+)
+
+# Tolérance avant de signaler une régression (mode --comparer)
+SEUIL_REGRESSION = 1.2
+# Écart minimal (en secondes) pris en compte : en dessous, la mesure est du bruit
+SEUIL_BRUIT = 0.05
+# Pic mémoire en flux : un journal quatre fois plus long, lu par blocs de même
+# taille, ne doit pas dépasser ce multiple du pic du journal court
+SEUIL_MEMOIRE_FLUX = 1.2
+
+
+def generer_base_clients(nb_clients, part_export=0.2, graine=0):
+    """
+    Génère une base clients synthétique au format de clients_siret.csv.
+
+    Args:
+        nb_clients (int): Nombre de clients.
+        part_export (float): Part des clients étrangers (0 à 1).
+        graine (int): Graine du générateur aléatoire.
+
+    Returns:
+        DataFrame: Colonnes Code, Nom, Voie, Complement, CP, Ville, Pays, SIRET, Raison sociale.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(graine)
+    pays_etrangers = ['ESPAGNE', 'ITALIE', 'PORTUGAL', 'TUNISIE', 'REPUBLIQUE TCHEQUE', 'CHINE', 'ALLEMAGNE']
+    etranger = rng.random(nb_clients) < part_export
+    codes = np.arange(nb_clients) + 12000
+    noms = np.array([f"CLIENT {code} MECANIQUE DE PRECISION ET ASSEMBLAGE" for code in codes], dtype=object)
+
+    return pd.DataFrame({
+        'Code': codes,
+        'Nom': noms,
+        'Voie': [f"{numero} RUE DE L'INDUSTRIE" for numero in rng.integers(1, 300, nb_clients)],
+        'Complement': np.where(rng.random(nb_clients) < 0.5, 'ZI DU PONT LONG', ''),
+        'CP': [f"{cp:05d}" for cp in rng.integers(1000, 96000, nb_clients)],
+        'Ville': rng.choice(['BAYONNE', 'SERRES CASTET', 'MARTIGNAS SUR JALLE', 'TUNIS', 'GRANDOLA'], nb_clients),
+        'Pays': np.where(etranger, rng.choice(pays_etrangers, nb_clients), 'FRANCE'),
+        'SIRET': np.where(etranger, '', [f"{siret:014d}" for siret in rng.integers(10**12, 10**13, nb_clients)]),
+        'Raison sociale': noms
+    })
+
+
+def generer_journal(nb_lignes, codes_clients=None, part_avoirs=0.05, graine=0, decimales=2):
+    """
+    Génère un journal de facturation synthétique.
+
+    Args:
+        nb_lignes (int): Nombre de lignes du journal.
+        codes_clients (array): Codes clients tirés au hasard (par défaut 12000 à 19999).
+        part_avoirs (float): Part des avoirs (AVO) parmi les pièces (0 à 1).
+        graine (int): Graine du générateur aléatoire.
+        decimales (int): Nombre de décimales des montants.
+
+    Returns:
+        DataFrame: Journal au format de l'export Excel (Client, Règlement, N°Fact., Date, Echéance, Montant T.T.C.).
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(graine)
+    if codes_clients is None:
+        codes_clients = np.arange(12000, 20000)
+
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 31, nb_lignes), unit='D')
+    delais = pd.to_timedelta(rng.choice([30, 45, 60], nb_lignes), unit='D')
+    reglements = rng.choice(['CHQ 30J', 'VIR 45J FDM', 'VIR 60J'], nb_lignes).astype(object)
+    reglements[rng.random(nb_lignes) < part_avoirs] = 'AVOIR'
+
+    return pd.DataFrame({
+        'Client': rng.choice(codes_clients, nb_lignes),
+        'Nom': 'CLIENT',
+        'Règlement': reglements,
+        'N°Fact.': np.arange(nb_lignes) + 100000,
+        'Date': dates,
+        'Echéance': dates + delais,
+        'Montant T.T.C.': np.round(rng.uniform(10, 50000, nb_lignes), decimales)
+    })
+
+
+def generate_balance_file_iterrows(df_source):
+    """
+    Ancienne implémentation ligne par ligne de generate_balance_file (référence "avant").
+    """
+    import pandas as pd
+
+    date_fichier = pd.Timestamp.now().strftime('%d/%m/%Y')
+    lignes = [['000000', date_fichier, '', '', date_fichier, 'EUR', 0, 0, 'DEB', '', '']]
+
+    for _, row in df_source.iterrows():
+        typePiece = 'FAC'
+        match str(row.get('Règlement'))[0]:
+            case 'C':
+                codeReglement = 'CHE'
+            case 'V':
+                codeReglement = 'VIR'
+            case 'A':
+                codeReglement = ''
+                typePiece = 'AVO'
+
+        if typePiece == 'AVO':
+            montantDevise = round(-abs(row.get('Montant T.T.C.')), 2)
+        else:
+            montantDevise = round(abs(row.get('Montant T.T.C.')), 2)
+
+        lignes.append([
+            '123456',
+            date_fichier,
+            row.get('Client'),
+            row.get('N°Fact.'),
+            row.get('Date').strftime('%d/%m/%Y'),
+            'EUR',
+            montantDevise,
+            row.get('Echéance').strftime('%d/%m/%Y'),
+            typePiece,
+            codeReglement,
+            ''
+        ])
+
+    lignes.append(['999999', date_fichier, '', '', date_fichier, 'EUR', 0, 0, 'FIN', '', ''])
+
+    return pd.DataFrame(lignes, columns=traitement.COLONNES_BALANCE)
+
+
+def separer_clients_par_pays_iterrows(df_balance, df_clients):
+    """
+    Ancienne implémentation ligne par ligne de separer_clients_par_pays (référence "avant").
+    Seules les lignes de données sont retournées.
+    """
+    import pandas as pd
+
+    df_data = df_balance[~df_balance['Code vendeur cédant'].isin(['000000', '999999'])]
+    lignes_fr = []
+    lignes_etranger = []
+
+    for _, row in df_data.iterrows():
+        code_client = row['Code client']
+        if code_client in df_clients['Code'].values:
+            client_info = df_clients[df_clients['Code'] == code_client].iloc[0]
+            if str(client_info.get('Pays', 'FRANCE')).upper() == 'FRANCE':
+                lignes_fr.append(row)
+            else:
+                lignes_etranger.append(row)
+        else:
+            lignes_fr.append(row)
+
+    return pd.DataFrame(lignes_fr, columns=df_balance.columns), pd.DataFrame(lignes_etranger, columns=df_balance.columns)
+
+
+def generate_tiers_file_iterrows(df_balance):
+    """
+    Ancienne implémentation ligne par ligne de generate_tiers_file (référence "avant"),
+    reprise telle quelle de la version d'origine.
+    """
+    import pandas as pd
+
+    df_tiers = pd.DataFrame()
+
+    lignes = []
+
+    # Insérer la première ligne manuellement
+    lignes.append(['000000', 'DEB', '32038969500026', 'MONTAGE ET ASSEMBLAGE MECANIQUE', 'MONTAGE ET ASSEMBLAGE MECANIQUE', '23 RUE MELVILLE-LYNCH', 'PARC D\'ACTIVITE MAIGNON', '64100', 'BAYONNE', 'FR'])
+    
+    # Définir les constantes pour les colonnes
+    CODE_VENDEUR_CEDANT = '123456'
+
+    # Récupérer les données utiles
+    df_clients = pd.read_csv(get_data_file_path('clients_siret.csv'), sep=';', encoding='utf-8-sig')
+    df_codes_pays = pd.read_csv(get_data_file_path('codes_pays.csv'), sep=';', encoding='utf-8-sig')
+
+    # Déclarer les clients non identifiés
+    clients_non_identifies = set()
+    clients_traites = set()  # Pour éviter les doublons
+
+    # Parcourir les lignes du df balance et remplir le df tiers
+    for _, row in df_balance.iterrows():
+        code_client = row['Code client']
+        
+        # Ignorer les lignes de début/fin
+        if code_client in ['000000', '999999']:
+            continue
+        
+        # Éviter les doublons
+        if code_client in clients_traites:
+            continue
+        
+        clients_traites.add(code_client)
+        
+        if not code_client in df_clients['Code'].values:
+            clients_non_identifies.add(str(code_client))
+            continue
+        
+        client_info = df_clients[df_clients['Code'] == row['Code client']].iloc[0]
+        
+        # Fonction pour gérer les NaN
+        def safe_str(val, max_len=None):
+            if pd.isna(val):
+                return ''
+            result = str(val)
+            return result[:max_len] if max_len else result
+        
+        lignes.append([
+            CODE_VENDEUR_CEDANT,
+            safe_str(client_info['Code']),
+            safe_str(client_info['SIRET'], 14),
+            safe_str(client_info['Raison sociale'], 40),
+            safe_str(client_info['Raison sociale'], 40),
+            safe_str(client_info['Voie'], 40),
+            safe_str(client_info['Complement'], 40),
+            safe_str(client_info['CP'], 6),
+            safe_str(client_info['Ville'], 34),
+            df_codes_pays.loc[df_codes_pays['Pays'] == client_info['Pays'], 'ISO'].values[0] if len(df_codes_pays.loc[df_codes_pays['Pays'] == client_info['Pays'], 'ISO'].values) > 0 else 'FR'
+        ])
+
+    # Insérer la dernière ligne manuellement
+    lignes.append(['999999', 'FIN', '32038969500026', 'MONTAGE ET ASSEMBLAGE MECANIQUE', 'MONTAGE ET ASSEMBLAGE MECANIQUE', '23 RUE MELVILLE-LYNCH', 'PARC D\'ACTIVITE MAIGNON', '64100', 'BAYONNE', 'FR'])
+
+    df_tiers = pd.DataFrame(lignes, columns=traitement.COLONNES_TIERS)
+
+    return df_tiers, clients_non_identifies
+
+
+def comparer_tiers(tiers_avant, tiers_apres, df_clients):
+    """
+    Compare les tiers de l'ancienne implémentation à ceux de generate_tiers_file,
+    cellule par cellule.
+
+    Deux différences sont des corrections voulues de l'ancienne implémentation,
+    décomptées à part au lieu d'être confondues avec le reste :
+    - Zéros en tête (code postal, SIRET) : l'ancienne lecture de
+      clients_siret.csv lisait ces codes comme des nombres ('02046' devenait
+      '2046', un SIRET '04671929258523' devenait '4671929258523.') ;
+    - Code pays : un pays sans entrée exacte dans codes_pays.csv (ex. CHINE,
+      inscrit 'CHINE (REPUBLIQUE POPULAIRE)') était écrit 'FR' ; il est
+      désormais rapproché (CN), avec un avertissement au contrôle du journal.
+    Toute autre différence rend les sorties non équivalentes.
+
+    Args:
+        tiers_avant (DataFrame): Tiers de generate_tiers_file_iterrows.
+        tiers_apres (DataFrame): Tiers de generate_tiers_file.
+        df_clients (DataFrame): clients_siret.csv, lu en texte.
+
+    Returns:
+        tuple: (équivalence: bool, écarts attendus: dict colonne -> liste de (avant, après)).
+    """
+    import pandas as pd
+
+    ecarts_attendus = {'Zéros en tête': [], 'Code pays': []}
+    if tiers_avant.shape != tiers_apres.shape:
+        return False, ecarts_attendus
+
+    df_codes_pays = pd.read_csv(get_data_file_path('codes_pays.csv'), sep=';', encoding='utf-8-sig')
+    pays_inscrits = set(df_codes_pays['Pays'])
+    pays_clients = dict(zip(df_clients['Code'].astype(str), df_clients['Pays']))
+
+    avant = tiers_avant.astype(str).to_numpy()
+    apres = tiers_apres.astype(str).to_numpy()
+    colonnes = list(tiers_avant.columns)
+    for ligne, colonne in zip(*(avant != apres).nonzero()):
+        nom = colonnes[colonne]
+        valeur_avant, valeur_apres = avant[ligne, colonne], apres[ligne, colonne]
+        if nom in ('Code postal', 'Identifiant du tiers') and valeur_apres.isdigit() and valeur_apres.lstrip('0') == valeur_avant.split('.')[0]:
+            ecarts_attendus['Zéros en tête'].append((valeur_avant, valeur_apres))
+        elif nom == 'Code pays' and valeur_avant == 'FR' and pays_clients.get(avant[ligne, 1]) not in pays_inscrits:
+            ecarts_attendus[nom].append((pays_clients.get(avant[ligne, 1]), valeur_apres))
+        else:
+            return False, ecarts_attendus
+    return True, ecarts_attendus
+
+
+def contenu_csv(df):
+    """
+    Sérialise un DataFrame comme l'ancien export_dataframe_to_csv (DataFrame.to_csv),
+    pour comparer les sorties.
+    """
+    tampon = io.BytesIO()
+    df.to_csv(tampon, index=False, header=False, sep=';', decimal=',', encoding='cp850', lineterminator='\r\n', float_format='%.2f')
+    return tampon.getvalue()
+
+
+def contenu_csv_rapide(df):
+    """
+    Sérialise un DataFrame avec l'écrivain CSV de export_dataframe_to_csv.
+    """
+    return encoder_csv(formater_csv(df))
+
+
+def mesurer(fonction, *args, repetitions=3, **kwargs):
+    """
+    Retourne le meilleur temps (en secondes) sur plusieurs exécutions et le dernier résultat.
+    """
+    meilleur = None
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = fonction(*args, **kwargs)
+        duree = time.perf_counter() - debut
+        meilleur = duree if meilleur is None else min(meilleur, duree)
+    return meilleur, resultat
+
+
+def mesurer_memoire_flux(chemin_journal, taille_bloc):
+    """
+    Mesure le pic mémoire (tracemalloc) de la conversion en flux, contrôle et
+    registre compris (registre temporaire). Les bases SQLite temporaires
+    (N° de facture vus, factures en attente) sont sur disque : seul leur cache
+    de pages, borné, reste en mémoire.
+
+    Returns:
+        int: Pic mémoire, en octets.
+    """
+    import tracemalloc
+
+    from registre import RegistreFactures
+
+    with tempfile.TemporaryDirectory() as dossier_sortie:
+        registre = RegistreFactures(os.path.join(dossier_sortie, 'registre.sqlite'))
+        tracemalloc.start()
+        try:
+            executer_pipeline_flux(chemin_journal, os.path.join(dossier_sortie, 'flux'), taille_bloc, registre=registre)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+
+def verifier_rapprochement_decimales(codes_clients, nb_lignes=2000, graine=0):
+    """
+    Vérifie que la chaîne complète (en mémoire et en flux) rapproche sans
+    écart un journal dont les montants ont 3 décimales (dont 300 lignes de
+    99,996), et que toutes ses factures sont enregistrées dans le registre.
+
+    Args:
+        codes_clients (array): Codes clients de la base synthétique (clients identifiés).
+        nb_lignes (int): Nombre de lignes du journal.
+        graine (int): Graine du générateur aléatoire.
+
+    Returns:
+        bool: True si aucun écart n'est signalé et toutes les factures sont enregistrées.
+    """
+    from registre import RegistreFactures
+
+    df_journal = generer_journal(nb_lignes, codes_clients, graine=graine, decimales=3)
+    df_journal.loc[:299, 'Montant T.T.C.'] = 99.996
+
+    with tempfile.TemporaryDirectory() as dossier_sortie:
+        chemin_journal = os.path.join(dossier_sortie, 'journal-3-decimales.xlsx')
+        df_journal.to_excel(chemin_journal, index=False)
+
+        for nom, pipeline, options in [('memoire', executer_pipeline, {'rapport': False}), ('flux', executer_pipeline_flux, {})]:
+            registre = RegistreFactures(os.path.join(dossier_sortie, f'registre-{nom}.sqlite'))
+            success, resultat = pipeline(chemin_journal, os.path.join(dossier_sortie, nom), registre=registre, **options)
+            if not success or resultat['rapprochement']['ecarts'] or resultat['registre']['enregistrees'] != nb_lignes:
+                return False
+    return True
+
+
+def preparer_donnees(parametres, dossier):
+    """
+    Génère (ou réutilise) la base clients, la table des pays et le journal Excel
+    correspondant aux paramètres. Les fichiers sont mis en cache dans `dossier`,
+    un sous-dossier par jeu de paramètres.
+
+    Returns:
+        tuple: (chemin du journal Excel, DataFrame du journal, dossier de configuration)
+    """
+    import pandas as pd
+
+    empreinte = hashlib.sha1(json.dumps(parametres, sort_keys=True).encode()).hexdigest()[:12]
+    dossier_jeu = os.path.join(dossier, empreinte)
+    dossier_config = os.path.join(dossier_jeu, 'config')
+    chemin_journal = os.path.join(dossier_jeu, 'journal.xlsx')
+    os.makedirs(dossier_config, exist_ok=True)
+
+    df_clients = generer_base_clients(parametres['clients'], parametres['part_export'], parametres['graine'])
+    df_source = generer_journal(parametres['lignes'], df_clients['Code'].to_numpy(), parametres['part_avoirs'], parametres['graine'])
+
+    if not os.path.exists(chemin_journal):
+        df_clients.to_csv(os.path.join(dossier_config, 'clients_siret.csv'), sep=';', index=False, encoding='utf-8-sig')
+        shutil.copy2(traitement.get_resource_path(os.path.join('datas', 'codes_pays.csv')), os.path.join(dossier_config, 'codes_pays.csv'))
+        # Écriture dans un fichier temporaire : un journal interrompu n'est jamais réutilisé
+        df_source.to_excel(chemin_journal + '.tmp.xlsx', index=False)
+        os.replace(chemin_journal + '.tmp.xlsx', chemin_journal)
+
+    # Lire le journal tel que la chaîne le lit (types issus d'Excel)
+    success, df_source = convertir_fichier(chemin_journal)
+    if not success:
+        raise RuntimeError(df_source)
+
+    return chemin_journal, df_source, dossier_config
+
+
+def executer_banc(parametres, dossier, repetitions=3, lignes_reference=20000):
+    """
+    Mesure chaque fonction de la chaîne et la chaîne complète, et vérifie
+    l'équivalence des sorties.
+
+    Args:
+        parametres (dict): lignes, clients, part_export, part_avoirs, graine.
+        dossier (str): Dossier de cache des données synthétiques.
+        repetitions (int): Nombre d'exécutions par mesure (meilleur temps retenu).
+        lignes_reference (int): Taille de l'échantillon comparé aux anciennes implémentations.
+
+    Returns:
+        dict: Résultats (paramètres, durées, débits, accélérations, équivalences).
+    """
+    import pandas as pd
+
+    chemin_journal, df_source, dossier_config = preparer_donnees(parametres, dossier)
+    os.environ['CSV_MAM_CONFIG'] = dossier_config
+    invalider_cache_references()
+
+    durees = {}
+    equivalences = {}
+
+    # Fonctions de la chaîne, sur le journal complet
+    durees['convertir_fichier'], _ = mesurer(convertir_fichier, chemin_journal, repetitions=repetitions)
+    durees['generate_balance_file'], df_balance = mesurer(generate_balance_file, df_source, repetitions=repetitions)
+    index_clients = get_index_clients(df_balance['Code client'])
+    durees['separer_clients_par_pays'], (df_fr, df_etranger) = mesurer(separer_clients_par_pays, df_balance, index_clients, repetitions=repetitions)
+    durees['generate_tiers_file'], _ = mesurer(lambda: [generate_tiers_file(df_fr), generate_tiers_file(df_etranger)], repetitions=repetitions)
+
+    with tempfile.TemporaryDirectory() as dossier_sortie:
+        durees['export_dataframe_to_csv'], _ = mesurer(export_dataframe_to_csv, df_balance, 'balance', '1A', dossier_sortie, repetitions=repetitions)
+
+    # Chaîne complète, en mémoire puis en flux : les fichiers doivent être identiques
+    with tempfile.TemporaryDirectory() as dossier_memoire, tempfile.TemporaryDirectory() as dossier_flux:
+        durees['executer_pipeline'], (_, resultat_memoire) = mesurer(executer_pipeline, chemin_journal, dossier_memoire, rapport=False, repetitions=repetitions)
+        durees['executer_pipeline_flux'], (_, resultat_flux) = mesurer(executer_pipeline_flux, chemin_journal, dossier_flux, repetitions=repetitions)
+        # Fichiers exportés uniquement : les rapports (rapprochement...) sont horodatés
+        fichiers = sorted(os.path.basename(chemin) for chemin in resultat_memoire['fichiers_exportes'])
+        equivalences['executer_pipeline_flux'] = fichiers == sorted(os.path.basename(chemin) for chemin in resultat_flux['fichiers_exportes']) and all(
+            filecmp.cmp(os.path.join(dossier_memoire, nom), os.path.join(dossier_flux, nom), shallow=False) for nom in fichiers
+        )
+
+    # Mémoire de la conversion en flux : le pic ne doit pas suivre la longueur du journal
+    # (même base clients, journal quatre fois plus court, mêmes blocs)
+    taille_bloc = max(parametres['lignes'] // 16, 1)
+    chemin_quart, _, _ = preparer_donnees({**parametres, 'lignes': max(parametres['lignes'] // 4, 1)}, dossier)
+    memoire_flux = {
+        'taille_bloc': taille_bloc,
+        'pic_quart': mesurer_memoire_flux(chemin_quart, taille_bloc),
+        'pic': mesurer_memoire_flux(chemin_journal, taille_bloc)
+    }
+    equivalences['memoire_flux'] = memoire_flux['pic'] <= memoire_flux['pic_quart'] * SEUIL_MEMOIRE_FLUX
+
+    # Rapprochement d'un journal à 3 décimales : arrondi au centime ligne par ligne des deux côtés
+    equivalences['rapprochement_3_decimales'] = verifier_rapprochement_decimales(
+        pd.read_csv(os.path.join(dossier_config, 'clients_siret.csv'), sep=';', encoding='utf-8-sig')['Code'].to_numpy(),
+        graine=parametres['graine']
+    )
+
+    # Anciennes implémentations, sur un échantillon
+    echantillon = df_source.iloc[:lignes_reference]
+    df_clients = pd.read_csv(os.path.join(dossier_config, 'clients_siret.csv'), sep=';', encoding='utf-8-sig')
+    references = {}
+    comparaisons = {}
+
+    references['generate_balance_file'], balance_avant = mesurer(generate_balance_file_iterrows, echantillon, repetitions=1)
+    comparaisons['generate_balance_file'], balance_apres = mesurer(generate_balance_file, echantillon, repetitions=1)
+    # La balance typée (catégories, centimes, dates) n'est mise en texte qu'à l'export
+    equivalences['generate_balance_file'] = contenu_csv(balance_avant) == contenu_csv_rapide(balance_apres)
+
+    references['separer_clients_par_pays'], (fr_avant, etr_avant) = mesurer(separer_clients_par_pays_iterrows, balance_apres, df_clients, repetitions=1)
+    comparaisons['separer_clients_par_pays'], (fr_apres, etr_apres) = mesurer(separer_clients_par_pays, balance_apres, index_clients, repetitions=1)
+    donnees = lambda df: df[~df['Code vendeur cédant'].isin(['000000', '999999'])] if len(df) else df
+    equivalences['separer_clients_par_pays'] = (
+        contenu_csv_rapide(donnees(fr_avant)) == contenu_csv_rapide(donnees(fr_apres))
+        and contenu_csv_rapide(donnees(etr_avant)) == contenu_csv_rapide(donnees(etr_apres))
+    )
+
+    # Tiers des deux branches (1A puis 1B), à partir des seules lignes de données : l'ancienne
+    # implémentation déclarait le code client vide des lignes 000000/999999 non identifié
+    df_clients_texte = pd.read_csv(os.path.join(dossier_config, 'clients_siret.csv'), sep=';', encoding='utf-8-sig', dtype=str)
+    references['generate_tiers_file'] = comparaisons['generate_tiers_file'] = 0.0
+    equivalences['generate_tiers_file'] = True
+    ecarts_tiers = {}
+    for branche, df_branche in [('1A', fr_apres), ('1B', etr_apres)]:
+        duree_avant, (tiers_avant, inconnus_avant) = mesurer(generate_tiers_file_iterrows, donnees(df_branche), repetitions=1)
+        duree_apres, (tiers_apres, inconnus_apres) = mesurer(generate_tiers_file, donnees(df_branche), repetitions=1)
+        references['generate_tiers_file'] += duree_avant
+        comparaisons['generate_tiers_file'] += duree_apres
+        equivalence, ecarts_tiers[branche] = comparer_tiers(tiers_avant, tiers_apres, df_clients_texte)
+        equivalences['generate_tiers_file'] = equivalences['generate_tiers_file'] and equivalence and inconnus_avant == inconnus_apres
+
+    references['export_dataframe_to_csv'], csv_avant = mesurer(contenu_csv, balance_avant, repetitions=1)
+    comparaisons['export_dataframe_to_csv'], csv_apres = mesurer(contenu_csv_rapide, balance_apres, repetitions=1)
+    equivalences['export_dataframe_to_csv'] = csv_avant == csv_apres
+
+    return {
+        'parametres': parametres,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'durees': durees,
+        'debits': {nom: parametres['lignes'] / duree for nom, duree in durees.items() if duree > 0},
+        'accelerations': {nom: references[nom] / comparaisons[nom] for nom in references if comparaisons[nom] > 0},
+        'lignes_reference': len(echantillon),
+        'memoire_flux': memoire_flux,
+        'ecarts_tiers': {branche: {colonne: len(ecarts) for colonne, ecarts in colonnes.items()} for branche, colonnes in ecarts_tiers.items()},
+        'equivalences': equivalences
+    }
+
+
+def comparer(resultats, reference):
+    """
+    Compare des résultats à une référence enregistrée.
+
+    Returns:
+        list: Fonctions dont la durée dépasse la référence de plus de SEUIL_REGRESSION
+              (et d'au moins SEUIL_BRUIT secondes).
+    """
+    regressions = []
+    print(f"{'Fonction':<28} {'Référence':>11} {'Actuel':>11} {'Ratio':>7}")
+    for nom, duree in resultats['durees'].items():
+        duree_reference = reference['durees'].get(nom)
+        if not duree_reference:
+            continue
+        ratio = duree / duree_reference
+        regression = ratio > SEUIL_REGRESSION and duree - duree_reference > SEUIL_BRUIT
+        marque = '  <-- régression' if regression else ''
+        print(f"{nom:<28} {duree_reference:>10.3f}s {duree:>10.3f}s {ratio:>6.2f}x{marque}")
+        if regression:
+            regressions.append(nom)
+    return regressions
+
+
+def afficher(resultats):
+    """
+    Affiche les résultats d'un banc d'essai.
+    """
+    parametres = resultats['parametres']
+    print(f"Lignes : {parametres['lignes']}  Clients : {parametres['clients']}  "
+          f"Export : {parametres['part_export']:.0%}  Avoirs : {parametres['part_avoirs']:.0%}")
+    print(f"{'Fonction':<28} {'Durée':>9} {'Lignes/s':>12} {'Accél.':>8} {'Identique':>10}")
+    for nom, duree in resultats['durees'].items():
+        acceleration = resultats['accelerations'].get(nom)
+        equivalence = resultats['equivalences'].get(nom)
+        print(f"{nom:<28} {duree:>8.3f}s {resultats['debits'].get(nom, 0):>12,.0f} "
+              f"{'x%.1f' % acceleration if acceleration else '':>8} "
+              f"{'' if equivalence is None else ('oui' if equivalence else 'NON'):>10}")
+    print(f"(accélérations mesurées sur {resultats['lignes_reference']} lignes face aux implémentations ligne par ligne)")
+    for branche, ecarts in resultats.get('ecarts_tiers', {}).items():
+        if any(ecarts.values()):
+            print(f"Tiers {branche} : écarts attendus face à l'ancienne implémentation (corrections) : "
+                  + ', '.join(f"{colonne} {nombre}" for colonne, nombre in ecarts.items() if nombre))
+    rapprochement = resultats['equivalences'].get('rapprochement_3_decimales')
+    if rapprochement is not None:
+        print(f"Rapprochement sans écart d'un journal à 3 décimales : {'oui' if rapprochement else 'NON'}")
+    memoire_flux = resultats.get('memoire_flux')
+    if memoire_flux:
+        print(f"Pic mémoire en flux (blocs de {memoire_flux['taille_bloc']} lignes) : "
+              f"{memoire_flux['pic_quart'] / 2**20:.1f} Mo pour {max(parametres['lignes'] // 4, 1)} lignes, "
+              f"{memoire_flux['pic'] / 2**20:.1f} Mo pour {parametres['lignes']} lignes, "
+              f"stable : {'oui' if resultats['equivalences'].get('memoire_flux', True) else 'NON'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai des fonctions de traitement")
+    parser.add_argument('--lignes', type=int, default=100000, help="Nombre de lignes du journal synthétique")
+    parser.add_argument('--clients', type=int, default=2000, help="Nombre de clients distincts")
+    parser.add_argument('--part-export', type=float, default=0.2, help="Part des clients étrangers (0 à 1)")
+    parser.add_argument('--part-avoirs', type=float, default=0.05, help="Part des avoirs (0 à 1)")
+    parser.add_argument('--graine', type=int, default=0, help="Graine des générateurs aléatoires")
+    parser.add_argument('--repetitions', type=int, default=3, help="Nombre d'exécutions par mesure")
+    parser.add_argument('--lignes-reference', type=int, default=20000, help="Taille de l'échantillon comparé aux anciennes implémentations")
+    parser.add_argument('--dossier', default=os.path.join(tempfile.gettempdir(), 'csv-mam-benchmark'), help="Dossier de cache des données synthétiques")
+    parser.add_argument('--enregistrer', default=None, help="Enregistre les résultats comme référence (JSON)")
+    parser.add_argument('--comparer', default=None, help="Compare les résultats à une référence enregistrée (JSON)")
+    args = parser.parse_args()
+
+    parametres = {
+        'lignes': args.lignes,
+        'clients': args.clients,
+        'part_export': args.part_export,
+        'part_avoirs': args.part_avoirs,
+        'graine': args.graine
+    }
+
+    if args.comparer:
+        # Reprendre les paramètres de la référence pour comparer des mesures comparables
+        with open(args.comparer, encoding='utf-8') as fichier:
+            reference = json.load(fichier)
+        parametres = reference['parametres']
+
+    resultats = executer_banc(parametres, args.dossier, args.repetitions, args.lignes_reference)
+    afficher(resultats)
+
+    if args.enregistrer:
+        with open(args.enregistrer, 'w', encoding='utf-8') as fichier:
+            json.dump(resultats, fichier, ensure_ascii=False, indent=2)
+        print(f"Référence enregistrée : {args.enregistrer}")
+
+    code_retour = 0 if all(resultats['equivalences'].values()) else 1
+
+    if args.comparer:
+        print()
+        if comparer(resultats, reference):
+            code_retour = 1
+
+    return code_retour
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
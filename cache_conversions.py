@@ -0,0 +1,170 @@
+"""
+Cache des conversions
+Conserve, sur disque, les résultats intermédiaires d'une conversion (journal
+lu, balance, fichiers exportés) sous une clé calculée à partir du contenu du
+journal source et des fichiers de référence. Une nouvelle conversion du même
+journal ne refait que les étapes dont les données d'entrée ont changé.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+# Taille maximale du cache sur disque (les entrées les plus anciennes sont supprimées au-delà)
+TAILLE_MAX_CACHE = 500 * 1024 * 1024
+
+
+def get_cache_path():
+    """
+    Obtient le dossier du cache des conversions (Documents/CSV-MAM/cache).
+    """
+    dossier = os.path.join(os.path.expanduser("~"), "Documents", "CSV-MAM", "cache")
+    os.makedirs(dossier, exist_ok=True)
+    return dossier
+
+
+def empreinte_fichier(chemin, taille_bloc=1024 * 1024):
+    """
+    Calcule l'empreinte SHA-256 du contenu d'un fichier, lu par blocs.
+
+    Args:
+        chemin (str): Chemin du fichier.
+        taille_bloc (int): Taille des blocs lus (en octets).
+
+    Returns:
+        str: Empreinte hexadécimale.
+    """
+    condensat = hashlib.sha256()
+    with open(chemin, 'rb') as fichier:
+        for bloc in iter(lambda: fichier.read(taille_bloc), b''):
+            condensat.update(bloc)
+    return condensat.hexdigest()
+
+
+def construire_cle(*parties):
+    """
+    Construit une clé de cache à partir d'empreintes et de paramètres.
+
+    Returns:
+        str: Clé hexadécimale.
+    """
+    return hashlib.sha256('|'.join(str(partie) for partie in parties).encode('utf-8')).hexdigest()
+
+
+class CacheConversions:
+    """
+    Cache sur disque des résultats de conversion, une entrée (pickle) par clé.
+
+    Les entrées sont écrites via un fichier temporaire puis renommées : une
+    conversion interrompue ne laisse jamais d'entrée incomplète. Au-delà de
+    `taille_max`, les entrées utilisées le moins récemment sont supprimées.
+
+    Args:
+        dossier (str): Dossier du cache (par défaut : Documents/CSV-MAM/cache).
+        taille_max (int): Taille maximale du cache, en octets.
+    """
+
+    def __init__(self, dossier=None, taille_max=TAILLE_MAX_CACHE):
+        self.dossier = dossier or get_cache_path()
+        self.taille_max = taille_max
+        os.makedirs(self.dossier, exist_ok=True)
+
+    def _chemin(self, categorie, cle):
+        return os.path.join(self.dossier, f"{categorie}-{cle}.pkl")
+
+    def lire(self, categorie, cle):
+        """
+        Lit une entrée du cache.
+
+        Args:
+            categorie (str): Catégorie de l'entrée ('journal', 'balance', 'sorties').
+            cle (str): Clé de l'entrée.
+
+        Returns:
+            object: Valeur enregistrée, ou None si l'entrée est absente ou illisible.
+        """
+        chemin = self._chemin(categorie, cle)
+        try:
+            with open(chemin, 'rb') as fichier:
+                valeur = pickle.load(fichier)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+        # Marquer l'entrée comme récemment utilisée (ordre de suppression)
+        try:
+            os.utime(chemin)
+        except OSError:
+            pass
+        return valeur
+
+    def ecrire(self, categorie, cle, valeur):
+        """
+        Enregistre une entrée dans le cache, puis applique la taille maximale.
+        Le cache est facultatif : une erreur d'écriture (disque plein, droits)
+        n'interrompt pas la conversion.
+
+        Args:
+            categorie (str): Catégorie de l'entrée.
+            cle (str): Clé de l'entrée.
+            valeur (object): Valeur à enregistrer (sérialisable par pickle).
+
+        Returns:
+            bool: True si l'entrée a été enregistrée.
+        """
+        chemin = self._chemin(categorie, cle)
+        try:
+            descripteur, chemin_temporaire = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=self.dossier)
+        except OSError:
+            return False
+
+        try:
+            with os.fdopen(descripteur, 'wb') as fichier:
+                pickle.dump(valeur, fichier, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(chemin_temporaire, chemin)
+        except (OSError, pickle.PicklingError):
+            if os.path.exists(chemin_temporaire):
+                os.remove(chemin_temporaire)
+            return False
+
+        self.purger()
+        return True
+
+    def purger(self):
+        """
+        Supprime les entrées utilisées le moins récemment jusqu'à respecter la taille maximale.
+
+        Returns:
+            int: Nombre d'entrées supprimées.
+        """
+        entrees = []
+        for nom in os.listdir(self.dossier):
+            if not nom.endswith('.pkl'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.dossier, nom))
+            except OSError:
+                continue
+            entrees.append((stat.st_mtime_ns, stat.st_size, nom))
+
+        taille = sum(entree[1] for entree in entrees)
+        supprimees = 0
+        for _, taille_entree, nom in sorted(entrees):
+            if taille <= self.taille_max:
+                break
+            try:
+                os.remove(os.path.join(self.dossier, nom))
+            except OSError:
+                continue
+            taille -= taille_entree
+            supprimees += 1
+
+        return supprimees
+
+    def vider(self):
+        """
+        Supprime toutes les entrées du cache.
+        """
+        for nom in os.listdir(self.dossier):
+            if nom.endswith('.pkl'):
+                os.remove(os.path.join(self.dossier, nom))
@@ -0,0 +1,127 @@
+"""
+Mesure du temps de démarrage
+Chronomètre chaque import de module et les étapes du démarrage de
+l'interface (fenêtre affichée, préchauffage terminé), pour suivre le temps
+de lancement de l'exécutable Convertisseur-CSV.exe.
+
+Ce module n'importe que des modules déjà chargés par Python au démarrage :
+il peut être installé avant tout autre import.
+"""
+
+import builtins
+import os
+import sys
+import threading
+import time
+
+
+def nom_module(name, globals=None, level=0):
+    """
+    Retourne le nom absolu d'un module importé (les imports relatifs
+    'from . import x' sont résolus par rapport au paquet importateur).
+    """
+    if level == 0:
+        return name
+
+    paquet = (globals or {}).get('__package__') or ''
+    base = paquet.rsplit('.', level - 1)[0] if level > 1 else paquet
+    return f"{base}.{name}" if name else base
+
+
+class MesureImports:
+    """
+    Chronomètre les imports de modules (durée totale et durée propre, hors
+    sous-modules importés) et les étapes du démarrage.
+    """
+
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.imports = []
+        self.evenements = {}
+        self._import_original = None
+        self._pile = threading.local()
+
+    def installer(self):
+        """Remplace builtins.__import__ pour chronométrer les imports suivants"""
+        if self._import_original is None:
+            self._import_original = builtins.__import__
+            builtins.__import__ = self._importer
+
+    def desinstaller(self):
+        """Rétablit builtins.__import__"""
+        if self._import_original is not None:
+            builtins.__import__ = self._import_original
+            self._import_original = None
+
+    def _importer(self, name, globals=None, locals=None, fromlist=(), level=0):
+        importer = self._import_original
+        # Module déjà chargé : rien à mesurer
+        if level == 0 and name in sys.modules:
+            return importer(name, globals, locals, fromlist, level)
+
+        pile = self._pile.__dict__.setdefault('durees_enfants', [])
+        pile.append(0.0)
+        debut = time.perf_counter()
+        try:
+            return importer(name, globals, locals, fromlist, level)
+        finally:
+            duree = time.perf_counter() - debut
+            duree_enfants = pile.pop()
+            if pile:
+                pile[-1] += duree
+            self.imports.append({
+                'module': nom_module(name, globals, level),
+                'debut': debut - self.debut,
+                'duree': duree,
+                'duree_propre': duree - duree_enfants,
+                'thread': threading.current_thread().name
+            })
+
+    def evenement(self, nom):
+        """
+        Enregistre une étape du démarrage (secondes écoulées depuis la création de la mesure).
+        """
+        self.evenements[nom] = time.perf_counter() - self.debut
+
+    def rapport(self, nb_modules=30):
+        """
+        Returns:
+            dict: Étapes du démarrage et modules les plus coûteux (durée propre).
+        """
+        modules = sorted(self.imports, key=lambda mesure: mesure['duree_propre'], reverse=True)
+        return {
+            'executable': sys.executable,
+            'fige': bool(getattr(sys, 'frozen', False)),
+            'evenements': self.evenements,
+            'duree_imports': sum(mesure['duree_propre'] for mesure in self.imports),
+            'modules': modules[:nb_modules]
+        }
+
+    def ecrire_rapport(self, dossier):
+        """
+        Écrit le rapport de démarrage (JSON) et l'affiche sur la console si elle existe.
+
+        Args:
+            dossier (str): Dossier du rapport.
+
+        Returns:
+            str: Chemin du rapport écrit.
+        """
+        import json
+        from datetime import datetime
+
+        rapport = self.rapport()
+        os.makedirs(dossier, exist_ok=True)
+        chemin = os.path.join(dossier, f"demarrage-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+        with open(chemin, 'w', encoding='utf-8') as fichier:
+            json.dump(rapport, fichier, ensure_ascii=False, indent=2)
+
+        # Pas de console dans l'exécutable fenêtré (--windowed) : sys.stderr vaut None
+        if sys.stderr is not None:
+            for nom, instant in rapport['evenements'].items():
+                print(f"{nom:<24} {instant:8.3f}s", file=sys.stderr)
+            for mesure in rapport['modules'][:15]:
+                print(f"  {mesure['module']:<40} {mesure['duree_propre'] * 1000:8.1f} ms  ({mesure['thread']})", file=sys.stderr)
+            print(f"Rapport de démarrage : {chemin}", file=sys.stderr)
+
+        return chemin
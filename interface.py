@@ -1,17 +1,38 @@
-import tkinter as tk
-from tkinter import filedialog, messagebox
 import os
-import shutil
+import sys
+
+# Mesure du temps de démarrage (CSV_MAM_MESURE_DEMARRAGE=1 ou --mesurer-demarrage),
+# installée avant les autres imports pour les chronométrer
+MESURE_DEMARRAGE = None
+if os.environ.get('CSV_MAM_MESURE_DEMARRAGE') == '1' or '--mesurer-demarrage' in sys.argv:
+    from demarrage import MesureImports
+    MESURE_DEMARRAGE = MesureImports()
+    MESURE_DEMARRAGE.installer()
+
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from traitement import valider_fichier, convertir_fichier, generate_balance_file, generate_tiers_file, export_dataframe_to_csv, separer_clients_par_pays, get_resource_path, get_data_file_path
-import pandas as pd
+# pandas et openpyxl ne sont pas importés ici : ils sont chargés en arrière-plan
+# (prechauffer_modules) pour que la fenêtre s'affiche immédiatement
+from archives import archiver_journaux
+from traitement import executer_pipeline, get_resource_path, prechauffer_modules, MESSAGE_ANNULATION
+from cache_conversions import CacheConversions
+from mesures import MesuresPipeline
+from registre import RegistreFactures
+
+if MESURE_DEMARRAGE is not None:
+    MESURE_DEMARRAGE.evenement('imports_termines')
 
 
 class ConversionApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Convertisseur CSV")
-        self.root.geometry("500x200")
+        self.root.geometry("500x385")
         self.root.resizable(False, False)
         
         # Définir l'icône de la fenêtre
@@ -22,9 +43,10 @@ class ConversionApp:
         except Exception:
             pass  # Ignorer si l'icône n'est pas trouvée
         
-        self.fichier_selectionne = None
-        self.dataframe = None  # Stocke le DataFrame en mémoire
+        self.fichiers_selectionnes = []  # Journaux fusionnés en une seule conversion
         self.dossier_destination = None  # Dossier d'export
+        self.annulation = None  # Événement d'annulation de la conversion en cours
+        self.file_messages = None  # Messages du thread de travail vers l'interface
         
         # Frame principal
         main_frame = tk.Frame(root, padx=20, pady=20)
@@ -40,14 +62,14 @@ class ConversionApp:
         self.label_fichier.pack(pady=(0, 15))
         
         # Bouton pour sélectionner le fichier
-        btn_parcourir = tk.Button(
+        self.btn_parcourir = tk.Button(
             main_frame,
             text="📁 Parcourir...",
             command=self.choisir_fichier,
             width=20,
             height=2
         )
-        btn_parcourir.pack(pady=5)
+        self.btn_parcourir.pack(pady=5)
         
         # Bouton pour lancer la conversion
         self.btn_convertir = tk.Button(
@@ -62,26 +84,87 @@ class ConversionApp:
             state=tk.DISABLED
         )
         self.btn_convertir.pack(pady=5)
+        
+        # Conversion incrémentale : ne pas renvoyer au factor les factures déjà exportées.
+        # Les factures exportées sont enregistrées à chaque conversion, case cochée ou non :
+        # la case ne décide que du filtrage (décochée, tout le journal est réexporté)
+        self.incremental = tk.BooleanVar(value=False)
+        self.case_incremental = tk.Checkbutton(
+            main_frame,
+            text="Ignorer les factures déjà exportées",
+            variable=self.incremental
+        )
+        self.case_incremental.pack()
+        
+        # Classeurs avec un onglet par site ou par mois : toutes les feuilles dans une seule balance
+        self.toutes_feuilles = tk.BooleanVar(value=False)
+        self.case_toutes_feuilles = tk.Checkbutton(
+            main_frame,
+            text="Lire toutes les feuilles des classeurs",
+            variable=self.toutes_feuilles
+        )
+        self.case_toutes_feuilles.pack()
+        
+        # Barre de progression et étape en cours
+        self.barre_progression = ttk.Progressbar(main_frame, length=450, mode='determinate', maximum=100)
+        self.barre_progression.pack(pady=(10, 0))
+        
+        self.label_progression = tk.Label(main_frame, text="")
+        self.label_progression.pack()
+        
+        # Bouton pour annuler la conversion
+        self.btn_annuler = tk.Button(
+            main_frame,
+            text="Annuler",
+            command=self.annuler_conversion,
+            width=20,
+            state=tk.DISABLED
+        )
+        self.btn_annuler.pack(pady=5)
+        
+        # Charger pandas, le moteur Excel et les données de référence pendant que l'utilisateur choisit un fichier
+        self.prechauffage = threading.Thread(target=self.prechauffer, daemon=True)
+        self.prechauffage.start()
+    
+    @staticmethod
+    def prechauffer():
+        """Préchauffe les modules de traitement (thread d'arrière-plan)"""
+        try:
+            prechauffer_modules()
+        except Exception:
+            pass  # La conversion chargera les modules elle-même et signalera l'erreur
+        if MESURE_DEMARRAGE is not None:
+            MESURE_DEMARRAGE.evenement('prechauffage_termine')
+    
+    def ecrire_rapport_demarrage(self):
+        """Écrit le rapport de démarrage une fois le préchauffage terminé (mode mesure)"""
+        if self.prechauffage.is_alive():
+            self.root.after(100, self.ecrire_rapport_demarrage)
+            return
+        MESURE_DEMARRAGE.desinstaller()
+        MESURE_DEMARRAGE.ecrire_rapport(os.path.join(os.path.expanduser("~"), "Documents", "CSV-MAM", "demarrage"))
     
     def choisir_fichier(self):
-        """Ouvre la boîte de dialogue pour choisir un fichier"""
-        fichier = filedialog.askopenfilename(
-            title="Sélectionner un fichier",
+        """Ouvre la boîte de dialogue pour choisir un ou plusieurs fichiers"""
+        fichiers = filedialog.askopenfilenames(
+            title="Sélectionner un ou plusieurs fichiers",
             filetypes=[
                 ("Fichiers Excel", "*.xsls;*.xlsx;*.xlsm"),
                 ("Tous les fichiers", "*.*")
             ]
         )
         
-        if fichier:
-            self.fichier_selectionne = fichier
-            nom_fichier = os.path.basename(fichier)
-            self.label_fichier.config(text=f"Fichier sélectionné : {nom_fichier}")
+        if fichiers:
+            self.fichiers_selectionnes = list(fichiers)
+            if len(fichiers) == 1:
+                self.label_fichier.config(text=f"Fichier sélectionné : {os.path.basename(fichiers[0])}")
+            else:
+                self.label_fichier.config(text=f"{len(fichiers)} fichiers sélectionnés (fusionnés en une seule balance)")
             self.btn_convertir.config(state=tk.NORMAL)
     
     def lancer_conversion(self):
-        """Lance la conversion du fichier sélectionné"""
-        if not self.fichier_selectionne:
+        """Lance la conversion du fichier sélectionné dans un thread de travail"""
+        if not self.fichiers_selectionnes:
             messagebox.showwarning("Attention", "Aucun fichier sélectionné")
             return
         
@@ -96,107 +179,149 @@ class ConversionApp:
             messagebox.showerror("Erreur", f"Impossible de créer le dossier d'export :\n{str(e)}")
             return
         
-        # Copier le fichier source dans le dossier de destination
-        try:
-            nom_fichier_source = os.path.basename(self.fichier_selectionne)
-            chemin_copie = os.path.join(self.dossier_destination, nom_fichier_source)
-            shutil.copy2(self.fichier_selectionne, chemin_copie)
-        except Exception as e:
-            messagebox.showerror("Erreur", f"Impossible de copier le fichier source :\n{str(e)}")
-            return
+        # Bloquer les boutons pendant la conversion
+        self.btn_parcourir.config(state=tk.DISABLED)
+        self.btn_convertir.config(state=tk.DISABLED)
+        self.case_incremental.config(state=tk.DISABLED)
+        self.case_toutes_feuilles.config(state=tk.DISABLED)
+        self.btn_annuler.config(state=tk.NORMAL)
+        self.barre_progression['value'] = 0
         
-        # Valider le fichier
-        valide, message_validation = valider_fichier(self.fichier_selectionne)
-        if not valide:
-            messagebox.showerror("Erreur", message_validation)
-            return
+        self.annulation = threading.Event()
+        self.file_messages = queue.Queue()
         
-        # Convertir le fichier
-        success, resultat = convertir_fichier(self.fichier_selectionne)
+        thread = threading.Thread(
+            target=self.executer_conversion,
+            args=(self.fichiers_selectionnes, self.dossier_destination, self.annulation, self.file_messages, self.incremental.get(), self.toutes_feuilles.get()),
+            daemon=True
+        )
+        thread.start()
         
-        if success:
-            self.dataframe = resultat
-            nb_lignes, nb_colonnes = self.dataframe.shape
-            messagebox.showinfo(
-                "Succès", 
-                f"Fichier chargé avec succès !\n\nLignes : {nb_lignes}\nColonnes : {nb_colonnes}"
-            )
-        else:
-            messagebox.showerror("Erreur", resultat)
-            return
+        self.root.after(100, self.verifier_file_messages)
+    
+    @staticmethod
+    def executer_conversion(fichiers, dossier_destination, annulation, file_messages, incremental=False, toutes_feuilles=False):
+        """
+        Exécute la conversion (thread de travail). Aucun appel à tkinter ici :
+        l'avancement et le résultat passent par la file de messages.
+        """
+        def progression(message, pourcentage):
+            file_messages.put(('progression', message, pourcentage))
         
-        # Générer le Dataframe Balance
-        df_balance = generate_balance_file(self.dataframe)
-
-        # Charger les données clients pour la séparation
-        df_clients = pd.read_csv(get_data_file_path('clients_siret.csv'), sep=';', encoding='utf-8-sig')
+        # Mesures des étapes (pic mémoire et profilage activables par variables d'environnement)
+        mesures = MesuresPipeline(
+            mesurer_memoire=os.environ.get('CSV_MAM_MESURER_MEMOIRE') == '1',
+            profiler=os.environ.get('CSV_MAM_PROFIL') == '1'
+        )
         
-        # Séparer les clients français et étrangers
-        df_balance_fr, df_balance_etranger = separer_clients_par_pays(df_balance, df_clients)
+        try:
+            # Archiver les journaux sources pendant la conversion : chaque contenu
+            # n'est stocké qu'une fois, le dossier du jour n'en reçoit qu'un lien
+            progression("Démarrage de la conversion", 0)
+            with ThreadPoolExecutor(max_workers=1) as executeur:
+                archivage = executeur.submit(archiver_journaux, fichiers, dossier_destination)
+                
+                # Registre toujours tenu à jour : sans la case, rien n'est filtré mais tout est enregistré
+                registre = RegistreFactures(reexporter=not incremental)
+                # Cache des conversions : un journal déjà converti n'est ni relu ni reconverti
+                cache = None if os.environ.get('CSV_MAM_SANS_CACHE') == '1' else CacheConversions()
+                sources = fichiers[0] if len(fichiers) == 1 else fichiers
+                mesures.demarrer()
+                success, resultat = executer_pipeline(sources, dossier_destination, progression=progression, annulation=annulation, mesures=mesures, registre=registre, cache=cache, sheet_name=None if toutes_feuilles else 0)
+                
+                # Une archive en échec n'invalide pas les fichiers exportés : elle est signalée
+                try:
+                    archives = archivage.result()
+                except Exception as e:
+                    archives = {'erreur': f"Impossible d'archiver le fichier source :\n{str(e)}"}
+            if success:
+                resultat['archivage'] = archives
+            file_messages.put(('termine', success, resultat))
+        except Exception as e:
+            file_messages.put(('termine', False, f"Erreur inattendue : {str(e)}"))
+    
+    def verifier_file_messages(self):
+        """Traite les messages du thread de travail (thread de l'interface)"""
+        try:
+            while True:
+                message = self.file_messages.get_nowait()
+                if message[0] == 'progression':
+                    _, texte, pourcentage = message
+                    self.label_progression.config(text=texte)
+                    self.barre_progression['value'] = pourcentage
+                else:
+                    _, success, resultat = message
+                    self.terminer_conversion(success, resultat)
+                    return
+        except queue.Empty:
+            pass
         
-        fichiers_exportes = []
-        tous_clients_non_identifies = set()
+        self.root.after(100, self.verifier_file_messages)
+    
+    def annuler_conversion(self):
+        """Demande l'annulation de la conversion en cours"""
+        if self.annulation is not None:
+            self.annulation.set()
+            self.btn_annuler.config(state=tk.DISABLED)
+            self.label_progression.config(text="Annulation en cours...")
+    
+    def terminer_conversion(self, success, resultat):
+        """Affiche le résultat de la conversion et réactive l'interface"""
+        self.btn_parcourir.config(state=tk.NORMAL)
+        self.btn_convertir.config(state=tk.NORMAL)
+        self.case_incremental.config(state=tk.NORMAL)
+        self.case_toutes_feuilles.config(state=tk.NORMAL)
+        self.btn_annuler.config(state=tk.DISABLED)
+        self.annulation = None
         
-        # Traiter les clients français (1A)
-        if not df_balance_fr.empty and len(df_balance_fr) > 2:  # Plus que juste les lignes début/fin
-            
-            # Exporter Balance FR
-            success, message = export_dataframe_to_csv(df_balance_fr, "balance", "1A", self.dossier_destination)
-            if success:
-                fichiers_exportes.append(message)
-            else:
-                messagebox.showerror("Erreur", message)
-                return
-            
-            # Générer et exporter Tiers FR
-            df_tiers_fr, clients_non_identifies_fr = generate_tiers_file(df_balance_fr.copy())
-            tous_clients_non_identifies.update(clients_non_identifies_fr)
-            
-            success, message = export_dataframe_to_csv(df_tiers_fr, "tiers", "1A", self.dossier_destination)
-            if success:
-                fichiers_exportes.append(message)
+        if not success:
+            self.label_progression.config(text=resultat.splitlines()[0])
+            if resultat == MESSAGE_ANNULATION:
+                messagebox.showinfo("Annulation", resultat)
             else:
-                messagebox.showerror("Erreur", message)
-                return
-        
-        # Traiter les clients étrangers (1B)
-        if not df_balance_etranger.empty and len(df_balance_etranger) > 2:  # Plus que juste les lignes début/fin
-            
-            # Exporter Balance étranger
-            success, message = export_dataframe_to_csv(df_balance_etranger, "balance", "1B", self.dossier_destination)
-            if success:
-                fichiers_exportes.append(message)
-            else:
-                messagebox.showerror("Erreur", message)
-                return
-            
-            # Générer et exporter Tiers étranger
-            df_tiers_etranger, clients_non_identifies_etr = generate_tiers_file(df_balance_etranger.copy())
-            tous_clients_non_identifies.update(clients_non_identifies_etr)
-            
-            success, message = export_dataframe_to_csv(df_tiers_etranger, "tiers", "1B", self.dossier_destination)
-            if success:
-                fichiers_exportes.append(message)
-            else:
-                messagebox.showerror("Erreur", message)
-                return
+                messagebox.showerror("Erreur", resultat)
+            return
         
         # Afficher les clients non identifiés s'il y en a
-        # Filtrer les valeurs vides
-        clients_valides = {c for c in tous_clients_non_identifies if c and str(c).strip() and str(c) not in ['000000', '999999']}
+        clients_valides = resultat['clients_non_identifies']
         if clients_valides:
             messagebox.showwarning(
                 "Clients non identifiés",
-                f"Les clients suivants n'ont pas été identifiés :\n{', '.join(sorted(clients_valides))}\n\nVeuillez vérifier les codes clients."
+                f"Les clients suivants n'ont pas été identifiés :\n{', '.join(clients_valides)}\n\nVeuillez vérifier les codes clients."
             )
         
         # Afficher un message de succès global
-        message_final = "Conversion terminée avec succès !\n\nFichiers exportés :\n" + "\n".join(fichiers_exportes)
-        messagebox.showinfo("Succès", message_final)
+        fichiers_exportes = [f"Fichier exporté avec succès : {chemin}" for chemin in resultat['fichiers_exportes']]
+        lignes_deja_exportees = f" ({resultat['lignes_deja_exportees']} déjà exportées, ignorées)" if resultat.get('lignes_deja_exportees') else ""
+        message_final = f"Conversion terminée avec succès !\n\nLignes : {resultat['lignes']}{lignes_deja_exportees}\n\nFichiers exportés :\n" + "\n".join(fichiers_exportes)
+        if resultat.get('anomalies'):
+            message_final += f"\n\n{resultat['anomalies']['message']}"
+        rapprochement = resultat.get('rapprochement')
+        if rapprochement:
+            message_final += f"\n\n{rapprochement['message']}"
+        registre = resultat.get('registre')
+        if registre and registre['ecarts']:
+            message_final += "\n\nÉcarts de rapprochement : les factures ne sont pas enregistrées comme exportées."
+        elif registre and registre['clients_non_identifies']:
+            message_final += f"\n\n{registre['clients_non_identifies']} facture(s) de clients non identifiés non enregistrée(s) comme exportée(s) : elles seront reproposées une fois la base clients corrigée."
+        archivage = resultat.get('archivage')
+        if archivage and archivage.get('erreur'):
+            message_final += f"\n\n{archivage['erreur']}"
+        if rapprochement and rapprochement['ecarts']:
+            messagebox.showwarning("Écarts de rapprochement", message_final)
+        else:
+            messagebox.showinfo("Succès", message_final)
 
 def main():
+    # Nécessaire pour le pool de processus de lecture dans l'exécutable PyInstaller
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = ConversionApp(root)
+    if MESURE_DEMARRAGE is not None:
+        # Afficher la fenêtre avant de relever l'instant d'affichage
+        root.update()
+        MESURE_DEMARRAGE.evenement('fenetre_affichee')
+        app.ecrire_rapport_demarrage()
     root.mainloop()
 
 
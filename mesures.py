@@ -0,0 +1,135 @@
+"""
+Module de mesure des performances
+Enregistre, pour chaque étape de la conversion, la durée, le nombre de lignes
+et le pic mémoire, avec un profilage cProfile optionnel, et écrit un rapport
+d'exécution JSON/CSV à côté des fichiers exportés.
+"""
+
+import csv
+import json
+import os
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+class MesuresPipeline:
+    """
+    Collecte les mesures des étapes d'une conversion.
+
+    Args:
+        mesurer_memoire (bool): Mesure le pic mémoire de chaque étape (tracemalloc, plus lent).
+        profiler (bool): Profile la conversion avec cProfile.
+    """
+
+    def __init__(self, mesurer_memoire=False, profiler=False):
+        self.mesurer_memoire = mesurer_memoire
+        self.profiler = profiler
+        self.etapes = []
+        self.debut = datetime.now()
+        self.profil = None
+        self._tracemalloc_demarre = False
+
+    def demarrer(self):
+        """Démarre le traçage mémoire et le profilage demandés"""
+        if self.mesurer_memoire and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracemalloc_demarre = True
+        if self.profiler and self.profil is None:
+            import cProfile
+            self.profil = cProfile.Profile()
+            self.profil.enable()
+
+    def arreter(self):
+        """Arrête le traçage mémoire et le profilage"""
+        if self.profil is not None:
+            self.profil.disable()
+        if self._tracemalloc_demarre:
+            tracemalloc.stop()
+            self._tracemalloc_demarre = False
+
+    @contextmanager
+    def etape(self, nom):
+        """
+        Mesure une étape. Le dictionnaire fourni peut être complété par
+        l'appelant (ex: mesure['lignes'] = len(df)).
+
+        Args:
+            nom (str): Nom de l'étape.
+        """
+        mesure = {'etape': nom, 'duree': None, 'lignes': None, 'memoire_pic': None}
+        memoire_initiale = None
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            memoire_initiale = tracemalloc.get_traced_memory()[0]
+
+        debut = time.perf_counter()
+        try:
+            yield mesure
+        finally:
+            mesure['duree'] = time.perf_counter() - debut
+            if memoire_initiale is not None:
+                mesure['memoire_pic'] = tracemalloc.get_traced_memory()[1] - memoire_initiale
+            self.etapes.append(mesure)
+
+    def durees(self):
+        """
+        Returns:
+            dict: Durée cumulée (en secondes) par étape.
+        """
+        durees = {}
+        for mesure in self.etapes:
+            durees[mesure['etape']] = durees.get(mesure['etape'], 0.0) + mesure['duree']
+        return durees
+
+    def ecrire_rapport(self, dossier_destination, chemin_fichier):
+        """
+        Écrit le rapport d'exécution (JSON et CSV, et profil si demandé) dans le dossier d'export.
+
+        Args:
+            dossier_destination (str): Dossier des fichiers exportés.
+            chemin_fichier (str): Journal converti.
+
+        Returns:
+            list: Chemins des fichiers de rapport écrits.
+        """
+        import pandas as pd
+
+        nom_base = f"rapport-{Path(chemin_fichier).stem}-{self.debut.strftime('%H%M%S')}"
+        chemin_json = os.path.join(dossier_destination, nom_base + '.json')
+        chemin_csv = os.path.join(dossier_destination, nom_base + '.csv')
+
+        rapport = {
+            'date': self.debut.isoformat(timespec='seconds'),
+            'fichier': chemin_fichier,
+            'taille_fichier': os.path.getsize(chemin_fichier) if os.path.exists(chemin_fichier) else None,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'duree_totale': sum(mesure['duree'] for mesure in self.etapes),
+            'etapes': self.etapes
+        }
+        with open(chemin_json, 'w', encoding='utf-8') as fichier:
+            json.dump(rapport, fichier, ensure_ascii=False, indent=2)
+
+        with open(chemin_csv, 'w', encoding='utf-8', newline='') as fichier:
+            writer = csv.writer(fichier, delimiter=';')
+            writer.writerow(['fichier', 'etape', 'duree', 'lignes', 'memoire_pic'])
+            for mesure in self.etapes:
+                writer.writerow([os.path.basename(chemin_fichier), mesure['etape'], f"{mesure['duree']:.6f}", mesure['lignes'], mesure['memoire_pic']])
+
+        chemins = [chemin_json, chemin_csv]
+
+        if self.profil is not None:
+            import pstats
+
+            chemin_profil = os.path.join(dossier_destination, nom_base + '.prof')
+            self.profil.dump_stats(chemin_profil)
+            chemin_texte = os.path.join(dossier_destination, nom_base + '-profil.txt')
+            with open(chemin_texte, 'w', encoding='utf-8') as fichier:
+                pstats.Stats(self.profil, stream=fichier).sort_stats('cumulative').print_stats(40)
+            chemins += [chemin_profil, chemin_texte]
+
+        return chemins
@@ -0,0 +1,266 @@
+"""
+Totaux de contrôle et rapprochement
+Calcule les totaux de contrôle de chaque fichier exporté (pièces, factures,
+avoirs, montants, clients distincts) sur les DataFrames déjà en mémoire au
+moment de l'export, et les rapproche des totaux du journal source : les
+fichiers CSV écrits n'ont plus à être relus pour vérifier qu'ils s'additionnent.
+"""
+
+import os
+
+COLONNES_RAPPROCHEMENT = ['Fichier', 'Type', 'Cédant', 'Branche', 'Lignes', 'Factures', 'Avoirs', 'Montant factures', 'Montant avoirs', 'Montant net', 'Clients', 'Clients non identifiés']
+
+# Totaux additionnés d'un bloc à l'autre (lecture par blocs) ; les montants sont en centimes
+TOTAUX_CUMULABLES = ['lignes', 'factures', 'avoirs', 'montant_factures', 'montant_avoirs', 'montant', 'clients_non_identifies']
+
+
+def totaux_montants(est_avoir, centimes):
+    """
+    Compte les factures et les avoirs et totalise leurs montants (centimes).
+
+    Args:
+        est_avoir (ndarray): Masque des avoirs.
+        centimes (array-like): Montants en centimes (signés : négatifs pour les avoirs).
+
+    Returns:
+        dict: lignes, factures, avoirs, montant_factures, montant_avoirs, montant (net).
+    """
+    import numpy as np
+    import pandas as pd
+
+    centimes = pd.Series(centimes)
+    est_avoir = np.asarray(est_avoir, dtype=bool)
+    montant_factures = int(centimes[~est_avoir].sum())
+    montant_avoirs = int(centimes[est_avoir].sum())
+
+    return {
+        'lignes': len(centimes),
+        'factures': int((~est_avoir).sum()),
+        'avoirs': int(est_avoir.sum()),
+        'montant_factures': montant_factures,
+        'montant_avoirs': montant_avoirs,
+        'montant': montant_factures + montant_avoirs
+    }
+
+
+def totaux_journal(df_source):
+    """
+    Totaux de contrôle du journal source, calculés indépendamment de la
+    balance : avoirs repérés par le code règlement (première lettre 'A'),
+    montants T.T.C. bruts arrondis ligne par ligne au centime (entier), puis
+    additionnés, comme les montants écrits dans la balance : un journal à
+    plus de 2 décimales ne crée pas d'écart. Les avoirs sont saisis en
+    montants positifs dans le journal : leur total est reporté en négatif,
+    comme dans la balance.
+
+    Args:
+        df_source (DataFrame): Journal (lignes converties).
+
+    Returns:
+        dict: Totaux (mêmes clés que totaux_montants).
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes, reglements = pd.factorize(df_source['Règlement'], use_na_sentinel=False)
+    est_avoir = np.array([str(reglement)[:1] == 'A' for reglement in reglements], dtype=bool)[codes]
+    from traitement import montants_en_centimes
+
+    # Centimes entiers ligne par ligne, même règle d'arrondi que la balance : l'arrondi précède la somme
+    montants = pd.to_numeric(df_source['Montant T.T.C.'], errors='coerce').to_numpy(dtype=float)
+    centimes = np.asarray(pd.Series(montants_en_centimes(montants)).fillna(0), dtype=np.int64)
+
+    montant_factures = int(centimes[~est_avoir].sum())
+    montant_avoirs = -abs(int(centimes[est_avoir].sum()))
+
+    return {
+        'lignes': len(centimes),
+        'factures': int((~est_avoir).sum()),
+        'avoirs': int(est_avoir.sum()),
+        'montant_factures': montant_factures,
+        'montant_avoirs': montant_avoirs,
+        'montant': montant_factures + montant_avoirs
+    }
+
+
+def totaux_balance(df_balance):
+    """
+    Totaux de contrôle d'un fichier Balance (hors lignes de début et de fin).
+
+    Args:
+        df_balance (DataFrame): Balance exportée.
+
+    Returns:
+        dict: Totaux (voir totaux_montants) et nombre de clients distincts.
+    """
+    donnees = df_balance[~df_balance['Code vendeur cédant'].isin(['000000', '999999'])]
+    totaux = totaux_montants(donnees['Type de la pièce'].to_numpy(dtype=object) == 'AVO', donnees['Montant en devise'])
+    totaux['clients'] = int(donnees['Code client'].nunique(dropna=False))
+    return totaux
+
+
+def totaux_tiers(df_tiers, clients_non_identifies=()):
+    """
+    Totaux de contrôle d'un fichier Tiers (hors lignes de début et de fin).
+
+    Args:
+        df_tiers (DataFrame): Tiers exportés.
+        clients_non_identifies (set): Clients de la balance absents de la base clients.
+
+    Returns:
+        dict: lignes, clients (une ligne par client) et clients non identifiés.
+    """
+    lignes = int((~df_tiers['Code vendeur cédant'].isin(['000000', '999999'])).sum())
+    return {'lignes': lignes, 'clients': lignes, 'clients_non_identifies': len(clients_non_identifies)}
+
+
+def cumuler_totaux(cumul, totaux):
+    """
+    Ajoute les totaux d'un bloc au cumul (lecture par blocs).
+
+    Args:
+        cumul (dict): Totaux cumulés, complétés sur place.
+        totaux (dict): Totaux du bloc.
+
+    Returns:
+        dict: Le cumul.
+    """
+    for cle in TOTAUX_CUMULABLES:
+        if cle in totaux:
+            cumul[cle] = cumul.get(cle, 0) + totaux[cle]
+    return cumul
+
+
+def rapprocher(totaux_source, totaux_fichiers):
+    """
+    Rapproche les totaux des fichiers exportés de ceux du journal.
+
+    Vérifie que les fichiers Balance reprennent toutes les pièces du journal
+    (nombre, factures, avoirs, montants) et que chaque fichier Tiers contient
+    un client par client distinct de sa balance (clients non identifiés compris).
+
+    Args:
+        totaux_source (dict): Totaux du journal (totaux_journal).
+        totaux_fichiers (list): Totaux de chaque fichier exporté ('fichier',
+            'type', 'cedant', 'branche' et totaux).
+
+    Returns:
+        list: Écarts constatés (messages), vide si tout concorde.
+    """
+    ecarts = []
+    balances = [totaux for totaux in totaux_fichiers if totaux['type'] == 'balance']
+
+    for cle, libelle, montant in [
+        ('lignes', "Pièces", False),
+        ('factures', "Factures", False),
+        ('avoirs', "Avoirs", False),
+        ('montant_factures', "Montant des factures", True),
+        ('montant_avoirs', "Montant des avoirs", True),
+        ('montant', "Montant net", True)
+    ]:
+        exporte = sum(totaux[cle] for totaux in balances)
+        if exporte != totaux_source[cle]:
+            formater = formater_montant if montant else str
+            ecarts.append(f"{libelle} : journal {formater(totaux_source[cle])}, fichiers Balance {formater(exporte)}")
+
+    tiers = {(totaux['cedant'], totaux['branche']): totaux for totaux in totaux_fichiers if totaux['type'] == 'tiers'}
+    for balance in balances:
+        fichier_tiers = tiers.get((balance['cedant'], balance['branche']))
+        clients_tiers = fichier_tiers['clients'] + fichier_tiers['clients_non_identifies'] if fichier_tiers else 0
+        if clients_tiers != balance['clients']:
+            ecarts.append(f"Clients {balance['fichier']} : {balance['clients']} dans la balance, {clients_tiers} dans le fichier Tiers (clients non identifiés compris)")
+
+    return ecarts
+
+
+def formater_montant(centimes):
+    """Formate un montant en centimes en euros (virgule décimale)"""
+    import pandas as pd
+
+    from traitement import formater_centimes
+
+    return formater_centimes(pd.Series([centimes]))[0]
+
+
+def ecrire_rapprochement(totaux_source, totaux_fichiers, dossier_destination, chemin_fichier):
+    """
+    Écrit le rapport de rapprochement (CSV ';', UTF-8 avec BOM, lisible par Excel)
+    dans le dossier d'export : une ligne par fichier exporté, le total des
+    fichiers Balance et les totaux du journal.
+
+    Args:
+        totaux_source (dict): Totaux du journal.
+        totaux_fichiers (list): Totaux de chaque fichier exporté.
+        dossier_destination (str): Dossier des fichiers exportés.
+        chemin_fichier (str): Journal converti.
+
+    Returns:
+        str: Chemin du rapport écrit.
+    """
+    from datetime import datetime
+    from pathlib import Path
+
+    import pandas as pd
+
+    from traitement import formater_centimes
+
+    balances = [totaux for totaux in totaux_fichiers if totaux['type'] == 'balance']
+    total_balances = {cle: sum(totaux[cle] for totaux in balances) for cle in ['lignes', 'factures', 'avoirs', 'montant_factures', 'montant_avoirs', 'montant', 'clients']}
+    lignes = totaux_fichiers + [
+        {'fichier': 'Total des fichiers Balance', **total_balances},
+        {'fichier': f"Journal {os.path.basename(chemin_fichier)}", **totaux_source}
+    ]
+
+    df_rapport = pd.DataFrame({
+        'Fichier': [ligne['fichier'] for ligne in lignes],
+        'Type': [ligne.get('type', '') for ligne in lignes],
+        'Cédant': [ligne.get('cedant', '') for ligne in lignes],
+        'Branche': [ligne.get('branche', '') for ligne in lignes],
+        'Lignes': [ligne['lignes'] for ligne in lignes],
+        'Factures': [ligne.get('factures') for ligne in lignes],
+        'Avoirs': [ligne.get('avoirs') for ligne in lignes],
+        'Montant factures': formater_centimes(pd.Series([ligne.get('montant_factures') for ligne in lignes], dtype='Int64')),
+        'Montant avoirs': formater_centimes(pd.Series([ligne.get('montant_avoirs') for ligne in lignes], dtype='Int64')),
+        'Montant net': formater_centimes(pd.Series([ligne.get('montant') for ligne in lignes], dtype='Int64')),
+        'Clients': [ligne.get('clients') for ligne in lignes],
+        'Clients non identifiés': [ligne.get('clients_non_identifies') for ligne in lignes]
+    }, columns=COLONNES_RAPPROCHEMENT)
+    # Totaux sans objet (factures d'un fichier Tiers...) : cellules vides
+    df_rapport = df_rapport.astype({colonne: 'Int64' for colonne in ['Factures', 'Avoirs', 'Clients', 'Clients non identifiés']})
+
+    os.makedirs(dossier_destination, exist_ok=True)
+    chemin = os.path.join(dossier_destination, f"rapprochement-{Path(chemin_fichier).stem}-{datetime.now().strftime('%H%M%S')}.csv")
+    df_rapport.to_csv(chemin, sep=';', index=False, encoding='utf-8-sig')
+    return chemin
+
+
+def rapporter_rapprochement(totaux_source, totaux_fichiers, dossier_destination=None, chemin_fichier=None):
+    """
+    Rapproche les fichiers exportés du journal, écrit le rapport et prépare le message affiché.
+
+    Args:
+        totaux_source (dict): Totaux du journal (totaux_journal).
+        totaux_fichiers (list): Totaux de chaque fichier exporté.
+        dossier_destination (str): Dossier du rapport (optionnel : sans dossier,
+            seul le message est produit).
+        chemin_fichier (str): Journal converti.
+
+    Returns:
+        dict: journal (totaux), fichiers (totaux par fichier), ecarts, rapport
+            (chemin ou None) et message.
+    """
+    ecarts = rapprocher(totaux_source, totaux_fichiers)
+    rapport = ecrire_rapprochement(totaux_source, totaux_fichiers, dossier_destination, chemin_fichier) if dossier_destination else None
+
+    if ecarts:
+        message = "Écarts entre le journal et les fichiers exportés :\n" + '\n'.join(f"- {ecart}" for ecart in ecarts)
+    else:
+        message = (
+            f"Totaux de contrôle rapprochés du journal : {totaux_source['lignes']} pièces "
+            f"({totaux_source['factures']} factures, {totaux_source['avoirs']} avoirs), "
+            f"montant net {formater_montant(totaux_source['montant'])} €"
+        )
+    if rapport:
+        message += f"\nRapport de rapprochement : {rapport}"
+
+    return {'journal': totaux_source, 'fichiers': totaux_fichiers, 'ecarts': ecarts, 'rapport': rapport, 'message': message}
@@ -0,0 +1,238 @@
+"""
+Registre des factures exportées
+Conserve, dans une base SQLite locale, les factures déjà transmises au
+factor (N° de facture, client, montant) pour ne traiter que les nouvelles
+lignes d'un journal cumulatif.
+"""
+
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+
+def get_registre_path():
+    """
+    Obtient le chemin du registre des factures exportées
+    (Documents/CSV-MAM/registre-factures.sqlite).
+    """
+    dossier = os.path.join(os.path.expanduser("~"), "Documents", "CSV-MAM")
+    os.makedirs(dossier, exist_ok=True)
+    return os.path.join(dossier, "registre-factures.sqlite")
+
+
+def normaliser_codes(serie):
+    """
+    Convertit des N° de facture ou codes clients en texte, comme dans les
+    fichiers exportés (100000.0 devient '100000', une valeur vide devient '').
+    Seules les valeurs distinctes sont converties.
+    """
+    import pandas as pd
+
+    def normaliser(valeur):
+        if isinstance(valeur, float) and valeur.is_integer():
+            return str(int(valeur))
+        return str(valeur)
+
+    codes, uniques = pd.factorize(serie)
+    textes = [normaliser(valeur) for valeur in uniques] + ['']
+    # Les valeurs manquantes (code -1) pointent sur le dernier élément : ''
+    return pd.Series([textes[code] for code in codes], index=serie.index, dtype=object)
+
+
+def cles_factures(df_source):
+    """
+    Construit les clés du registre pour chaque ligne du journal.
+
+    Args:
+        df_source (DataFrame): Journal (colonnes N°Fact., Client, Montant T.T.C.).
+
+    Returns:
+        DataFrame: Colonnes numero, client (texte) et montant (en centimes,
+            entier, None si le montant n'est pas numérique).
+    """
+    import numpy as np
+    import pandas as pd
+
+    # Centimes entiers : pas d'écart d'arrondi entre deux lectures du même montant
+    centimes = np.round(pd.to_numeric(df_source['Montant T.T.C.'], errors='coerce').to_numpy(dtype=float) * 100)
+    montants = [None if np.isnan(montant) else int(montant) for montant in centimes]
+
+    return pd.DataFrame({
+        'numero': normaliser_codes(df_source['N°Fact.']),
+        'client': normaliser_codes(df_source['Client']),
+        'montant': pd.Series(montants, index=df_source.index, dtype=object)
+    }, index=df_source.index)
+
+
+def origine_export(chemin_fichier):
+    """
+    Returns:
+        tuple: (noms du ou des journaux d'origine, ou None ; date de l'export)
+    """
+    chemins_fichiers = [chemin_fichier] if isinstance(chemin_fichier, str) else (chemin_fichier or [])
+    fichier = ', '.join(os.path.basename(chemin) for chemin in chemins_fichiers) or None
+    return fichier, datetime.now().isoformat(timespec='seconds')
+
+
+class RegistreFactures:
+    """
+    Registre SQLite des factures déjà exportées.
+
+    Une connexion est ouverte à chaque opération : le registre peut être
+    utilisé depuis le thread de conversion ou depuis plusieurs processus.
+
+    Args:
+        chemin (str): Chemin de la base (par défaut : Documents/CSV-MAM/registre-factures.sqlite).
+        reexporter (bool): Réexporte tout le journal, factures déjà exportées
+            comprises ; les factures exportées sont tout de même enregistrées.
+    """
+
+    def __init__(self, chemin=None, reexporter=False):
+        self.chemin = chemin or get_registre_path()
+        self.reexporter = reexporter
+        with closing(self._connecter()) as connexion, connexion:
+            connexion.execute(
+                "CREATE TABLE IF NOT EXISTS factures ("
+                " numero TEXT NOT NULL,"
+                " client TEXT NOT NULL,"
+                " montant INTEGER,"
+                " fichier TEXT,"
+                " date_export TEXT,"
+                " PRIMARY KEY (numero, client, montant))"
+            )
+
+    def _connecter(self):
+        # Délai d'attente : plusieurs conversions en lot peuvent écrire en même temps
+        return sqlite3.connect(self.chemin, timeout=30)
+
+    def filtrer(self, df_source):
+        """
+        Retire du journal les factures déjà exportées (aucune en réexportation).
+
+        Args:
+            df_source (DataFrame): Journal.
+
+        Returns:
+            tuple: (DataFrame des nouvelles lignes, nombre de lignes déjà exportées)
+        """
+        if df_source.empty or self.reexporter:
+            return df_source, 0
+
+        cles = cles_factures(df_source)
+        lignes = zip(range(len(cles)), cles['numero'], cles['client'], cles['montant'])
+
+        # Jointure avec une table temporaire : la recherche utilise la clé primaire
+        with closing(self._connecter()) as connexion:
+            connexion.execute("CREATE TEMP TABLE candidats (position INTEGER, numero TEXT, client TEXT, montant INTEGER)")
+            connexion.executemany("INSERT INTO candidats VALUES (?, ?, ?, ?)", lignes)
+            positions = [position for (position,) in connexion.execute(
+                "SELECT c.position FROM candidats c"
+                " JOIN factures f ON f.numero = c.numero AND f.client = c.client AND f.montant = c.montant"
+            )]
+
+        if not positions:
+            return df_source, 0
+
+        masque = [True] * len(df_source)
+        for position in positions:
+            masque[position] = False
+        return df_source[masque], len(positions)
+
+    def enregistrer(self, df_source, chemin_fichier=None):
+        """
+        Enregistre les factures d'un journal comme exportées.
+
+        Args:
+            df_source (DataFrame): Lignes exportées du journal.
+            chemin_fichier (str|list): Journal(aux) d'origine (conservé(s) pour information).
+
+        Returns:
+            int: Nombre de factures ajoutées au registre.
+        """
+        if df_source.empty:
+            return 0
+
+        cles = cles_factures(df_source)
+        fichier, date_export = origine_export(chemin_fichier)
+        lignes = [(numero, client, montant, fichier, date_export) for numero, client, montant in zip(cles['numero'], cles['client'], cles['montant'])]
+
+        with closing(self._connecter()) as connexion, connexion:
+            avant = connexion.total_changes
+            connexion.executemany("INSERT OR IGNORE INTO factures VALUES (?, ?, ?, ?, ?)", lignes)
+            return connexion.total_changes - avant
+
+    def nombre_factures(self):
+        """
+        Returns:
+            int: Nombre de factures enregistrées.
+        """
+        with closing(self._connecter()) as connexion:
+            return connexion.execute("SELECT COUNT(*) FROM factures").fetchone()[0]
+
+
+class FacturesEnAttente:
+    """
+    Factures exportées en attente d'enregistrement au registre (conversion en flux).
+
+    Les clés de chaque bloc sont écrites dans une base SQLite temporaire sur
+    disque, supprimée à la fermeture : la mémoire utilisée ne dépend pas de
+    la longueur du journal. Elles ne sont reportées dans le registre qu'à la
+    fin du flux, en une seule requête.
+
+    Args:
+        registre (RegistreFactures): Registre de destination.
+    """
+
+    def __init__(self, registre):
+        self.registre = registre
+        # Nom vide : base temporaire privée, sur disque au-delà du cache de pages
+        self._connexion = sqlite3.connect('', timeout=30)
+        with self._connexion:
+            self._connexion.execute(
+                "CREATE TABLE factures ("
+                " numero TEXT NOT NULL,"
+                " client TEXT NOT NULL,"
+                " montant INTEGER,"
+                " PRIMARY KEY (numero, client, montant))"
+            )
+
+    def ajouter(self, df_source):
+        """
+        Ajoute les factures d'un bloc exporté.
+
+        Args:
+            df_source (DataFrame): Lignes exportées du bloc.
+        """
+        if df_source.empty:
+            return
+        cles = cles_factures(df_source)
+        with self._connexion:
+            self._connexion.executemany("INSERT OR IGNORE INTO factures VALUES (?, ?, ?)", zip(cles['numero'], cles['client'], cles['montant']))
+
+    def enregistrer(self, chemin_fichier=None):
+        """
+        Enregistre au registre toutes les factures en attente.
+
+        Args:
+            chemin_fichier (str|list): Journal(aux) d'origine (conservé(s) pour information).
+
+        Returns:
+            int: Nombre de factures ajoutées au registre.
+        """
+        fichier, date_export = origine_export(chemin_fichier)
+        self._connexion.execute("ATTACH DATABASE ? AS registre", (self.registre.chemin,))
+        try:
+            with self._connexion:
+                avant = self._connexion.total_changes
+                self._connexion.execute(
+                    "INSERT OR IGNORE INTO registre.factures SELECT numero, client, montant, ?, ? FROM main.factures",
+                    (fichier, date_export)
+                )
+                return self._connexion.total_changes - avant
+        finally:
+            self._connexion.execute("DETACH DATABASE registre")
+
+    def close(self):
+        """Ferme (et supprime) la base temporaire."""
+        self._connexion.close()
@@ -0,0 +1,359 @@
+"""
+Surveillance d'un dossier de dépôt
+Service de longue durée qui convertit chaque journal Excel déposé dans un
+dossier (par l'ERP, tout au long de la journée) dès qu'il est complètement
+écrit. pandas, le moteur Excel et les données de référence sont chargés une
+seule fois au démarrage : chaque journal ne coûte que sa conversion.
+
+Utilisation :
+    python surveillance.py "\\\\serveur\\depot-journaux" --incremental
+    python surveillance.py depot --sortie exports --scrutation --intervalle 5
+
+Les journaux convertis sont déplacés dans le sous-dossier 'traites' du
+dossier surveillé (ou 'erreurs' en cas d'échec) ; les fichiers exportés sont
+écrits dans csv-export/<date>/<journal>. Un résumé JSON par journal est
+écrit sur la sortie standard.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import queue
+import shutil
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from batch import EXTENSIONS_JOURNAL, convertir_journal, lister_journaux
+from cache_conversions import get_cache_path
+from registre import get_registre_path
+from traitement import prechauffer_modules
+
+DOSSIER_TRAITES = 'traites'
+DOSSIER_ERREURS = 'erreurs'
+
+
+def get_export_racine():
+    """
+    Obtient le dossier racine des exports (Documents/CSV-MAM/csv-export).
+
+    Returns:
+        str: Chemin du dossier (un sous-dossier par date y est créé).
+    """
+    return os.path.join(os.path.expanduser("~"), "Documents", "CSV-MAM", "csv-export")
+
+
+class ObservateurScrutation:
+    """
+    Détecte les journaux nouveaux ou modifiés en relisant le dossier à
+    intervalle régulier (tous systèmes, partages réseau compris).
+
+    Args:
+        dossier (str): Dossier surveillé (sans ses sous-dossiers).
+        intervalle (float): Délai entre deux lectures du dossier, en secondes.
+    """
+
+    mode = 'scrutation'
+
+    def __init__(self, dossier, intervalle=2.0):
+        self.dossier = dossier
+        self.intervalle = intervalle
+        self._signatures = None
+        self._arret = threading.Event()
+
+    def demarrer(self):
+        """Rien à démarrer : la première lecture signale les journaux déjà présents"""
+
+    def arreter(self):
+        self._arret.set()
+
+    def attendre(self, delai):
+        """
+        Args:
+            delai (float): Attente maximale, en secondes.
+
+        Returns:
+            set: Journaux apparus ou modifiés depuis l'appel précédent.
+        """
+        # La première lecture est immédiate : elle signale les journaux déjà présents
+        if self._signatures is not None and self._arret.wait(min(delai, self.intervalle)):
+            return set()
+
+        signatures = {}
+        for chemin in lister_journaux([self.dossier]):
+            try:
+                stat = os.stat(chemin)
+            except OSError:
+                continue
+            signatures[chemin] = (stat.st_size, stat.st_mtime_ns)
+
+        modifies = {chemin for chemin, signature in signatures.items() if (self._signatures or {}).get(chemin) != signature}
+        self._signatures = signatures
+        return modifies
+
+
+class ObservateurEvenements:
+    """
+    Détecte les journaux nouveaux ou modifiés à partir des notifications du
+    système (inotify sous Linux, ReadDirectoryChangesW sous Windows), via le
+    module watchdog.
+
+    Args:
+        dossier (str): Dossier surveillé (sans ses sous-dossiers).
+    """
+
+    mode = 'evenements'
+
+    def __init__(self, dossier):
+        self.dossier = dossier
+        self._evenements = queue.Queue()
+        self._observer = None
+
+    def demarrer(self):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        evenements = self._evenements
+
+        class Gestionnaire(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                # Déplacement (enregistrement via un fichier temporaire) : seul le nom final compte
+                evenements.put(os.path.abspath(getattr(event, 'dest_path', '') or event.src_path))
+
+        self._observer = Observer()
+        self._observer.schedule(Gestionnaire(), self.dossier, recursive=False)
+        self._observer.start()
+        # Journaux déposés avant le démarrage
+        for chemin in lister_journaux([self.dossier]):
+            evenements.put(chemin)
+
+    def arreter(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def attendre(self, delai):
+        """
+        Args:
+            delai (float): Attente maximale, en secondes.
+
+        Returns:
+            set: Journaux signalés depuis l'appel précédent.
+        """
+        chemins = set()
+        try:
+            chemins.add(self._evenements.get(timeout=delai))
+            while True:
+                chemins.add(self._evenements.get_nowait())
+        except queue.Empty:
+            pass
+
+        return {
+            chemin for chemin in chemins
+            if os.path.dirname(chemin) == os.path.abspath(self.dossier)
+            and not os.path.basename(chemin).startswith('~$')
+            and Path(chemin).suffix.lower() in EXTENSIONS_JOURNAL
+        }
+
+
+def creer_observateur(dossier, intervalle=2.0, scrutation=False):
+    """
+    Choisit l'observateur du dossier : notifications du système si watchdog
+    est installé, sinon scrutation.
+
+    Args:
+        dossier (str): Dossier surveillé.
+        intervalle (float): Délai entre deux lectures du dossier (scrutation).
+        scrutation (bool): Force la scrutation (partages réseau, dont les
+            modifications faites par un autre poste ne sont pas notifiées).
+
+    Returns:
+        ObservateurEvenements|ObservateurScrutation: Observateur (non démarré).
+    """
+    if not scrutation and importlib.util.find_spec('watchdog') is not None:
+        return ObservateurEvenements(dossier)
+
+    return ObservateurScrutation(dossier, intervalle)
+
+
+def deplacer_journal(chemin_fichier, dossier):
+    """
+    Déplace un journal traité dans un sous-dossier, sans écraser un journal
+    de même nom déjà déplacé.
+
+    Args:
+        chemin_fichier (str): Journal à déplacer.
+        dossier (str): Dossier de destination (créé si besoin).
+
+    Returns:
+        str: Nouveau chemin du journal.
+    """
+    os.makedirs(dossier, exist_ok=True)
+    destination = os.path.join(dossier, os.path.basename(chemin_fichier))
+    if os.path.exists(destination):
+        chemin = Path(chemin_fichier)
+        destination = os.path.join(dossier, f"{chemin.stem}-{datetime.now().strftime('%Y%m%d-%H%M%S')}{chemin.suffix}")
+
+    shutil.move(chemin_fichier, destination)
+    return destination
+
+
+class ServiceSurveillance:
+    """
+    Convertit les journaux déposés dans un dossier, l'un après l'autre, dans
+    le processus du service (les données de référence restent chargées).
+
+    Un journal est converti lorsque sa taille et sa date de modification
+    n'ont pas changé pendant `delai_stabilite` secondes et qu'il peut être
+    ouvert en lecture (Excel ou l'ERP ne l'écrivent plus).
+
+    Args:
+        dossier_entree (str): Dossier surveillé.
+        dossier_racine (str): Racine des exports (par défaut : Documents/CSV-MAM/csv-export) ;
+            les fichiers sont écrits dans <racine>/<date>/<journal>.
+        delai_stabilite (float): Durée sans modification avant conversion, en secondes.
+        intervalle (float): Délai entre deux vérifications, en secondes.
+        taille_bloc (int): Si renseigné, conversion en flux par blocs de cette taille.
+        chemin_registre (str): Si renseigné, registre des factures déjà exportées.
+        dossier_cache (str): Si renseigné, cache des conversions (hors mode flux).
+        scrutation (bool): Force la scrutation du dossier.
+        sortie (file): Flux des résumés JSON (par défaut : sortie standard).
+    """
+
+    def __init__(self, dossier_entree, dossier_racine=None, delai_stabilite=2.0, intervalle=1.0, taille_bloc=None, chemin_registre=None, dossier_cache=None, scrutation=False, sortie=None):
+        self.dossier_entree = os.path.abspath(dossier_entree)
+        self.dossier_racine = dossier_racine or get_export_racine()
+        self.delai_stabilite = delai_stabilite
+        self.intervalle = intervalle
+        self.taille_bloc = taille_bloc
+        self.chemin_registre = chemin_registre
+        self.dossier_cache = dossier_cache
+        self.observateur = creer_observateur(self.dossier_entree, intervalle, scrutation)
+        self.sortie = sortie or sys.stdout
+        self.arret = threading.Event()
+        self.conversions = 0
+
+    def ecrire(self, resume):
+        """Écrit un résumé JSON sur une ligne"""
+        print(json.dumps(resume, ensure_ascii=False), file=self.sortie, flush=True)
+
+    def est_lisible(self, chemin_fichier):
+        """
+        Returns:
+            bool: True si le journal peut être ouvert en lecture (sous Windows,
+                un fichier en cours d'écriture est verrouillé).
+        """
+        try:
+            with open(chemin_fichier, 'rb') as fichier:
+                fichier.read(1)
+        except OSError:
+            return False
+        return True
+
+    def traiter(self, chemin_fichier):
+        """
+        Convertit un journal, puis le déplace dans 'traites' ou 'erreurs'.
+
+        Returns:
+            dict: Résumé de la conversion (voir batch.convertir_journal).
+        """
+        dossier_sortie = os.path.join(self.dossier_racine, datetime.now().strftime("%Y-%m-%d"))
+        resume = convertir_journal(chemin_fichier, dossier_sortie, taille_bloc=self.taille_bloc, chemin_registre=self.chemin_registre, dossier_cache=self.dossier_cache)
+
+        sous_dossier = DOSSIER_TRAITES if resume['statut'] == 'ok' else DOSSIER_ERREURS
+        try:
+            resume['journal'] = deplacer_journal(chemin_fichier, os.path.join(self.dossier_entree, sous_dossier))
+        except OSError as e:
+            resume['journal'] = chemin_fichier
+            resume['deplacement'] = f"Impossible de déplacer le journal : {str(e)}"
+
+        self.conversions += 1
+        return resume
+
+    def executer(self):
+        """
+        Surveille le dossier jusqu'à l'arrêt du service (`arret` ou Ctrl+C).
+
+        Returns:
+            int: Nombre de journaux convertis.
+        """
+        self.ecrire({'evenement': 'prechauffage', 'durees': prechauffer_modules()})
+        self.observateur.demarrer()
+        self.ecrire({'evenement': 'demarrage', 'dossier': self.dossier_entree, 'mode': self.observateur.mode})
+
+        # Journaux signalés, en attente de stabilité : chemin -> (signature, depuis)
+        en_attente = {}
+        try:
+            while not self.arret.is_set():
+                for chemin in self.observateur.attendre(self.intervalle):
+                    en_attente.setdefault(chemin, (None, 0.0))
+
+                for chemin, (signature_precedente, depuis) in list(en_attente.items()):
+                    if self.arret.is_set():
+                        break
+                    try:
+                        stat = os.stat(chemin)
+                    except OSError:
+                        # Journal supprimé ou renommé avant sa conversion
+                        del en_attente[chemin]
+                        continue
+
+                    maintenant = time.monotonic()
+                    signature = (stat.st_size, stat.st_mtime_ns)
+                    if signature != signature_precedente:
+                        en_attente[chemin] = (signature, maintenant)
+                    elif maintenant - depuis >= self.delai_stabilite and self.est_lisible(chemin):
+                        del en_attente[chemin]
+                        self.ecrire(self.traiter(chemin))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.observateur.arreter()
+
+        self.ecrire({'evenement': 'arret', 'conversions': self.conversions})
+        return self.conversions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Surveille un dossier et convertit chaque journal Excel déposé en fichiers FactoFrance")
+    parser.add_argument('dossier', help="Dossier de dépôt des journaux Excel")
+    parser.add_argument('--sortie', default=None, help="Racine des exports (par défaut : Documents/CSV-MAM/csv-export) ; un sous-dossier par date")
+    parser.add_argument('--stabilite', type=float, default=2.0, help="Secondes sans modification avant de convertir un journal (par défaut : 2)")
+    parser.add_argument('--intervalle', type=float, default=1.0, help="Secondes entre deux vérifications du dossier (par défaut : 1)")
+    parser.add_argument('--scrutation', action='store_true', help="Relit le dossier à intervalle régulier au lieu des notifications du système (partages réseau)")
+    parser.add_argument('--flux', action='store_true', help="Conversion en flux par blocs, à mémoire constante (journaux volumineux)")
+    parser.add_argument('--taille-bloc', type=int, default=50000, help="Nombre de lignes par bloc en mode flux")
+    parser.add_argument('--incremental', action='store_true', help="Ignore les factures déjà exportées (registre Documents/CSV-MAM/registre-factures.sqlite)")
+    parser.add_argument('--registre', default=None, help="Registre des factures exportées à utiliser avec --incremental")
+    parser.add_argument('--cache', action='store_true', help="Réutilise les résultats des conversions précédentes (cache Documents/CSV-MAM/cache)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.dossier):
+        parser.error(f"Dossier introuvable : {args.dossier}")
+
+    service = ServiceSurveillance(
+        args.dossier,
+        args.sortie,
+        delai_stabilite=args.stabilite,
+        intervalle=args.intervalle,
+        taille_bloc=args.taille_bloc if args.flux else None,
+        chemin_registre=(args.registre or get_registre_path()) if args.incremental else None,
+        dossier_cache=get_cache_path() if args.cache else None,
+        scrutation=args.scrutation
+    )
+
+    # Arrêt propre demandé par le gestionnaire de services (le journal en cours est terminé)
+    signal.signal(signal.SIGTERM, lambda *_: service.arret.set())
+    service.executer()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,11 +4,12 @@ Contient les fonctions de conversion et de traitement des données
 """
 
 import os
+import re
 import sys
 import shutil
+import threading
+import unicodedata
 from pathlib import Path
-from re import match
-from unittest import case
 
 
 def get_resource_path(relative_path):
@@ -27,7 +28,8 @@ def get_resource_path(relative_path):
 def get_data_file_path(filename):
     """
     Obtient le chemin d'un fichier de données modifiable par l'utilisateur.
-    Les fichiers sont stockés dans Documents/CSV-MAM/config.
+    Les fichiers sont stockés dans Documents/CSV-MAM/config, ou dans le
+    dossier indiqué par la variable d'environnement CSV_MAM_CONFIG.
     Si le fichier n'existe pas, il est copié depuis le bundle.
     
     Args:
@@ -37,7 +39,7 @@ def get_data_file_path(filename):
         str: Chemin complet du fichier de données
     """
     # Dossier de configuration dans Documents
-    config_dir = os.path.join(os.path.expanduser("~"), "Documents", "CSV-MAM", "config")
+    config_dir = os.environ.get('CSV_MAM_CONFIG') or os.path.join(os.path.expanduser("~"), "Documents", "CSV-MAM", "config")
     
     # Créer le dossier s'il n'existe pas
     os.makedirs(config_dir, exist_ok=True)
@@ -53,13 +55,423 @@ def get_data_file_path(filename):
     
     return data_file_path
 
-def convertir_fichier(chemin_fichier, sheet_name=0):
+# Cache des données de référence : (fichier, constructeur) → (empreinte, valeur)
+_cache_references = {}
+_verrou_references = threading.Lock()
+
+
+def charger_reference(filename, construire=None):
+    """
+    Charge un fichier de données de référence en passant par un cache.
+    
+    Le fichier n'est relu que si sa date de modification ou sa taille a changé
+    (les fichiers de Documents/CSV-MAM/config sont modifiables par l'utilisateur).
+    Les valeurs retournées sont partagées : elles ne doivent pas être modifiées.
+    
+    Args:
+        filename (str): Nom du fichier (ex: 'clients_siret.csv')
+        construire (callable): Fonction construisant la structure de recherche
+            à partir du DataFrame lu (optionnel).
+    
+    Returns:
+        DataFrame|object: DataFrame lu (colonnes texte), ou structure construite par `construire`.
+    """
+    import pandas as pd
+
+    chemin = get_data_file_path(filename)
+    stat = os.stat(chemin)
+    empreinte = (chemin, stat.st_mtime_ns, stat.st_size)
+    cle = (filename, construire)
+
+    with _verrou_references:
+        entree = _cache_references.get(cle)
+    if entree is not None and entree[0] == empreinte:
+        return entree[1]
+
+    # Colonnes texte : pas de zéros en tête perdus, 'NA' (Namibie) n'est pas une valeur manquante
+    valeur = pd.read_csv(chemin, sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False)
+    if construire is not None:
+        valeur = construire(valeur)
+
+    with _verrou_references:
+        _cache_references[cle] = (empreinte, valeur)
+
+    return valeur
+
+
+def invalider_cache_references():
+    """
+    Vide le cache des données de référence.
+    """
+    with _verrou_references:
+        _cache_references.clear()
+
+
+# Autres noms usuels des pays, vers le nom utilisé dans codes_pays.csv
+ALIAS_PAYS = {
+    'AFGHANISTAN': 'AFGANISTAN',
+    'AFRIQUE DU SUD': 'AFRIQUE DU SUD (ZUID AFRIKA)',
+    'ALGERIE': 'ALGERIE (EL DJAZAIR)',
+    'ANGLETERRE': 'GRANDE BRETAGNE (ROYAUME UNI)',
+    'ROYAUME UNI': 'GRANDE BRETAGNE (ROYAUME UNI)',
+    'BANGLADESH': 'BANGLA DESH',
+    'BHOUTAN': 'BOUTHAN',
+    'BIELORUSSIE': 'BELARUS (BIELORUSSIE)',
+    'BIRMANIE': 'MYANMAR (BIRMANIE)',
+    'BURKINA FASO': 'BURKINA FASSO',
+    'REPUBLIQUE CENTRAFRICAINE': 'CENTRAFRIQUE',
+    'COREE': 'COREE DU SUD',
+    'EIRE': 'IRLANDE (EIRE)',
+    'ETATS UNIS': "ETATS UNIS D'AMERIQUE DU NORD",
+    'USA': "ETATS UNIS D'AMERIQUE DU NORD",
+    'GUADELOUPE': 'ILE DE LA GUADELOUPE',
+    'MARTINIQUE': 'ILE DE LA MARTINIQUE',
+    'REUNION': 'ILE DE LA REUNION',
+    'LA REUNION': 'ILE DE LA REUNION',
+    'HOLLANDE': 'PAYS BAS',
+    'ILE MAURICE': 'MAURICE',
+    'REPUBLIQUE DEMOCRATIQUE DU CONGO': 'CONGO (REP.DEMOCRAT.) EX ZAIRE',
+    'SAINT PIERRE ET MIQUELON': 'ST PIERRE & MIQUELON',
+    'TCHEQUIE': 'REPUBLIQUE TCHEQUE',
+    'VIETNAM': 'VIET NAM',
+}
+
+# Score minimal (difflib, 0 à 1) pour rapprocher un nom mal orthographié d'un pays connu
+SEUIL_PAYS = 0.85
+
+
+def normaliser_pays(nom):
+    """
+    Normalise un nom de pays pour la recherche : sans accents, en majuscules,
+    ponctuation remplacée par des espaces et espaces réduits ('Côte-d'Ivoire '
+    devient 'COTE D IVOIRE'). Une valeur vide devient ''.
+    """
+    if nom is None or nom != nom:
+        return ''
+    sans_accents = ''.join(c for c in unicodedata.normalize('NFKD', str(nom)) if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^0-9A-Z]+', ' ', sans_accents.upper()).split())
+
+
+def construire_index_pays(df_codes_pays):
+    """
+    Construit l'index des codes ISO, indexé par nom de pays normalisé.
+    
+    Chaque pays y figure sous plusieurs clés : son nom normalisé (voir
+    normaliser_pays), son nom sans précision entre parenthèses ('CHINE' pour
+    'CHINE (REPUBLIQUE POPULAIRE)'), les alias de ALIAS_PAYS et son code ISO.
+    En cas de doublon, la première clé fait foi, dans cet ordre.
+    
+    Args:
+        df_codes_pays (DataFrame): DataFrame des codes pays (codes_pays.csv).
+    
+    Returns:
+        Series: Codes ISO indexés par clé normalisée.
+    """
+    import pandas as pd
+
+    noms = df_codes_pays['Pays'].tolist()
+    codes_iso = df_codes_pays['ISO'].tolist()
+    iso_par_nom = dict(zip(noms, codes_iso))
+
+    cles = [normaliser_pays(nom) for nom in noms]
+    cles += [normaliser_pays(re.sub(r'\(.*?\)', ' ', str(nom))) for nom in noms]
+    codes = codes_iso + codes_iso
+    for alias, nom in ALIAS_PAYS.items():
+        if nom in iso_par_nom:
+            cles.append(normaliser_pays(alias))
+            codes.append(iso_par_nom[nom])
+    cles += [normaliser_pays(code) for code in codes_iso]
+    codes += codes_iso
+
+    index_pays = pd.Series(codes, index=pd.Index(cles, dtype=object), name='ISO', dtype=object)
+    return index_pays[(index_pays.index != '') & ~index_pays.index.duplicated(keep='first')]
+
+
+def resoudre_pays(noms, index_pays, avec_rapprochements=False):
+    """
+    Retrouve le code ISO de chaque nom de pays.
+    
+    Chaque nom distinct est normalisé puis cherché dans l'index ; s'il est
+    absent, il est rapproché du nom connu le plus proche (fautes de frappe,
+    score minimal SEUIL_PAYS). Un rapprochement peut se tromper de pays
+    ('SAINT MARTIN' donne SM, Saint-Marin) : le contrôle du journal les
+    signale tous. Le coût dépend du nombre de noms distincts, pas du nombre
+    de lignes.
+    
+    Args:
+        noms (Series): Noms de pays.
+        index_pays (Series): Index construit par construire_index_pays.
+        avec_rapprochements (bool): Retourne aussi le masque des noms résolus
+            par rapprochement (optionnel).
+    
+    Returns:
+        ndarray: Codes ISO (dtype object), None pour les pays introuvables ou vides ;
+            avec avec_rapprochements, tuple (codes ISO, masque des rapprochements).
+    """
+    import difflib
+
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(pd.Series(noms, dtype=object))
+    cles = [normaliser_pays(nom) for nom in uniques]
+    positions = index_pays.index.get_indexer(pd.Index(cles, dtype=object))
+    codes_iso = np.append(index_pays.to_numpy(dtype=object), None)[positions]
+
+    # Les codes ISO (2 lettres) ne servent pas au rapprochement
+    candidats = [cle for cle in index_pays.index if len(cle) > 2]
+    rapproches = np.zeros(len(cles), dtype=bool)
+    for i in np.flatnonzero(positions < 0):
+        proches = difflib.get_close_matches(cles[i], candidats, n=1, cutoff=SEUIL_PAYS) if cles[i] else []
+        if proches:
+            codes_iso[i] = index_pays[proches[0]]
+            rapproches[i] = True
+
+    # Les valeurs manquantes (code -1) pointent sur le dernier élément : None
+    if avec_rapprochements:
+        return np.append(codes_iso, None)[codes], np.append(rapproches, False)[codes]
+    return np.append(codes_iso, None)[codes]
+
+
+def codes_pays_clients(pays):
+    """
+    Retrouve le code ISO du pays de chaque client.
+    
+    Args:
+        pays (Series): Colonne 'Pays' de la base clients.
+    
+    Returns:
+        ndarray: Codes ISO (None si le pays n'est pas renseigné ou est
+            introuvable dans codes_pays.csv : le client est alors classé à
+            l'étranger).
+    """
+    return resoudre_pays(pays, get_index_pays())
+
+
+# Bases clients compilées, par chemin de clients_siret.csv
+_bases_clients = {}
+
+
+def get_base_clients():
+    """
+    Retourne la base clients compilée (base_clients.BaseClients) du fichier
+    clients_siret.csv de configuration, recompilée si le fichier a changé.
+    
+    Returns:
+        BaseClients: Base clients compilée.
+    """
+    from base_clients import BaseClients
+
+    chemin = get_data_file_path('clients_siret.csv')
+    with _verrou_references:
+        base = _bases_clients.get(chemin)
+        if base is None:
+            base = _bases_clients[chemin] = BaseClients(chemin)
+    return base
+
+
+def get_index_clients(codes_clients):
+    """
+    Retourne l'index des clients d'un journal, lu dans la base clients compilée.
+    
+    Seuls les clients demandés sont lus (recherche indexée par code) : le
+    coût ne dépend pas de la taille de la base clients.
+    
+    Args:
+        codes_clients (array-like): Codes clients recherchés.
+    
+    Returns:
+        DataFrame: Clients trouvés indexés par 'Code', comme construire_index_clients.
+    """
+    return get_base_clients().rechercher(codes_clients)
+
+
+def get_index_pays():
+    """
+    Retourne l'index des codes ISO (codes_pays.csv), chargé une seule fois.
+    
+    Returns:
+        Series: Index construit par construire_index_pays.
+    """
+    return charger_reference('codes_pays.csv', construire_index_pays)
+
+
+# Colonnes de cedants.csv : identité de chaque entité (vendeur cédant) écrite
+# dans les lignes de début et de fin du fichier Tiers
+COLONNES_CEDANTS = ['Code', 'SIRET', 'Sigle', 'Raison sociale', 'Voie', 'Complement', 'CP', 'Ville', 'Code pays']
+
+
+def construire_cedants(df_cedants):
+    """
+    Construit les profils des vendeurs cédants à partir de cedants.csv.
+
+    Args:
+        df_cedants (DataFrame): Contenu de cedants.csv (colonnes texte).
+
+    Returns:
+        dict: Profils (dict des colonnes COLONNES_CEDANTS) par code cédant,
+            dans l'ordre du fichier ; le premier est le cédant par défaut.
+    """
+    df_cedants = df_cedants.reindex(columns=COLONNES_CEDANTS, fill_value='')
+    cedants = {}
+    for profil in df_cedants.to_dict('records'):
+        profil = {colonne: str(valeur).strip() for colonne, valeur in profil.items()}
+        if profil['Code']:
+            cedants.setdefault(profil['Code'], profil)
+
+    if not cedants:
+        raise ValueError("cedants.csv ne contient aucun vendeur cédant")
+
+    return cedants
+
+
+def get_cedants():
+    """
+    Retourne les profils des vendeurs cédants (cedants.csv), chargés une seule fois.
+
+    Returns:
+        dict: Profils par code cédant, construits par construire_cedants.
+    """
+    return charger_reference('cedants.csv', construire_cedants)
+
+
+def get_cedant(code=None):
+    """
+    Retourne le profil d'un vendeur cédant.
+
+    Args:
+        code (str): Code cédant (par défaut : premier cédant de cedants.csv).
+
+    Returns:
+        dict: Profil du cédant.
+    """
+    cedants = get_cedants()
+    if code is None:
+        return next(iter(cedants.values()))
+
+    return cedants[code]
+
+
+def cedants_clients(codes_clients, index_clients=None):
+    """
+    Attribue à chaque ligne le vendeur cédant de son client, en une passe.
+
+    Le cédant d'un client est lu dans la colonne 'Cédant' de clients_siret.csv ;
+    un client sans cédant, absent de la base, ou dont le cédant est inconnu de
+    cedants.csv (anomalie signalée par le contrôle du journal) revient au
+    cédant par défaut. Avec un seul cédant, la base clients n'est pas consultée.
+
+    Args:
+        codes_clients (Series): Code client de chaque ligne.
+        index_clients (DataFrame): Index des clients (par défaut : lu dans la
+            base clients compilée).
+
+    Returns:
+        Categorical: Code cédant de chaque ligne (catégories dans l'ordre de cedants.csv).
+    """
+    import numpy as np
+    import pandas as pd
+
+    cedants = get_cedants()
+    categories = pd.Index(list(cedants), dtype=object)
+    if len(cedants) == 1:
+        return pd.Categorical.from_codes(np.zeros(len(codes_clients), dtype=np.int8), categories=categories)
+
+    if index_clients is None:
+        index_clients = get_index_clients(codes_clients)
+
+    # Cédant de chaque client distinct, puis de chaque ligne
+    codes, clients = pd.factorize(np.asarray(codes_clients, dtype=object))
+    positions = index_clients.index.get_indexer(np.asarray(clients, dtype=object))
+    cedants_index = categories.get_indexer(pd.Index([str(cedant).strip() for cedant in index_clients['Cédant']], dtype=object))
+    numeros = np.append(cedants_index, -1)[positions]
+    numeros = np.append(np.where(numeros < 0, 0, numeros), 0)[codes]
+
+    return pd.Categorical.from_codes(numeros, categories=categories)
+
+# Colonnes du journal utilisées par la chaîne de traitement
+COLONNES_JOURNAL = ['Client', 'Règlement', 'N°Fact.', 'Date', 'Echéance', 'Montant T.T.C.']
+
+# Moteurs de lecture Excel, du plus rapide au plus lent : (moteur pandas, module requis, extensions)
+MOTEURS_EXCEL = [
+    ('calamine', 'python_calamine', ['.xlsx', '.xls', '.xlsm']),
+    ('openpyxl', 'openpyxl', ['.xlsx', '.xlsm']),
+    ('xlrd', 'xlrd', ['.xls'])
+]
+
+
+def choisir_moteur_excel(extension):
+    """
+    Choisit le moteur de lecture Excel le plus rapide parmi ceux installés.
+    
+    Args:
+        extension (str): Extension du fichier (ex: '.xlsx').
+    
+    Returns:
+        str|None: Nom du moteur pandas, ou None si aucun moteur n'est disponible.
+    """
+    import importlib.util
+
+    for moteur, module, extensions in MOTEURS_EXCEL:
+        if extension in extensions and importlib.util.find_spec(module) is not None:
+            return moteur
+
+    return None
+
+
+def prechauffer_modules():
+    """
+    Importe pandas et le moteur de lecture Excel, et charge les données de
+    référence, pour que la première conversion ne paie pas ces coûts.
+    
+    Destinée à être appelée dans un thread d'arrière-plan au lancement de l'interface.
+    
+    Returns:
+        dict: Durée (en secondes) de chaque étape du préchauffage.
+    """
+    import importlib
+    import time
+
+    durees = {}
+
+    debut = time.perf_counter()
+    import pandas
+    durees['pandas'] = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    moteur = choisir_moteur_excel('.xlsx')
+    for nom_moteur, module, _ in MOTEURS_EXCEL:
+        if nom_moteur == moteur:
+            importlib.import_module(module)
+    durees[moteur or 'moteur'] = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    get_index_pays()
+    get_base_clients().verifier()
+    durees['references'] = time.perf_counter() - debut
+
+    return durees
+
+
+def convertir_fichier(chemin_fichier, sheet_name=0, colonnes=COLONNES_JOURNAL, moteur=None, mesurer_memoire=False):
     """
     Lit un fichier Excel et retourne un DataFrame pandas.
+    
+    Seules les colonnes utilisées par la chaîne de traitement sont chargées,
+    avec le moteur le plus rapide installé (python-calamine, sinon openpyxl
+    en mode lecture seule). Le moteur utilisé, la durée de lecture et le pic
+    mémoire sont renseignés dans `df.attrs['lecture']`.
+
+    Une liste de feuilles (ou None pour toutes les feuilles) est lue par
+    convertir_fichiers, en parallèle, et fusionnée en un seul DataFrame.
 
     Args:
         chemin_fichier (str): Chemin du fichier source.
-        sheet_name (int|str): Index ou nom de la feuille à lire (par défaut 0).
+        sheet_name (int|str|list|None): Index ou nom de la feuille à lire (par défaut 0),
+            liste de feuilles, ou None pour toutes les feuilles.
+        colonnes (list): Colonnes à charger (None pour toutes les colonnes).
+        moteur (str): Moteur de lecture imposé (par défaut : choix automatique).
+        mesurer_memoire (bool): Mesure le pic mémoire de la lecture (tracemalloc, plus lent).
 
     Returns:
         tuple: (succès: bool, résultat: DataFrame|str)
@@ -72,6 +484,11 @@ def convertir_fichier(chemin_fichier, sheet_name=0):
         except Exception as e:
             msg = "Le package 'pandas' (et 'openpyxl') n'est pas installé. Installez-le avec: pip install pandas openpyxl"
             return False, msg
+        import time
+        import tracemalloc
+
+        if sheet_name is None or isinstance(sheet_name, list):
+            return convertir_fichiers([chemin_fichier], sheet_name, colonnes, moteur)
 
         if not os.path.exists(chemin_fichier):
             return False, "Le fichier n'existe pas"
@@ -80,8 +497,32 @@ def convertir_fichier(chemin_fichier, sheet_name=0):
         if extension not in ['.xlsx', '.xls', '.xlsm']:
             return False, "Le fichier doit être un fichier Excel (.xlsx, .xls ou .xlsm)"
 
-        # Lire le fichier Excel
-        df = pd.read_excel(chemin_fichier, sheet_name=sheet_name, engine="openpyxl")
+        moteur = moteur or choisir_moteur_excel(extension)
+        if moteur is None:
+            return False, "Aucun moteur de lecture Excel n'est installé. Installez-le avec: pip install openpyxl"
+
+        usecols = (lambda colonne: colonne in colonnes) if colonnes is not None else None
+
+        # Mesurer le pic mémoire uniquement si personne d'autre ne trace déjà les allocations
+        tracer = mesurer_memoire and not tracemalloc.is_tracing()
+        if tracer:
+            tracemalloc.start()
+        debut = time.perf_counter()
+
+        try:
+            # Lire le fichier Excel
+            df = pd.read_excel(chemin_fichier, sheet_name=sheet_name, engine=moteur, usecols=usecols)
+        finally:
+            duree = time.perf_counter() - debut
+            memoire_pic = tracemalloc.get_traced_memory()[1] if tracer else None
+            if tracer:
+                tracemalloc.stop()
+
+        df.attrs['lecture'] = {
+            'moteur': moteur,
+            'duree': duree,
+            'memoire_pic': memoire_pic
+        }
 
         return True, df
     except Exception as e:
@@ -89,6 +530,105 @@ def convertir_fichier(chemin_fichier, sheet_name=0):
         return False, msg
 
 
+def lister_feuilles(chemin_fichier, moteur=None):
+    """
+    Liste les feuilles d'un classeur Excel.
+    
+    Args:
+        chemin_fichier (str): Chemin du fichier source.
+        moteur (str): Moteur de lecture imposé (par défaut : choix automatique).
+    
+    Returns:
+        list: Noms des feuilles, dans l'ordre du classeur.
+    """
+    import pandas as pd
+
+    moteur = moteur or choisir_moteur_excel(Path(chemin_fichier).suffix.lower())
+    with pd.ExcelFile(chemin_fichier, engine=moteur) as classeur:
+        return list(classeur.sheet_names)
+
+
+def convertir_fichiers(chemins_fichiers, sheet_name=0, colonnes=COLONNES_JOURNAL, moteur=None, processus=None):
+    """
+    Lit plusieurs classeurs et/ou plusieurs feuilles et les fusionne en un seul journal.
+    
+    Chaque feuille est lue par convertir_fichier dans un pool de processus,
+    puis les feuilles sont concaténées dans l'ordre (classeurs, puis feuilles) :
+    la balance générée n'a qu'une ligne de début et une ligne de fin.
+    Les feuilles sans aucune colonne du journal (récapitulatifs, notes) sont ignorées.
+    
+    Args:
+        chemins_fichiers (list): Chemins des classeurs.
+        sheet_name (int|str|list|None): Feuille(s) à lire dans chaque classeur
+            (None pour toutes les feuilles).
+        colonnes (list): Colonnes à charger (None pour toutes les colonnes).
+        moteur (str): Moteur de lecture imposé (par défaut : choix automatique).
+        processus (int): Nombre de processus (par défaut : nombre de cœurs).
+    
+    Returns:
+        tuple: (succès: bool, résultat: DataFrame|str), comme convertir_fichier.
+            `df.attrs['lecture']['sources']` détaille chaque feuille lue.
+    """
+    try:
+        import pandas as pd
+    except Exception as e:
+        msg = "Le package 'pandas' (et 'openpyxl') n'est pas installé. Installez-le avec: pip install pandas openpyxl"
+        return False, msg
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+
+    debut = time.perf_counter()
+    sources = []
+    try:
+        for chemin_fichier in chemins_fichiers:
+            if not os.path.exists(chemin_fichier):
+                return False, f"{os.path.basename(chemin_fichier)} : Le fichier n'existe pas"
+            if sheet_name is None:
+                feuilles = lister_feuilles(chemin_fichier, moteur)
+            elif isinstance(sheet_name, list):
+                feuilles = sheet_name
+            else:
+                feuilles = [sheet_name]
+            sources += [(chemin_fichier, feuille) for feuille in feuilles]
+
+        if not sources:
+            return False, "Aucune feuille à lire"
+
+        chemins = [chemin for chemin, _ in sources]
+        feuilles = [feuille for _, feuille in sources]
+        if len(sources) == 1 or processus == 1:
+            resultats = [convertir_fichier(chemin, feuille, colonnes, moteur) for chemin, feuille in sources]
+        else:
+            with ProcessPoolExecutor(max_workers=min(processus or os.cpu_count() or 1, len(sources))) as executor:
+                resultats = list(executor.map(convertir_fichier, chemins, feuilles, [colonnes] * len(sources), [moteur] * len(sources)))
+    except Exception as e:
+        msg = f"Erreur lors de la lecture : {str(e)}"
+        return False, msg
+
+    frames = []
+    details = []
+    for (chemin_fichier, feuille), (success, df) in zip(sources, resultats):
+        if not success:
+            return False, f"{os.path.basename(chemin_fichier)} (feuille {feuille}) : {df}"
+        details.append({'fichier': chemin_fichier, 'feuille': feuille, 'lignes': len(df) if len(df.columns) else 0, **df.attrs['lecture']})
+        if len(df.columns) and not df.empty:
+            frames.append(df)
+
+    # Concaténer uniquement les feuilles non vides (une feuille vide modifierait les types des colonnes)
+    if frames:
+        df = pd.concat(frames, ignore_index=True)
+    else:
+        df = resultats[0][1]
+    df.attrs['lecture'] = {
+        'moteur': details[0]['moteur'],
+        'duree': time.perf_counter() - debut,
+        'memoire_pic': None,
+        'sources': details
+    }
+
+    return True, df
+
+
 def valider_fichier(chemin_fichier):
     """
     Valide si le fichier peut être traité
@@ -113,13 +653,82 @@ def valider_fichier(chemin_fichier):
     return True, "Fichier valide"
 
 
+def construire_index_clients(df_clients):
+    """
+    Construit l'index des clients, indexé par code client.
+    
+    L'index permet une recherche par hachage (code → pays, SIRET, adresse)
+    au lieu d'un parcours complet de la base clients pour chaque ligne.
+    Le code ISO du pays de chaque client y est résolu une fois pour toutes
+    (voir resoudre_pays) : la séparation FR/étranger et le fichier Tiers
+    utilisent le même code. Un index déjà construit est retourné tel quel.
+    
+    Args:
+        df_clients (DataFrame): DataFrame des informations clients (clients_siret.csv).
+    
+    Returns:
+        DataFrame: Informations clients indexées par 'Code' (colonne 'Code'
+            conservée), avec une colonne 'Code pays' (code ISO ; None si le pays
+            n'est pas renseigné ou est introuvable dans codes_pays.csv)
+            et une colonne 'Cédant' (vide si non renseignée).
+    """
+    if df_clients.index.name == 'Code':
+        return df_clients
+
+    # En cas de doublon, la première occurrence du code fait foi
+    index_clients = df_clients.drop_duplicates(subset='Code', keep='first').set_index('Code', drop=False)
+    index_clients['Code pays'] = codes_pays_clients(index_clients['Pays'])
+    if 'Cédant' not in index_clients.columns:
+        index_clients['Cédant'] = ''
+
+    return index_clients
+
+
+def masque_clients_fr(codes_clients, index_clients):
+    """
+    Indique pour chaque code client s'il s'agit d'un client français.
+    
+    Args:
+        codes_clients (Series): Codes clients.
+        index_clients (DataFrame): Index construit par construire_index_clients.
+    
+    Returns:
+        Series: Masque booléen (True pour les clients français).
+    """
+    import numpy as np
+    import pandas as pd
+
+    # Par défaut, considérer comme français si le client n'est pas trouvé
+    positions = index_clients.index.get_indexer(np.asarray(codes_clients, dtype=object))
+    codes_pays = np.append(index_clients['Code pays'].to_numpy(dtype=object), 'FR')[positions]
+
+    return pd.Series(codes_pays == 'FR', index=codes_clients.index)
+
+
+def masque_clients_identifies(codes_clients, index_clients):
+    """
+    Indique pour chaque code client s'il figure dans la base clients.
+    
+    Args:
+        codes_clients (Series): Codes clients.
+        index_clients (DataFrame): Index construit par construire_index_clients.
+    
+    Returns:
+        ndarray: Masque booléen (True pour les clients identifiés).
+    """
+    import numpy as np
+
+    return index_clients.index.get_indexer(np.asarray(codes_clients, dtype=object)) >= 0
+
+
 def separer_clients_par_pays(df_balance, df_clients):
     """
     Sépare un DataFrame Balance en clients français et étrangers.
     
     Args:
         df_balance (DataFrame): DataFrame Balance.
-        df_clients (DataFrame): DataFrame des informations clients.
+        df_clients (DataFrame): DataFrame des informations clients (ou index construit
+            par construire_index_clients).
     
     Returns:
         tuple: (df_balance_fr, df_balance_etranger)
@@ -127,232 +736,706 @@ def separer_clients_par_pays(df_balance, df_clients):
     import pandas as pd
     
     # Récupérer les lignes de début/fin
-    ligne_debut = df_balance[df_balance['Code client'] == '000000']
-    ligne_fin = df_balance[df_balance['Code client'] == '999999']
+    est_debut = df_balance['Code vendeur cédant'] == '000000'
+    est_fin = df_balance['Code vendeur cédant'] == '999999'
+    ligne_debut = df_balance[est_debut]
+    ligne_fin = df_balance[est_fin]
     
     # Récupérer les lignes de données (sans début/fin)
-    df_data = df_balance[(df_balance['Code client'] != '000000') & (df_balance['Code client'] != '999999')]
-    
-    # Séparer français et étranger
-    lignes_fr = []
-    lignes_etranger = []
-    
-    for _, row in df_data.iterrows():
-        code_client = row['Code client']
-        
-        # Vérifier si le client existe dans df_clients
-        if code_client in df_clients['Code'].values:
-            client_info = df_clients[df_clients['Code'] == code_client].iloc[0]
-            pays = str(client_info.get('Pays', 'FRANCE')).upper()
-            
-            if pays == 'FRANCE':
-                lignes_fr.append(row)
-            else:
-                lignes_etranger.append(row)
-        else:
-            # Par défaut, considérer comme français si non trouvé
-            lignes_fr.append(row)
+    df_data = df_balance[~(est_debut | est_fin)]
+    
+    # Rechercher le pays de chaque client en une seule passe sur l'index
+    est_fr = masque_clients_fr(df_data['Code client'], construire_index_clients(df_clients))
+    lignes_fr = df_data[est_fr]
+    lignes_etranger = df_data[~est_fr]
     
     # Créer les DataFrames
-    if lignes_fr:
-        df_fr = pd.concat([ligne_debut, pd.DataFrame(lignes_fr), ligne_fin], ignore_index=True)
+    if not lignes_fr.empty:
+        df_fr = pd.concat([ligne_debut, lignes_fr, ligne_fin], ignore_index=True)
     else:
         df_fr = pd.DataFrame(columns=df_balance.columns)
     
-    if lignes_etranger:
-        df_etranger = pd.concat([ligne_debut, pd.DataFrame(lignes_etranger), ligne_fin], ignore_index=True)
+    if not lignes_etranger.empty:
+        df_etranger = pd.concat([ligne_debut, lignes_etranger, ligne_fin], ignore_index=True)
     else:
         df_etranger = pd.DataFrame(columns=df_balance.columns)
     
     return df_fr, df_etranger
 
 
-def generate_balance_file(df_source):
+# Correspondance première lettre du code règlement → mode de règlement
+# ('A' = avoir : le mode de règlement est vidé, formalisme demandé)
+CODES_REGLEMENT = {
+    'C': 'CHE',
+    'V': 'VIR',
+    'A': ''
+}
+
+
+def convertir_dates(serie):
     """
-    Génère un fichier de balance à partir du DataFrame source.
+    Convertit une colonne de dates du journal en datetime64.
+    
+    Seules les cellules de type date (datetime, date, Timestamp) sont des
+    dates : un texte ('05/01/2024') ou un nombre n'est jamais réinterprété,
+    pour ne pas risquer d'inverser le jour et le mois.
     
     Args:
-        df_source (DataFrame): DataFrame source.
+        serie (Series): Colonne de dates.
     
     Returns:
-        DataFrame: DataFrame de la balance générée.
+        tuple: (dates: Series datetime64, NaT pour les valeurs manquantes ou
+            invalides ; invalides: ndarray, masque des valeurs renseignées
+            qui ne sont pas des dates)
     """
-    try:
-        import pandas as pd
-    except Exception as e:
-        msg = "Le package 'pandas' (et 'openpyxl') n'est pas installé. Installez-le avec: pip install pandas openpyxl"
-        return False, msg
-    
-    # Créer une liste pour accumuler les lignes
-    lignes = []
+    from datetime import date
 
-    # Insérer la première ligne manuellement
-    lignes.append(['000000', pd.Timestamp.now().strftime('%d/%m/%Y'), '', '', pd.Timestamp.now().strftime('%d/%m/%Y'), 'EUR', 0, 0, 'DEB', '', ''])
+    import numpy as np
+    import pandas as pd
 
-    # Définir les constantes pour les colonnes
-    CODE_VENDEUR_CEDANT = '123456'
-    DATE_FICHIER = pd.Timestamp.now().strftime('%d/%m/%Y')
-    DEVISE_FICHIER = 'EUR'
-    NUERO_COMMANDE = ''
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return pd.to_datetime(serie), np.zeros(len(serie), dtype=bool)
 
-    # Parcourir les lignes du df source et remplir le df balance
-    for _, row in df_source.iterrows():
-        codeClient = row.get('Client')
-        reglement = row.get('Règlement')
-        numPiece = row.get('N°Fact.')
-        datePiece = row.get('Date').strftime('%d/%m/%Y')
-        dateEcheance = row.get('Echéance').strftime('%d/%m/%Y')
-        typePiece = 'FAC' # Mettre FAC par défaut
-
-        premiereLettreCodeReglement = str(reglement)[0]
-
-        # Faire un switch case sur la première lettre du code règlement
-        match premiereLettreCodeReglement:
-            case 'C':
-                codeReglement = 'CHE'
-            case 'V':
-                codeReglement = 'VIR'
-            case 'A':
-                codeReglement = '' # Supprimer le code règlement (formalisme demandé)
-                typePiece = 'AVO' # Remplacer le type de pièce par AVO
-        
-        if typePiece == 'AVO':
-            montantDevise = round(-abs(row.get('Montant T.T.C.')), 2)
-        else:
-            montantDevise = round(abs(row.get('Montant T.T.C.')), 2)
-
-        lignes.append([
-            CODE_VENDEUR_CEDANT,
-            DATE_FICHIER,
-            codeClient,
-            numPiece,
-            datePiece,
-            DEVISE_FICHIER,
-            montantDevise,
-            dateEcheance,
-            typePiece,
-            codeReglement,
-            NUERO_COMMANDE
-        ])
-
-    # Insérer la dernière ligne manuellement
-    lignes.append(['999999', pd.Timestamp.now().strftime('%d/%m/%Y'), '', '', pd.Timestamp.now().strftime('%d/%m/%Y'), 'EUR', 0, 0, 'FIN', '', ''])
-
-    # Ajout du nom des colonnes
-    colonnes = [
-        'Code vendeur cédant',
-        'Date du fichier',
-        'Code client',
-        'N° de la pièce',
-        'Date de la pièce',
-        'Devise du fichier',
-        'Montant en devise',
-        'Date d\'échéance',
-        'Type de la pièce',
-        'Mode de règlement',
-        'Numéro de la commande'
-    ]
-    df_balance = pd.DataFrame(lignes, columns=colonnes)
-    
-    return df_balance
+    # Conversion des seules valeurs distinctes (quelques centaines par journal)
+    codes, uniques = pd.factorize(serie)
+    valides = np.array([isinstance(valeur, date) for valeur in uniques], dtype=bool)
+    converties = pd.to_datetime(pd.Series(np.where(valides, uniques, None), dtype=object))
+    dates = pd.Series(np.append(converties.to_numpy(), np.datetime64('NaT'))[codes], index=serie.index)
+    invalides = np.append(~valides, False)[codes]
+    return dates, invalides
 
-def generate_tiers_file(df_balance):
+
+def categoriser_dates(serie):
     """
-    Génère un fichier de tiers à partir du DataFrame Balance.
+    Convertit une colonne de dates en catégorielle (une catégorie par date distincte).
+    
+    Les dates restent des dates : elles ne sont formatées (DD/MM/YYYY) qu'à
+    l'export, une seule fois par date distincte.
     
     Args:
-        df_balance (DataFrame): DataFrame Balance.
+        serie (Series): Colonne de dates (datetime64 ou objets date).
     
     Returns:
-        DataFrame: DataFrame des tiers généré.
-        set: Ensemble des clients non identifiés.
+        Categorical: Dates (les dates manquantes sont des valeurs manquantes).
+    
+    Raises:
+        ValueError: Si une valeur n'est pas une date (voir convertir_dates).
+    """
+    import pandas as pd
+
+    dates, invalides = convertir_dates(serie)
+    if invalides.any():
+        raise ValueError(f"Date invalide : {serie[invalides].iloc[0]!r}")
+
+    # Un journal ne contient que quelques centaines de dates distinctes
+    codes, uniques = pd.factorize(dates)
+    return pd.Categorical.from_codes(codes, categories=uniques)
+
+
+def arrondir_montants(montants):
+    """
+    Arrondit un tableau de montants à 2 décimales.
+    
+    np.round travaille sur montant * 100 et peut diverger de round() de
+    Python sur les valeurs à mi-chemin (ex: 1.005) : ces cas sont
+    recalculés avec round() pour garder des sorties identiques.
+    
+    Args:
+        montants (ndarray): Montants à arrondir.
+    
+    Returns:
+        ndarray: Montants arrondis.
+    """
+    import numpy as np
+
+    if montants.dtype.kind != 'f':
+        return montants
+
+    arrondis = np.round(montants, 2)
+    with np.errstate(invalid='ignore'):
+        ambigus = np.abs(np.abs(montants * 100) % 1 - 0.5) < 1e-6
+    for i in np.flatnonzero(ambigus):
+        arrondis[i] = round(float(montants[i]), 2)
+
+    return arrondis
+
+
+def montants_en_centimes(montants):
+    """
+    Convertit des montants en centimes entiers (virgule fixe), après arrondi à 2 décimales.
+    
+    Args:
+        montants (ndarray): Montants.
+    
+    Returns:
+        ndarray|IntegerArray: Centimes (int64, ou Int64 si des montants sont manquants).
+    """
+    import numpy as np
+    import pandas as pd
+
+    # L'arrondi à 2 décimales précède la conversion : mêmes valeurs que l'arrondi historique
+    centimes = np.round(arrondir_montants(np.asarray(montants, dtype=float)) * 100)
+    manquants = np.isnan(centimes)
+    if manquants.any():
+        return pd.array(np.where(manquants, 0, centimes).astype(np.int64), dtype='Int64').where(~manquants)
+    return centimes.astype(np.int64)
+
+
+# Colonnes du fichier Balance
+COLONNES_BALANCE = [
+    'Code vendeur cédant',
+    'Date du fichier',
+    'Code client',
+    'N° de la pièce',
+    'Date de la pièce',
+    'Devise du fichier',
+    'Montant en devise',
+    'Date d\'échéance',
+    'Type de la pièce',
+    'Mode de règlement',
+    'Numéro de la commande'
+]
+
+# Colonnes entières exprimées en centimes (écrites avec 2 décimales à l'export)
+COLONNES_CENTIMES = ['Montant en devise']
+
+
+def ligne_balance_speciale(code, type_piece, date_fichier, montant=0):
+    """
+    Construit une ligne de début (000000/DEB) ou de fin (999999/FIN) de la balance.
+    
+    Args:
+        code (str): '000000' pour le début, '999999' pour la fin.
+        type_piece (str): 'DEB' ou 'FIN'.
+        date_fichier (Timestamp): Date du fichier.
+        montant (int|float): Montant de la ligne (en centimes si entier).
+    
+    Returns:
+        DataFrame: DataFrame d'une ligne.
+    """
+    import pandas as pd
+
+    return pd.DataFrame([[code, date_fichier, '', '', date_fichier, 'EUR', montant, 0, type_piece, '', '']], columns=COLONNES_BALANCE)
+
+
+def concatener_lignes(parties):
+    """
+    Concatène des DataFrames de mêmes colonnes en conservant les colonnes catégorielles.
+    
+    pd.concat convertit en objet une colonne catégorielle dont les catégories
+    diffèrent d'une partie à l'autre : les catégories sont d'abord réunies.
+    
+    Args:
+        parties (list): DataFrames à concaténer (au moins une partie).
+    
+    Returns:
+        DataFrame: DataFrame concaténé (index réinitialisé).
+    """
+    import pandas as pd
+
+    colonnes = {}
+    for colonne in parties[0].columns:
+        series = [partie[colonne] for partie in parties]
+        categorielles = [serie for serie in series if isinstance(serie.dtype, pd.CategoricalDtype)]
+        if categorielles:
+            categories = categorielles[0].cat.categories
+            for serie in series:
+                valeurs = serie.cat.categories if isinstance(serie.dtype, pd.CategoricalDtype) else pd.Index(serie.dropna().unique(), dtype=object)
+                categories = categories.append(valeurs[~valeurs.isin(categories)])
+            series = [
+                serie.cat.set_categories(categories) if isinstance(serie.dtype, pd.CategoricalDtype) else pd.Series(pd.Categorical(serie, categories=categories))
+                for serie in series
+            ]
+        colonnes[colonne] = pd.concat(series, ignore_index=True)
+
+    return pd.DataFrame(colonnes)
+
+
+def construire_lignes_balance(df_source, date_fichier, mode_reglement_precedent='', index_clients=None):
+    """
+    Construit les lignes de données de la balance (sans lignes de début/fin).
+    
+    Les colonnes sont typées : catégorielles pour les valeurs constantes ou peu
+    variées (code cédant, devise, type de pièce, mode de règlement, dates),
+    montants en centimes entiers. Le formatage texte n'a lieu qu'à l'export
+    (formater_csv). Le code cédant de chaque ligne est celui du client
+    (voir cedants_clients).
+    
+    Args:
+        df_source (DataFrame): DataFrame source.
+        date_fichier (Timestamp): Date du fichier.
+        mode_reglement_precedent (str): Mode de règlement de la ligne précédant
+            df_source (lecture par blocs).
+        index_clients (DataFrame): Index des clients du journal (optionnel).
+    
+    Returns:
+        DataFrame: Lignes de données de la balance.
+    """
+    import numpy as np
+    import pandas as pd
+
+    # Définir les constantes pour les colonnes
+    DEVISE_FICHIER = 'EUR'
+    NUERO_COMMANDE = ''
+
+    nb_lignes = len(df_source)
+
+    def constante(valeur):
+        return pd.Categorical.from_codes(np.zeros(nb_lignes, dtype=np.int8), categories=pd.Index([valeur], dtype=object))
+
+    # Mapper la première lettre du code règlement
+    codes, reglements = pd.factorize(df_source['Règlement'], use_na_sentinel=False)
+    premiere_lettre = np.array([str(reglement)[:1] for reglement in reglements], dtype=object)[codes]
+    code_reglement = pd.Series(premiere_lettre).map(CODES_REGLEMENT)
+    # Un code inconnu conserve le mode de règlement de la ligne précédente (comportement historique)
+    code_reglement = code_reglement.ffill().fillna(mode_reglement_precedent)
+    est_avoir = premiere_lettre == 'A'
+    type_piece = pd.Categorical.from_codes(est_avoir.astype(np.int8), categories=pd.Index(['FAC', 'AVO'], dtype=object))
+
+    # Calculer les montants : négatifs pour les avoirs, positifs sinon
+    montant = np.abs(pd.to_numeric(df_source['Montant T.T.C.']).to_numpy(dtype=float))
+    montant = np.where(est_avoir, -montant, montant)
+
+    return pd.DataFrame({
+        'Code vendeur cédant': cedants_clients(df_source['Client'], index_clients),
+        'Date du fichier': constante(date_fichier),
+        'Code client': df_source['Client'].to_numpy(dtype=object),
+        'N° de la pièce': df_source['N°Fact.'].to_numpy(dtype=object),
+        'Date de la pièce': categoriser_dates(df_source['Date']),
+        'Devise du fichier': constante(DEVISE_FICHIER),
+        'Montant en devise': montants_en_centimes(montant),
+        'Date d\'échéance': categoriser_dates(df_source['Echéance']),
+        'Type de la pièce': type_piece,
+        'Mode de règlement': pd.Categorical(code_reglement.to_numpy(dtype=object), categories=pd.Index(['CHE', 'VIR', ''], dtype=object)),
+        'Numéro de la commande': constante(NUERO_COMMANDE)
+    })
+
+
+def generate_balance_file(df_source, index_clients=None):
+    """
+    Génère un fichier de balance à partir du DataFrame source.
+    
+    La balance est construite colonne par colonne (opérations vectorisées
+    pandas/NumPy) plutôt que ligne par ligne, ce qui permet de traiter des
+    journaux de plusieurs centaines de milliers de lignes. Les colonnes sont
+    typées (catégorielles, centimes entiers, dates) : voir construire_lignes_balance.
+    Avec plusieurs vendeurs cédants, la balance contient les lignes de tous
+    les cédants (voir repartir_par_cedant).
+    
+    Args:
+        df_source (DataFrame): DataFrame source.
+        index_clients (DataFrame): Index des clients du journal (optionnel).
+    
+    Returns:
+        DataFrame: DataFrame de la balance générée.
     """
     try:
         import pandas as pd
     except Exception as e:
         msg = "Le package 'pandas' (et 'openpyxl') n'est pas installé. Installez-le avec: pip install pandas openpyxl"
         return False, msg
+
+    DATE_FICHIER = pd.Timestamp.now().normalize()
+
+    # Insérer la première et la dernière ligne manuellement
+    ligne_debut = ligne_balance_speciale('000000', 'DEB', DATE_FICHIER)
+    ligne_fin = ligne_balance_speciale('999999', 'FIN', DATE_FICHIER)
+
+    if len(df_source):
+        df_data = construire_lignes_balance(df_source, DATE_FICHIER, index_clients=index_clients)
+        df_balance = concatener_lignes([ligne_debut, df_data, ligne_fin])
+    else:
+        df_balance = concatener_lignes([ligne_debut, ligne_fin])
+
+    return df_balance
+
+
+def repartir_par_cedant(df_balance):
+    """
+    Répartit une balance entre ses vendeurs cédants, en une seule passe.
+
+    Chaque balance de cédant est encadrée par les lignes de début (000000) et
+    de fin (999999) de la balance d'origine. Avec un seul cédant, la balance
+    est retournée telle quelle.
+
+    Args:
+        df_balance (DataFrame): DataFrame Balance (voir generate_balance_file).
+
+    Returns:
+        list: Couples (profil du cédant, df_balance du cédant), dans l'ordre de
+            cedants.csv, pour les seuls cédants ayant des lignes.
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes_cedants = df_balance['Code vendeur cédant'].to_numpy(dtype=object)
+    speciales = np.flatnonzero(np.isin(codes_cedants, ['000000', '999999']))
+    donnees = np.flatnonzero(~np.isin(codes_cedants, ['000000', '999999']))
+
+    numeros, cedants = pd.factorize(codes_cedants[donnees])
+    if len(cedants) <= 1:
+        return [(get_cedant(cedants[0] if len(cedants) else None), df_balance)]
+
+    # Lignes de chaque cédant, dans l'ordre de la balance
+    ordre = np.argsort(numeros, kind='stable')
+    groupes = dict(zip(cedants, np.split(donnees[ordre], np.cumsum(np.bincount(numeros))[:-1])))
+
+    return [
+        (profil, df_balance.iloc[np.concatenate([speciales[:1], groupes[code], speciales[1:]])].reset_index(drop=True))
+        for code, profil in get_cedants().items()
+        if code in groupes
+    ]
+
+
+def tronquer(valeurs, max_len=None):
+    """
+    Convertit une colonne en chaînes tronquées, les valeurs NaN devenant ''.
     
-    df_tiers = pd.DataFrame()
+    Args:
+        valeurs (Series): Colonne à convertir.
+        max_len (int): Longueur maximale des chaînes (optionnel).
+    
+    Returns:
+        ndarray: Tableau (dtype object) des chaînes.
+    """
+    import numpy as np
+    import pandas as pd
+
+    valeurs = np.asarray(valeurs, dtype=object)
+    manquantes = pd.isna(valeurs)
+    chaines = np.array([str(val)[:max_len] for val in valeurs], dtype=object)
+    chaines[manquantes] = ''
+
+    return chaines
+
 
-    lignes = []
+# Colonnes du fichier Tiers
+COLONNES_TIERS = [
+    'Code vendeur cédant',
+    'Code client',
+    'Identifiant du tiers',
+    'Sigle du tiers',
+    'Raison sociale',
+    'N° et nom de la voie',
+    'Complément d\'adresse',
+    'Code postal',
+    'Ville',
+    'Code pays'
+]
 
-    # Insérer la première ligne manuellement
-    lignes.append(['000000', 'DEB', '32038969500026', 'MONTAGE ET ASSEMBLAGE MECANIQUE', 'MONTAGE ET ASSEMBLAGE MECANIQUE', '23 RUE MELVILLE-LYNCH', 'PARC D\'ACTIVITE MAIGNON', '64100', 'BAYONNE', 'FR'])
+
+def ligne_tiers_speciale(code, type_ligne, cedant=None):
+    """
+    Construit une ligne de début (000000/DEB) ou de fin (999999/FIN) du fichier Tiers,
+    portant l'identité du vendeur cédant.
     
-    # Définir les constantes pour les colonnes
-    CODE_VENDEUR_CEDANT = '123456'
+    Args:
+        code (str): '000000' pour le début, '999999' pour la fin.
+        type_ligne (str): 'DEB' ou 'FIN'.
+        cedant (dict): Profil du vendeur cédant (par défaut : premier cédant de cedants.csv).
+    
+    Returns:
+        DataFrame: DataFrame d'une ligne.
+    """
+    import pandas as pd
+
+    cedant = cedant or get_cedant()
+    identite = [cedant[colonne] for colonne in ['SIRET', 'Sigle', 'Raison sociale', 'Voie', 'Complement', 'CP', 'Ville', 'Code pays']]
+    return pd.DataFrame([[code, type_ligne, *identite]], columns=COLONNES_TIERS)
+
+
+def construire_lignes_tiers(codes_clients, cedant=None):
+    """
+    Construit les lignes de données du fichier Tiers pour des codes clients distincts.
+    
+    Les codes sont joints à la base clients puis à la table des pays, sans
+    parcours ligne par ligne.
+    
+    Args:
+        codes_clients (Series): Codes clients distincts.
+        cedant (dict): Profil du vendeur cédant (par défaut : premier cédant de cedants.csv).
+    
+    Returns:
+        DataFrame: Lignes de données du fichier Tiers.
+        set: Ensemble des clients non identifiés.
+    """
+    import numpy as np
+    import pandas as pd
 
-    # Récupérer les données utiles
-    df_clients = pd.read_csv(get_data_file_path('clients_siret.csv'), sep=';', encoding='utf-8-sig')
-    df_codes_pays = pd.read_csv(get_data_file_path('codes_pays.csv'), sep=';', encoding='utf-8-sig')
+    code_cedant = (cedant or get_cedant())['Code']
+
+    # Récupérer les clients demandés dans la base clients compilée
+    index_clients = get_index_clients(codes_clients)
+
+    # Joindre les codes à la base clients
+    positions = index_clients.index.get_indexer(codes_clients.to_numpy(dtype=object))
+    identifies = positions >= 0
 
     # Déclarer les clients non identifiés
-    clients_non_identifies = set()
-    clients_traites = set()  # Pour éviter les doublons
-
-    # Parcourir les lignes du df balance et remplir le df tiers
-    for _, row in df_balance.iterrows():
-        code_client = row['Code client']
-        
-        # Ignorer les lignes de début/fin
-        if code_client in ['000000', '999999']:
-            continue
-        
-        # Éviter les doublons
-        if code_client in clients_traites:
-            continue
-        
-        clients_traites.add(code_client)
-        
-        if not code_client in df_clients['Code'].values:
-            clients_non_identifies.add(str(code_client))
-            continue
-        
-        client_info = df_clients[df_clients['Code'] == row['Code client']].iloc[0]
-        
-        # Fonction pour gérer les NaN
-        def safe_str(val, max_len=None):
-            if pd.isna(val):
-                return ''
-            result = str(val)
-            return result[:max_len] if max_len else result
-        
-        lignes.append([
-            CODE_VENDEUR_CEDANT,
-            safe_str(client_info['Code']),
-            safe_str(client_info['SIRET'], 14),
-            safe_str(client_info['Raison sociale'], 40),
-            safe_str(client_info['Raison sociale'], 40),
-            safe_str(client_info['Voie'], 40),
-            safe_str(client_info['Complement'], 40),
-            safe_str(client_info['CP'], 6),
-            safe_str(client_info['Ville'], 34),
-            df_codes_pays.loc[df_codes_pays['Pays'] == client_info['Pays'], 'ISO'].values[0] if len(df_codes_pays.loc[df_codes_pays['Pays'] == client_info['Pays'], 'ISO'].values) > 0 else 'FR'
-        ])
-
-    # Insérer la dernière ligne manuellement
-    lignes.append(['999999', 'FIN', '32038969500026', 'MONTAGE ET ASSEMBLAGE MECANIQUE', 'MONTAGE ET ASSEMBLAGE MECANIQUE', '23 RUE MELVILLE-LYNCH', 'PARC D\'ACTIVITE MAIGNON', '64100', 'BAYONNE', 'FR'])
-
-    # Ajout du nom des colonnes
-    colonnes = [
-        'Code vendeur cédant',
-        'Code client',
-        'Identifiant du tiers',
-        'Sigle du tiers',
-        'Raison sociale',
-        'N° et nom de la voie',
-        'Complément d\'adresse',
-        'Code postal',
-        'Ville',
-        'Code pays'
-    ]
+    clients_non_identifies = {str(code_client) for code_client in codes_clients[~identifies]}
 
-    df_tiers = pd.DataFrame(lignes, columns=colonnes)
+    client_info = index_clients.iloc[positions[identifies]]
+
+    # Code client tel qu'écrit dans la balance (code du journal) et non tel qu'écrit
+    # dans clients_siret.csv ('012065') : le factor rapproche les deux fichiers par ce code
+    codes_balance = codes_clients.to_numpy(dtype=object)[identifies]
+
+    # Code ISO résolu dans l'index des clients ; pays vide ou introuvable : repli d'origine
+    # sur 'FR' (jamais de code pays vide dans le fichier Tiers), signalé au contrôle du journal
+    codes_iso = tronquer(client_info['Code pays'])
+    codes_iso[codes_iso == ''] = 'FR'
+
+    df_data = pd.DataFrame({
+        'Code vendeur cédant': np.full(len(client_info), code_cedant, dtype=object),
+        'Code client': codes_balance,
+        'Identifiant du tiers': tronquer(client_info['SIRET'], 14),
+        'Sigle du tiers': tronquer(client_info['Raison sociale'], 40),
+        'Raison sociale': tronquer(client_info['Raison sociale'], 40),
+        'N° et nom de la voie': tronquer(client_info['Voie'], 40),
+        'Complément d\'adresse': tronquer(client_info['Complement'], 40),
+        'Code postal': tronquer(client_info['CP'], 6),
+        'Ville': tronquer(client_info['Ville'], 34),
+        'Code pays': codes_iso
+    })
+
+    return df_data, clients_non_identifies
+
+
+def generate_tiers_file(df_balance, cedant=None):
+    """
+    Génère un fichier de tiers à partir du DataFrame Balance.
+    
+    Les clients distincts sont extraits en une passe puis joints à la base
+    clients et à la table des pays, sans parcours ligne par ligne.
+    
+    Args:
+        df_balance (DataFrame): DataFrame Balance (d'un seul vendeur cédant).
+        cedant (dict): Profil du vendeur cédant (par défaut : premier cédant de cedants.csv).
+    
+    Returns:
+        DataFrame: DataFrame des tiers généré.
+        set: Ensemble des clients non identifiés.
+    """
+    try:
+        import pandas as pd
+    except Exception as e:
+        msg = "Le package 'pandas' (et 'openpyxl') n'est pas installé. Installez-le avec: pip install pandas openpyxl"
+        return False, msg
+
+    # Dédupliquer les codes clients, en ignorant les lignes de début/fin
+    lignes_speciales = df_balance['Code vendeur cédant'].isin(['000000', '999999'])
+    codes_clients = df_balance.loc[~lignes_speciales, 'Code client'].drop_duplicates()
+
+    df_data, clients_non_identifies = construire_lignes_tiers(codes_clients, cedant)
+
+    # Insérer la première et la dernière ligne manuellement
+    ligne_debut = ligne_tiers_speciale('000000', 'DEB', cedant)
+    ligne_fin = ligne_tiers_speciale('999999', 'FIN', cedant)
+
+    if len(df_data):
+        df_tiers = pd.concat([ligne_debut, df_data, ligne_fin], ignore_index=True)
+    else:
+        df_tiers = pd.concat([ligne_debut, ligne_fin], ignore_index=True)
 
     return df_tiers, clients_non_identifies
 
-def export_dataframe_to_csv(df_source, type, suffixe='1A', dossier_destination=None):
+
+def nom_fichier_export(type, suffixe='1A', cedant=None):
+    """
+    Construit le nom d'un fichier exporté : {TYPE}FH{CEDANT}{SUFFIXE}.{JOUR_ANNEE}
+    
+    Args:
+        type (str): Type de fichier ('balance' ou 'tiers').
+        suffixe (str): Suffixe du fichier ('1A' pour français, '1B' pour étranger).
+        cedant (dict): Profil du vendeur cédant (par défaut : premier cédant de cedants.csv).
+    
+    Returns:
+        str: Nom du fichier.
+    """
+    from datetime import datetime
+
+    if type == 'balance':
+        nom_fichier = "FBA"
+    elif type == 'tiers':
+        nom_fichier = "TIE"
+    else:
+        raise ValueError(f"Type de fichier inconnu : {type}")
+
+    nom_fichier += "FH"
+    nom_fichier += (cedant or get_cedant())['Code']
+    nom_fichier += suffixe
+    nom_fichier += "."
+    nom_fichier += f"{datetime.now().timetuple().tm_yday:03d}"
+
+    return nom_fichier
+
+
+# Caractères imposant de mettre un champ CSV entre guillemets (séparateur, guillemet, fin de ligne)
+CARACTERES_A_PROTEGER = ';"\r\n'
+
+
+def formater_valeur_csv(valeur):
+    """
+    Formate une valeur d'une colonne objet ou catégorielle : dates au format
+    DD/MM/YYYY, autres valeurs converties en texte.
+    """
+    from datetime import date
+
+    if type(valeur) is str:
+        return valeur
+    if isinstance(valeur, date):
+        return valeur.strftime('%d/%m/%Y')
+    return str(valeur)
+
+
+def formater_centimes(centimes):
+    """
+    Formate des montants en centimes entiers avec 2 décimales (virgule décimale), sans passer par les flottants.
+    """
+    import numpy as np
+    import pandas as pd
+
+    manquants = pd.isna(centimes)
+    valeurs = np.asarray(centimes.fillna(0) if manquants.any() else centimes, dtype=np.int64).tolist()
+    chaines = [('-' if valeur < 0 else '') + '%d,%02d' % divmod(abs(valeur), 100) for valeur in valeurs]
+    for i in np.flatnonzero(manquants):
+        chaines[i] = ''
+    return chaines
+
+
+def formater_colonne_csv(serie, centimes=False):
+    """
+    Formate une colonne en chaînes CSV, comme DataFrame.to_csv avec
+    sep=';', decimal=',' et float_format='%.2f', les dates étant écrites au
+    format DD/MM/YYYY.
+    
+    Seules les valeurs distinctes sont converties et protégées, puis
+    redistribuées (les colonnes Balance/Tiers comportent peu de valeurs distinctes).
+    Les colonnes catégorielles sont formatées catégorie par catégorie.
+    
+    Args:
+        serie (Series): Colonne à formater.
+        centimes (bool): La colonne contient des montants en centimes entiers.
+    
+    Returns:
+        ndarray: Chaînes formatées (NaN → '', champs protégés entre guillemets).
+    """
+    from datetime import date
+
+    import numpy as np
+    import pandas as pd
+
+    if serie.dtype.kind == 'f':
+        return ['' if valeur != valeur else ('%.2f' % valeur).replace('.', ',') for valeur in serie.to_numpy().tolist()]
+
+    if centimes and pd.api.types.is_integer_dtype(serie.dtype):
+        return formater_centimes(serie)
+
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codes = serie.cat.codes.to_numpy()
+        uniques = np.array([formater_valeur_csv(valeur) for valeur in serie.cat.categories.astype(object)], dtype=object)
+    elif serie.dtype.kind == 'M':
+        codes, uniques = pd.factorize(serie)
+        uniques = np.array([formater_valeur_csv(valeur) for valeur in uniques], dtype=object)
+    elif serie.dtype == object:
+        # Une colonne objet peut mélanger 1 et 1.0 : convertir avant de regrouper
+        valeurs = serie.to_numpy()
+        if any(isinstance(valeur, date) for valeur in pd.unique(valeurs)):
+            chaines = np.array([formater_valeur_csv(valeur) for valeur in valeurs.tolist()], dtype=object)
+        else:
+            chaines = np.array([str(valeur) for valeur in valeurs.tolist()], dtype=object)
+        chaines[pd.isna(valeurs)] = ''
+        codes, uniques = pd.factorize(chaines)
+        uniques = np.asarray(uniques, dtype=object)
+    else:
+        codes, uniques = pd.factorize(serie)
+        uniques = np.array([str(valeur) for valeur in uniques], dtype=object)
+
+    # Recherche globale d'abord : la plupart des colonnes n'ont aucun champ à protéger
+    texte = '\x00'.join(uniques)
+    if any(caractere in texte for caractere in CARACTERES_A_PROTEGER):
+        for i, chaine in enumerate(uniques):
+            if any(caractere in chaine for caractere in CARACTERES_A_PROTEGER):
+                uniques[i] = '"' + chaine.replace('"', '""') + '"'
+
+    # Les valeurs manquantes (code -1) prennent la dernière entrée : ''
+    return np.append(uniques, '')[codes]
+
+
+def formater_csv(df_source):
+    """
+    Formate un DataFrame au format des fichiers FactoFrance : séparateur ';',
+    virgule décimale, montants à 2 décimales, fins de ligne CRLF, sans en-tête.
+    
+    Les colonnes sont formatées en bloc puis assemblées en une seule chaîne,
+    identique à la sortie de DataFrame.to_csv avec les mêmes paramètres.
+    
+    Args:
+        df_source (DataFrame): DataFrame à formater.
+    
+    Returns:
+        str: Contenu CSV.
+    """
+    if df_source.empty:
+        return ''
+
+    colonnes = [formater_colonne_csv(df_source.iloc[:, i], df_source.columns[i] in COLONNES_CENTIMES) for i in range(df_source.shape[1])]
+
+    return '\r\n'.join(map(';'.join, zip(*colonnes))) + '\r\n'
+
+
+def encoder_csv(contenu):
+    """
+    Encode un contenu CSV en cp850 (encodage attendu par FactoFrance).
+    
+    Le codec cp850 est lent : un contenu purement ASCII, identique dans les
+    deux encodages, est encodé directement en ASCII.
+    
+    Args:
+        contenu (str): Contenu CSV.
+    
+    Returns:
+        bytes: Contenu encodé.
+    """
+    if contenu.isascii():
+        return contenu.encode('ascii')
+    return contenu.encode('cp850')
+
+
+def ecrire_fichier(chemin, contenu, atomique=False):
+    """
+    Écrit un contenu binaire en un seul appel d'écriture.
+    
+    En mode atomique, le contenu est écrit dans un fichier temporaire du même
+    dossier puis renommé : un arrêt brutal ne laisse jamais de fichier à moitié écrit.
+    
+    Args:
+        chemin (str): Chemin du fichier.
+        contenu (bytes): Contenu à écrire.
+        atomique (bool): Écriture via fichier temporaire + renommage.
+    """
+    import tempfile
+
+    if not atomique:
+        with open(chemin, 'wb') as fichier:
+            fichier.write(contenu)
+        return
+
+    dossier = os.path.dirname(os.path.abspath(chemin))
+    descripteur, chemin_temporaire = tempfile.mkstemp(prefix='.' + os.path.basename(chemin) + '.', suffix='.tmp', dir=dossier)
+    try:
+        with os.fdopen(descripteur, 'wb') as fichier:
+            fichier.write(contenu)
+            fichier.flush()
+            os.fsync(fichier.fileno())
+        os.replace(chemin_temporaire, chemin)
+    except BaseException:
+        if os.path.exists(chemin_temporaire):
+            os.remove(chemin_temporaire)
+        raise
+
+
+def export_dataframe_to_csv(df_source, type, suffixe='1A', dossier_destination=None, atomique=False, cedant=None):
     """
     Exporte le DataFrame source en fichier CSV.
     
@@ -361,6 +1444,8 @@ def export_dataframe_to_csv(df_source, type, suffixe='1A', dossier_destination=N
         type (str): Type de fichier ('balance' ou 'tiers').
         suffixe (str): Suffixe du fichier ('1A' pour français, '1B' pour étranger).
         dossier_destination (str): Chemin du dossier de destination (optionnel).
+        atomique (bool): Écriture via fichier temporaire + renommage (optionnel).
+        cedant (dict): Profil du vendeur cédant (par défaut : premier cédant de cedants.csv).
     
     Returns:
         tuple: (succès: bool, message: str)
@@ -371,20 +1456,7 @@ def export_dataframe_to_csv(df_source, type, suffixe='1A', dossier_destination=N
         msg = "Le package 'pandas' (et 'openpyxl') n'est pas installé. Installez-le avec: pip install pandas openpyxl"
         return False, msg
     
-    if type == 'balance':
-        nom_fichier = "FBA"
-        nom_fichier += "FH"
-        nom_fichier += "123456"
-        nom_fichier += suffixe
-        nom_fichier += "."
-        nom_fichier += f"{pd.Timestamp.now().timetuple().tm_yday:03d}"
-    elif type == 'tiers':
-        nom_fichier = "TIE"
-        nom_fichier += "FH"
-        nom_fichier += "123456"
-        nom_fichier += suffixe
-        nom_fichier += "."
-        nom_fichier += f"{pd.Timestamp.now().timetuple().tm_yday:03d}"
+    nom_fichier = nom_fichier_export(type, suffixe, cedant)
     
     # Construire le chemin complet avec le dossier de destination
     if dossier_destination:
@@ -393,8 +1465,822 @@ def export_dataframe_to_csv(df_source, type, suffixe='1A', dossier_destination=N
         chemin_complet = nom_fichier
 
     try:
-        df_source.to_csv(chemin_complet, index=False, header=False, sep=';', decimal=',', encoding='cp850', lineterminator='\r\n', float_format='%.2f')
+        ecrire_fichier(chemin_complet, encoder_csv(formater_csv(df_source)), atomique)
         return True, f"Fichier exporté avec succès : {chemin_complet}"
     except Exception as e:
         msg = f"Erreur lors de l'exportation : {str(e)}"
-        return False, msg
\ No newline at end of file
+        return False, msg
+
+
+# Taille minimale (lignes de la plus petite branche) pour exporter les branches dans des
+# processus séparés : en dessous, le démarrage d'un processus (import de pandas sous
+# Windows) coûte plus que le temps gagné
+SEUIL_EXPORT_PARALLELE = 200000
+
+
+def exporter_branche(suffixe, df_balance, dossier_destination=None, atomique=False, cedant=None):
+    """
+    Génère les tiers d'une branche (1A ou 1B) et exporte ses fichiers Balance et Tiers.
+    
+    L'écriture disque de la balance (fichier temporaire, fsync, renommage) se
+    fait dans un thread pendant la génération et la mise en forme des tiers.
+    
+    Args:
+        suffixe (str): Suffixe des fichiers ('1A' ou '1B').
+        df_balance (DataFrame): Balance de la branche (avec ses lignes début/fin).
+        dossier_destination (str): Chemin du dossier de destination (optionnel).
+        atomique (bool): Écriture via fichier temporaire + renommage (optionnel).
+        cedant (dict): Profil du vendeur cédant (par défaut : premier cédant de cedants.csv).
+    
+    Les totaux de contrôle des deux fichiers (voir rapprochement) sont
+    calculés sur les DataFrames exportés, sans relire les fichiers écrits.
+    
+    Returns:
+        dict: Fichiers exportés (balance puis tiers), lignes exportées, clients
+            non identifiés, totaux de contrôle des fichiers et durée de la branche.
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    from rapprochement import totaux_balance, totaux_tiers
+
+    debut = time.perf_counter()
+    chemin_balance = os.path.join(dossier_destination or '', nom_fichier_export('balance', suffixe, cedant))
+    chemin_tiers = os.path.join(dossier_destination or '', nom_fichier_export('tiers', suffixe, cedant))
+
+    with ThreadPoolExecutor(max_workers=1) as ecrivain:
+        ecriture = ecrivain.submit(ecrire_fichier, chemin_balance, encoder_csv(formater_csv(df_balance)), atomique)
+        df_tiers, clients_non_identifies = generate_tiers_file(df_balance, cedant)
+        ecrire_fichier(chemin_tiers, encoder_csv(formater_csv(df_tiers)), atomique)
+        ecriture.result()
+
+    branche = {'cedant': (cedant or get_cedant())['Code'], 'branche': suffixe}
+    totaux = [
+        {'fichier': os.path.basename(chemin_balance), 'type': 'balance', **branche, **totaux_balance(df_balance)},
+        {'fichier': os.path.basename(chemin_tiers), 'type': 'tiers', **branche, **totaux_tiers(df_tiers, clients_non_identifies)}
+    ]
+
+    return {
+        'fichiers': [chemin_balance, chemin_tiers],
+        'lignes': len(df_balance) + len(df_tiers),
+        'clients_non_identifies': clients_non_identifies,
+        'totaux': totaux,
+        'duree': time.perf_counter() - debut
+    }
+
+
+def exporter_branches(branches, dossier_destination=None, atomique=False, processus=None):
+    """
+    Génère les tiers et exporte les fichiers Balance et Tiers de plusieurs
+    branches (1A : clients français, 1B : clients étrangers, pour chaque
+    vendeur cédant) en parallèle.
+    
+    Une fois les clients séparés, les branches sont indépendantes. La mise en
+    forme CSV est du code Python (verrou global de l'interpréteur) : les
+    grosses branches sont donc exportées dans des processus séparés, comme
+    les feuilles dans convertir_fichiers, et la durée totale est proche de
+    celle de la branche la plus longue. Sous SEUIL_EXPORT_PARALLELE lignes,
+    ou sur une machine à un seul processeur, les branches sont exportées
+    l'une après l'autre (l'écriture disque de chaque balance reste
+    superposée à la génération de ses tiers, voir exporter_branche).
+    
+    Args:
+        branches (list): Triplets (suffixe, df_balance, profil du cédant) des branches à exporter.
+        dossier_destination (str): Chemin du dossier de destination (optionnel).
+        atomique (bool): Écriture via fichier temporaire + renommage (optionnel).
+        processus (int): Force le nombre de processus (1 : sans processus séparé ;
+            par défaut, selon SEUIL_EXPORT_PARALLELE).
+    
+    Returns:
+        tuple: (succès: bool, résultat: dict|str)
+            - Si succès=True, résultat contient les fichiers exportés (balance
+              puis tiers de chaque branche, dans l'ordre des branches), les
+              lignes exportées, les clients non identifiés, les totaux de contrôle
+              de chaque fichier et la durée de chaque branche (clé : suffixe,
+              précédé du code cédant s'il y a plusieurs cédants)
+            - Si succès=False, résultat est un message d'erreur
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if processus is None:
+        paralleles = len(branches) > 1 and (os.cpu_count() or 1) > 1 and min(len(df_balance) for _, df_balance, _ in branches) >= SEUIL_EXPORT_PARALLELE
+        processus = min(len(branches), os.cpu_count() or 1) if paralleles else 1
+
+    suffixes = [suffixe for suffixe, _, _ in branches]
+    balances = [df_balance for _, df_balance, _ in branches]
+    cedants = [cedant or get_cedant() for _, _, cedant in branches]
+    try:
+        # Créé ici : les processus d'export écrivent directement dans le dossier
+        if dossier_destination:
+            os.makedirs(dossier_destination, exist_ok=True)
+        if processus > 1:
+            with ProcessPoolExecutor(max_workers=min(processus, len(branches))) as executor:
+                resultats = list(executor.map(exporter_branche, suffixes, balances, [dossier_destination] * len(branches), [atomique] * len(branches), cedants))
+        else:
+            resultats = [exporter_branche(suffixe, df_balance, dossier_destination, atomique, cedant) for suffixe, df_balance, cedant in zip(suffixes, balances, cedants)]
+    except Exception as e:
+        msg = f"Erreur lors de l'exportation : {str(e)}"
+        return False, msg
+
+    return True, {
+        'fichiers': [chemin for resultat in resultats for chemin in resultat['fichiers']],
+        'lignes': sum(resultat['lignes'] for resultat in resultats),
+        'clients_non_identifies': set().union(*(resultat['clients_non_identifies'] for resultat in resultats)),
+        'totaux': [totaux for resultat in resultats for totaux in resultat['totaux']],
+        'durees': {
+            suffixe if len({cedant['Code'] for cedant in cedants}) == 1 else f"{cedant['Code']} {suffixe}": resultat['duree']
+            for suffixe, cedant, resultat in zip(suffixes, cedants, resultats)
+        }
+    }
+
+
+MESSAGE_ANNULATION = "Conversion annulée"
+
+
+def executer_pipeline(chemin_fichier, dossier_destination=None, mesurer_memoire=False, progression=None, annulation=None, mesures=None, profiler=False, rapport=True, registre=None, cache=None, sheet_name=0, controler=True):
+    """
+    Exécute la chaîne complète de conversion d'un journal, sans interface :
+    validation, lecture, contrôle, balance, séparation FR/étranger, puis
+    tiers et export (branches 1A et 1B en parallèle, voir exporter_branches).
+    
+    L'annulation est vérifiée entre les étapes ; une fois l'export commencé,
+    la conversion va à son terme pour ne pas laisser un jeu de fichiers incomplet.
+    Chaque étape est mesurée (durée, lignes, pic mémoire optionnel) et un
+    rapport d'exécution JSON/CSV est écrit à côté des fichiers exportés.
+    
+    Avec un registre, les factures déjà exportées lors des conversions
+    précédentes sont retirées du journal avant la génération de la balance,
+    et les nouvelles factures y sont enregistrées une fois l'export terminé
+    et rapproché du journal sans écart. Les factures de clients absents de la
+    base clients ne sont pas enregistrées : une fois la base corrigée, elles
+    sont reproposées avec leurs tiers.
+    
+    Avec un cache, le journal lu, la balance et les fichiers exportés sont
+    conservés sous une clé tirée du contenu du journal et des fichiers de
+    référence : une nouvelle conversion du même journal ne refait que les
+    étapes dont les données d'entrée ont changé.
+    
+    Avant la génération, toutes les lignes du journal sont contrôlées en une
+    passe (voir validation.controler_journal) : les erreurs (date invalide,
+    code règlement inconnu, montant non numérique...) sont signalées ensemble
+    et interrompent la conversion ; les avertissements (N° de facture en
+    double, client inconnu) sont signalés sans l'interrompre. Le détail des
+    anomalies est écrit dans le dossier de destination.
+    
+    Les totaux de contrôle de chaque fichier exporté (pièces, factures,
+    avoirs, montants, clients) sont calculés pendant l'export et rapprochés
+    de ceux du journal (voir rapprochement) ; le rapport de rapprochement est
+    écrit à côté des fichiers exportés.
+    
+    Args:
+        chemin_fichier (str|list): Chemin du journal Excel source, ou liste de
+            journaux lus en parallèle et fusionnés en une seule balance.
+        dossier_destination (str): Chemin du dossier de destination (optionnel).
+        mesurer_memoire (bool): Mesure le pic mémoire de chaque étape (plus lent).
+        progression (callable): Appelée avec (message, pourcentage) au début de
+            chaque étape (optionnel).
+        annulation (threading.Event): Événement demandant l'arrêt de la conversion (optionnel).
+        mesures (MesuresPipeline): Mesures déjà commencées par l'appelant (optionnel).
+        profiler (bool): Profile la conversion avec cProfile (rapport .prof).
+        rapport (bool): Écrit le rapport d'exécution dans le dossier de destination.
+        registre (RegistreFactures): Registre des factures déjà exportées (optionnel).
+        cache (CacheConversions): Cache des résultats de conversion (optionnel).
+        sheet_name (int|str|list|None): Feuille(s) à lire dans chaque journal
+            (None pour toutes les feuilles), voir convertir_fichiers.
+        controler (bool): Contrôle les lignes du journal avant la génération.
+    
+    Returns:
+        tuple: (succès: bool, résultat: dict|str)
+            - Si succès=True, résultat est un résumé de la conversion (lignes,
+              lignes déjà exportées, anomalies, rapprochement, factures enregistrées
+              au registre, fichiers exportés, clients non identifiés, étapes
+              servies par le cache, mesures par étape)
+            - Si succès=False, résultat est un message d'erreur
+    """
+    from mesures import MesuresPipeline
+
+    if mesures is None:
+        mesures = MesuresPipeline(mesurer_memoire=mesurer_memoire, profiler=profiler)
+
+    mesures.demarrer()
+    try:
+        success, resultat = _executer_etapes(chemin_fichier, dossier_destination, progression, annulation, mesures, registre, cache, sheet_name, controler)
+    finally:
+        mesures.arreter()
+
+    if success:
+        resultat['durees'] = mesures.durees()
+        resultat['etapes'] = mesures.etapes
+        if rapport and dossier_destination:
+            chemins_fichiers = [chemin_fichier] if isinstance(chemin_fichier, str) else chemin_fichier
+            resultat['rapports'] = mesures.ecrire_rapport(dossier_destination, chemins_fichiers[0])
+
+    return success, resultat
+
+
+def _executer_etapes(chemin_fichier, dossier_destination, progression, annulation, mesures, registre=None, cache=None, sheet_name=0, controler=True):
+    """
+    Enchaîne les étapes de executer_pipeline, chacune mesurée par `mesures`.
+    """
+    import pandas as pd
+
+    def etape(message, pourcentage):
+        # Signaler l'avancement et indiquer si l'annulation a été demandée
+        if progression is not None:
+            progression(message, pourcentage)
+        return annulation is not None and annulation.is_set()
+
+    chemins_fichiers = [chemin_fichier] if isinstance(chemin_fichier, str) else list(chemin_fichier)
+    plusieurs_sources = len(chemins_fichiers) > 1 or sheet_name is None or isinstance(sheet_name, list)
+
+    # Valider le(s) fichier(s)
+    if etape("Validation du fichier", 0):
+        return False, MESSAGE_ANNULATION
+    with mesures.etape('validation'):
+        for chemin in chemins_fichiers:
+            valide, message_validation = valider_fichier(chemin)
+            if not valide:
+                if len(chemins_fichiers) > 1:
+                    message_validation = f"{os.path.basename(chemin)} : {message_validation}"
+                break
+    if not valide:
+        return False, message_validation
+
+    # Clés du cache : contenu du journal (lecture, balance) et des fichiers de référence (tiers, export)
+    if cache is not None:
+        from cache_conversions import construire_cle, empreinte_fichier
+
+        with mesures.etape('empreinte'):
+            cle_journal = construire_cle(*(empreinte_fichier(chemin) for chemin in chemins_fichiers), repr(sheet_name), *COLONNES_JOURNAL)
+            empreinte_references = construire_cle(*(empreinte_fichier(get_data_file_path(nom)) for nom in ['clients_siret.csv', 'codes_pays.csv', 'cedants.csv']))
+            # Avec plusieurs cédants, la balance dépend aussi du cédant de chaque client
+            empreinte_cedants = empreinte_references if len(get_cedants()) > 1 else empreinte_fichier(get_data_file_path('cedants.csv'))
+
+    # Convertir le fichier
+    if etape("Lecture du journal", 5):
+        return False, MESSAGE_ANNULATION
+    with mesures.etape('lecture') as mesure:
+        df_source = cache.lire('journal', cle_journal) if cache is not None else None
+        if df_source is not None:
+            success = True
+            mesure['cache'] = True
+        else:
+            if plusieurs_sources:
+                success, df_source = convertir_fichiers(chemins_fichiers, sheet_name)
+            else:
+                success, df_source = convertir_fichier(chemin_fichier, sheet_name)
+            if success and cache is not None:
+                cache.ecrire('journal', cle_journal, df_source)
+        if success:
+            mesure['lignes'] = len(df_source)
+    if not success:
+        return False, df_source
+
+    # Retirer les factures déjà exportées
+    lignes_deja_exportees = 0
+    if registre is not None:
+        if etape("Recherche des factures déjà exportées", 45):
+            return False, MESSAGE_ANNULATION
+        with mesures.etape('filtrage') as mesure:
+            df_source, lignes_deja_exportees = registre.filtrer(df_source)
+            mesure['lignes'] = len(df_source)
+        if df_source.empty:
+            return False, f"Aucune nouvelle facture : les {lignes_deja_exportees} factures du journal ont déjà été exportées"
+
+    # Contrôler toutes les lignes avant la génération : les anomalies sont signalées ensemble
+    anomalies = None
+    index_clients = None
+    if controler:
+        from validation import controler_journal, rapporter_anomalies
+
+        if etape("Contrôle du journal", 48):
+            return False, MESSAGE_ANNULATION
+        with mesures.etape('controle') as mesure:
+            index_clients = get_index_clients(df_source['Client']) if 'Client' in df_source.columns else None
+            df_anomalies = controler_journal(df_source, index_clients)
+            mesure['lignes'] = len(df_source)
+        if len(df_anomalies):
+            anomalies = rapporter_anomalies(df_anomalies, dossier_destination, chemins_fichiers[0])
+            if anomalies['erreurs']:
+                return False, anomalies['message']
+
+    # Les résultats suivants ne sont mis en cache que pour le journal complet
+    # (la date du fichier et le jour de l'année des noms de fichiers font partie de la clé)
+    if cache is not None and lignes_deja_exportees == 0:
+        cle_balance = construire_cle(cle_journal, pd.Timestamp.now().strftime('%d/%m/%Y'), empreinte_cedants)
+        cle_sorties = construire_cle(cle_balance, empreinte_references, nom_fichier_export('balance'), nom_fichier_export('tiers'))
+        sorties = cache.lire('sorties', cle_sorties)
+        # Entrée antérieure aux totaux de contrôle : les fichiers sont régénérés
+        if sorties is not None and 'totaux' not in sorties:
+            sorties = None
+    else:
+        cle_balance = cle_sorties = sorties = None
+
+    if sorties is None:
+        # Générer le DataFrame Balance
+        if etape("Génération de la balance", 50):
+            return False, MESSAGE_ANNULATION
+        with mesures.etape('balance') as mesure:
+            df_balance = cache.lire('balance', cle_balance) if cle_balance else None
+            if df_balance is not None:
+                mesure['cache'] = True
+            else:
+                df_balance = generate_balance_file(df_source, index_clients)
+                if cle_balance:
+                    cache.ecrire('balance', cle_balance, df_balance)
+            mesure['lignes'] = len(df_balance)
+
+        # Répartir entre les vendeurs cédants, puis séparer les clients français et étrangers
+        if etape("Séparation France / étranger", 65):
+            return False, MESSAGE_ANNULATION
+        with mesures.etape('separation') as mesure:
+            if index_clients is None:
+                index_clients = get_index_clients(df_balance['Code client'])
+            # Balances sans données ignorées : plus que juste les lignes début/fin
+            branches = []
+            cedants = {}
+            for cedant, df_balance_cedant in repartir_par_cedant(df_balance):
+                df_balance_fr, df_balance_etranger = separer_clients_par_pays(df_balance_cedant, index_clients)
+                branches += [(suffixe, df_balance_suffixe, cedant) for suffixe, df_balance_suffixe in [('1A', df_balance_fr), ('1B', df_balance_etranger)] if len(df_balance_suffixe) > 2]
+                cedants[cedant['Code']] = {'lignes_fr': max(len(df_balance_fr) - 2, 0), 'lignes_etranger': max(len(df_balance_etranger) - 2, 0)}
+            mesure['lignes'] = sum(len(df_balance_suffixe) for _, df_balance_suffixe, _ in branches)
+
+        lignes_fr = sum(lignes['lignes_fr'] for lignes in cedants.values())
+        lignes_etranger = sum(lignes['lignes_etranger'] for lignes in cedants.values())
+    else:
+        clients_valides = sorties['clients_non_identifies']
+        lignes_fr = sorties['lignes_fr']
+        lignes_etranger = sorties['lignes_etranger']
+        cedants = sorties['cedants']
+
+    # Générer les Tiers et exporter les fichiers, les branches 1A et 1B de chaque cédant en parallèle
+    if etape("Génération des tiers et export des fichiers", 75):
+        return False, MESSAGE_ANNULATION
+    fichiers_exportes = []
+    with mesures.etape('export') as mesure:
+        if dossier_destination:
+            os.makedirs(dossier_destination, exist_ok=True)
+
+        if sorties is not None:
+            # Fichiers identiques à ceux d'une conversion précédente : les réécrire tels quels
+            mesure['cache'] = True
+            mesure['lignes'] = sorties['lignes']
+            totaux_fichiers = sorties['totaux']
+            for nom_fichier, contenu in sorties['fichiers'].items():
+                chemin = os.path.join(dossier_destination or '', nom_fichier)
+                try:
+                    ecrire_fichier(chemin, contenu, atomique=True)
+                except Exception as e:
+                    return False, f"Erreur lors de l'exportation : {str(e)}"
+                fichiers_exportes.append(chemin)
+        else:
+            success, export = exporter_branches(branches, dossier_destination, atomique=True)
+            if not success:
+                return False, export
+            fichiers_exportes = export['fichiers']
+            totaux_fichiers = export['totaux']
+            mesure['lignes'] = export['lignes']
+            mesure['branches'] = export['durees']
+
+            # Filtrer les valeurs vides
+            clients_valides = {c for c in export['clients_non_identifies'] if c and str(c).strip() and str(c) not in ['000000', '999999']}
+
+            if cle_sorties:
+                fichiers = {}
+                for chemin in fichiers_exportes:
+                    with open(chemin, 'rb') as fichier:
+                        fichiers[os.path.basename(chemin)] = fichier.read()
+                cache.ecrire('sorties', cle_sorties, {
+                    'fichiers': fichiers,
+                    'lignes': mesure['lignes'],
+                    'lignes_fr': lignes_fr,
+                    'lignes_etranger': lignes_etranger,
+                    'cedants': cedants,
+                    'totaux': totaux_fichiers,
+                    'clients_non_identifies': clients_valides
+                })
+
+    # Rapprocher les totaux des fichiers exportés (calculés à l'export) de ceux du journal
+    from rapprochement import rapporter_rapprochement, totaux_journal
+
+    with mesures.etape('rapprochement') as mesure:
+        rapprochement = rapporter_rapprochement(totaux_journal(df_source), totaux_fichiers, dossier_destination, chemins_fichiers[0])
+        mesure['lignes'] = len(df_source)
+
+    # Enregistrer les factures exportées, une fois les fichiers écrits et rapprochés sans écart
+    factures_registre = None
+    if registre is not None:
+        with mesures.etape('registre') as mesure:
+            if index_clients is None:
+                index_clients = get_index_clients(df_source['Client'])
+            identifies = masque_clients_identifies(df_source['Client'], index_clients)
+            factures_registre = {'enregistrees': 0, 'clients_non_identifies': int((~identifies).sum()), 'ecarts': bool(rapprochement['ecarts'])}
+            if not rapprochement['ecarts']:
+                factures_registre['enregistrees'] = registre.enregistrer(df_source[identifies], chemins_fichiers)
+            mesure['lignes'] = int(identifies.sum())
+
+    etape("Conversion terminée", 100)
+
+    return True, {
+        'fichier': chemin_fichier,
+        'lignes': len(df_source),
+        'lignes_deja_exportees': lignes_deja_exportees,
+        'anomalies': anomalies,
+        'rapprochement': rapprochement,
+        'registre': factures_registre,
+        'lignes_fr': lignes_fr,
+        'lignes_etranger': lignes_etranger,
+        'cedants': cedants,
+        'fichiers_exportes': fichiers_exportes,
+        'clients_non_identifies': sorted(clients_valides),
+        'lecture': df_source.attrs.get('lecture'),
+        'cache': [mesure['etape'] for mesure in mesures.etapes if mesure.get('cache')]
+    }
+
+
+def convertir_cellule(valeur):
+    """
+    Convertit une valeur de cellule lue par openpyxl comme le fait pandas.read_excel
+    (les nombres flottants entiers deviennent des entiers).
+    """
+    if isinstance(valeur, float) and valeur.is_integer():
+        return int(valeur)
+    return valeur
+
+
+def lire_lignes_feuille(classeur, feuille):
+    """
+    Parcourt les lignes d'une feuille d'un classeur openpyxl en lecture seule.
+    
+    Les cellules sont décodées par l'analyseur d'openpyxl (textes partagés,
+    dates, valeurs des formules), mais chaque ligne est détachée de l'arbre
+    XML dès qu'elle est lue : openpyxl (iter_rows) vide les lignes lues sans
+    les retirer de l'arbre, qui grandit alors avec le nombre de lignes de la
+    feuille.
+    
+    Args:
+        classeur (Workbook): Classeur ouvert avec read_only=True et data_only=True.
+        feuille (ReadOnlyWorksheet): Feuille à parcourir.
+    
+    Yields:
+        tuple: (numéro de la ligne dans la feuille, valeurs des cellules de la
+            colonne A à la dernière cellule renseignée). Les lignes absentes
+            du fichier ne sont pas produites.
+    """
+    from openpyxl.worksheet._reader import ROW_TAG, WorkSheetParser
+    from openpyxl.xml.constants import SHEET_MAIN_NS
+    from openpyxl.xml.functions import iterparse
+
+    balise_donnees = '{%s}sheetData' % SHEET_MAIN_NS
+
+    with feuille._get_source() as source:
+        analyseur = WorkSheetParser(
+            source,
+            classeur.shared_strings,
+            data_only=True,
+            epoch=classeur.epoch,
+            date_formats=classeur._date_formats,
+            timedelta_formats=classeur._timedelta_formats
+        )
+        donnees = None
+        for evenement, element in iterparse(source, events=('start', 'end')):
+            if evenement == 'start':
+                if element.tag == balise_donnees:
+                    donnees = element
+                continue
+            if element.tag != ROW_TAG:
+                continue
+
+            numero, cellules = analyseur.parse_row(element)
+            # Retirer la ligne lue de l'arbre (et ses dimensions, conservées par openpyxl)
+            if donnees is not None:
+                donnees.clear()
+            analyseur.row_dimensions.clear()
+
+            valeurs = [None] * max((cellule['column'] for cellule in cellules), default=0)
+            for cellule in cellules:
+                valeurs[cellule['column'] - 1] = cellule['value']
+            yield numero, tuple(valeurs)
+
+
+def lire_journal_par_blocs(chemin_fichier, taille_bloc=50000, sheet_name=0, colonnes=COLONNES_JOURNAL):
+    """
+    Lit un journal Excel par blocs de lignes, sans le charger entièrement en mémoire.
+    
+    Le classeur est parcouru en flux (openpyxl en lecture seule, voir
+    lire_lignes_feuille) : la mémoire utilisée dépend de la taille des blocs
+    et du nombre de textes distincts du classeur (table des textes partagés,
+    chargée à l'ouverture), pas du nombre de lignes.
+    
+    Args:
+        chemin_fichier (str): Chemin du fichier source (.xlsx ou .xlsm).
+        taille_bloc (int): Nombre de lignes par bloc.
+        sheet_name (int|str): Index ou nom de la feuille à lire (par défaut 0).
+        colonnes (list): Colonnes à charger (None pour toutes les colonnes).
+    
+    Yields:
+        DataFrame: Bloc de lignes du journal, indexé par la position de chaque
+            ligne dans la feuille (0 pour la ligne qui suit les en-têtes).
+    """
+    import openpyxl
+    import pandas as pd
+
+    classeur = openpyxl.load_workbook(chemin_fichier, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet_name, int):
+            feuille = classeur.worksheets[sheet_name]
+        else:
+            feuille = classeur[sheet_name]
+
+        lignes = lire_lignes_feuille(classeur, feuille)
+        premiere = next(lignes, None)
+        if premiere is None:
+            return
+        ligne_entetes, entetes = premiere
+
+        indices = [i for i, entete in enumerate(entetes) if colonnes is None or entete in colonnes]
+        noms_colonnes = [entetes[i] for i in indices]
+
+        bloc = []
+        positions = []
+        for numero, ligne in lignes:
+            position = numero - ligne_entetes - 1
+            valeurs = [convertir_cellule(ligne[i]) if i < len(ligne) else None for i in indices]
+            # Ignorer les lignes vides
+            if all(valeur is None for valeur in valeurs):
+                continue
+
+            bloc.append(valeurs)
+            positions.append(position)
+            if len(bloc) >= taille_bloc:
+                yield pd.DataFrame(bloc, columns=noms_colonnes, index=positions)
+                bloc = []
+                positions = []
+
+        if bloc:
+            yield pd.DataFrame(bloc, columns=noms_colonnes, index=positions)
+    finally:
+        classeur.close()
+
+
+def executer_pipeline_flux(chemin_fichier, dossier_destination=None, taille_bloc=50000, registre=None, controler=True):
+    """
+    Exécute la chaîne de conversion en flux, bloc par bloc.
+    
+    La mémoire utilisée dépend de la taille des blocs, du nombre de clients
+    distincts (tiers dédupliqués) et des textes partagés du classeur, pas du
+    nombre de lignes du journal : les lignes lues sont retirées de l'arbre
+    XML (voir lire_lignes_feuille), et les N° de facture déjà vus (doublons
+    entre blocs) et les factures à enregistrer dans le registre sont
+    conservés dans des bases SQLite temporaires sur disque. benchmark.py
+    échoue si le pic grandit avec le nombre de lignes.
+    
+    Chaque bloc du journal est converti en lignes Balance, réparti entre les
+    vendeurs cédants, classé FR/étranger et ajouté directement aux fichiers
+    1A/1B de chaque cédant. Les lignes de début (000000) et
+    de fin (999999) sont écrites autour du flux, et les tiers sont dédupliqués
+    au fil de l'eau. Les montants sont toujours écrits avec 2 décimales.
+    Les fichiers ne sont publiés (renommés) qu'une fois le flux terminé.
+    Les totaux de contrôle du journal et de chaque fichier sont cumulés bloc
+    par bloc, puis rapprochés (voir rapprochement).
+    Avec un registre, les factures déjà exportées sont retirées de chaque bloc,
+    et les factures exportées de clients identifiés sont enregistrées une fois
+    le flux rapproché sans écart (comme executer_pipeline).
+    Chaque bloc est contrôlé avant d'être converti ; à la première erreur, la
+    génération s'arrête mais le contrôle se poursuit jusqu'à la fin du journal,
+    pour signaler toutes les anomalies ensemble, et aucun fichier n'est publié.
+    
+    Args:
+        chemin_fichier (str): Chemin du journal Excel source (.xlsx ou .xlsm).
+        dossier_destination (str): Chemin du dossier de destination (optionnel).
+        taille_bloc (int): Nombre de lignes lues et traitées par bloc.
+        registre (RegistreFactures): Registre des factures déjà exportées (optionnel).
+        controler (bool): Contrôle les lignes du journal avant leur conversion.
+    
+    Returns:
+        tuple: (succès: bool, résultat: dict|str), comme executer_pipeline.
+    """
+    from contextlib import ExitStack, closing
+
+    from registre import FacturesEnAttente
+    from validation import FacturesVues
+
+    # N° de facture vus et factures à enregistrer : bases temporaires sur disque,
+    # fermées (et supprimées) quelle que soit l'issue du flux
+    with ExitStack() as pile:
+        factures_vues = pile.enter_context(closing(FacturesVues())) if controler else None
+        attente = pile.enter_context(closing(FacturesEnAttente(registre))) if registre is not None else None
+        return _executer_etapes_flux(chemin_fichier, dossier_destination, taille_bloc, registre, controler, factures_vues, attente)
+
+
+def _executer_etapes_flux(chemin_fichier, dossier_destination, taille_bloc, registre, controler, factures_vues, attente):
+    """
+    Enchaîne les étapes de executer_pipeline_flux.
+    """
+    import time
+
+    import pandas as pd
+
+    from rapprochement import cumuler_totaux, rapporter_rapprochement, totaux_balance, totaux_journal, totaux_montants, totaux_tiers
+    from validation import ERREUR, controler_journal, rapporter_anomalies
+
+    valide, message_validation = valider_fichier(chemin_fichier)
+    if not valide:
+        return False, message_validation
+
+    if Path(chemin_fichier).suffix.lower() not in ['.xlsx', '.xlsm']:
+        return False, "La conversion en flux nécessite un fichier .xlsx ou .xlsm"
+
+    if dossier_destination:
+        os.makedirs(dossier_destination, exist_ok=True)
+
+    date_fichier = pd.Timestamp.now().normalize()
+    durees = {'lecture': 0.0, 'controle': 0.0, 'balance': 0.0, 'separation': 0.0, 'tiers': 0.0, 'export': 0.0, 'rapprochement': 0.0}
+    profils = get_cedants()
+    compteurs = {code: {'lignes_fr': 0, 'lignes_etranger': 0} for code in profils}
+    # Fichiers et clients déjà écrits par branche : (code cédant, suffixe)
+    sorties = {}
+    clients_vus = {}
+    # Totaux de contrôle cumulés bloc par bloc : journal, puis fichiers de chaque branche
+    totaux_source = totaux_montants([], [])
+    totaux_branches = {}
+    tous_clients_non_identifies = set()
+    mode_reglement_precedent = ''
+    nb_lignes = 0
+    lignes_deja_exportees = 0
+    factures_non_identifiees = 0
+    blocs_anomalies = []
+    erreurs = False
+
+    def ecrire(df, fichier):
+        fichier.write(encoder_csv(formater_csv(df)))
+
+    def ouvrir_sorties(branche):
+        # Les fichiers ne sont créés qu'à la première ligne de données, avec leur ligne de début.
+        # Ils sont écrits sous un nom temporaire, renommé une fois le flux terminé.
+        if branche not in sorties:
+            code, suffixe = branche
+            sorties[branche] = {}
+            for type in ['balance', 'tiers']:
+                chemin = os.path.join(dossier_destination or '', nom_fichier_export(type, suffixe, profils[code]))
+                sorties[branche][type] = open(chemin + '.tmp', 'wb')
+            ecrire(ligne_balance_speciale('000000', 'DEB', date_fichier), sorties[branche]['balance'])
+            ecrire(ligne_tiers_speciale('000000', 'DEB', profils[code]), sorties[branche]['tiers'])
+        return sorties[branche]
+
+    try:
+        blocs = lire_journal_par_blocs(chemin_fichier, taille_bloc)
+        while True:
+            debut = time.perf_counter()
+            df_bloc = next(blocs, None)
+            durees['lecture'] += time.perf_counter() - debut
+            if df_bloc is None:
+                break
+
+            if registre is not None:
+                df_bloc, deja_exportees = registre.filtrer(df_bloc)
+                lignes_deja_exportees += deja_exportees
+                if df_bloc.empty:
+                    continue
+            nb_lignes += len(df_bloc)
+
+            # Clients du bloc, lus dans la base clients compilée
+            debut = time.perf_counter()
+            index_clients = get_index_clients(df_bloc['Client'])
+            durees['separation'] += time.perf_counter() - debut
+
+            if registre is not None:
+                # Factures à enregistrer en fin de flux : clients identifiés seulement (voir executer_pipeline)
+                identifies = masque_clients_identifies(df_bloc['Client'], index_clients)
+                factures_non_identifiees += int((~identifies).sum())
+                attente.ajouter(df_bloc[identifies])
+
+            if controler:
+                debut = time.perf_counter()
+                df_anomalies = controler_journal(df_bloc, index_clients, factures_vues=factures_vues)
+                durees['controle'] += time.perf_counter() - debut
+                if len(df_anomalies):
+                    blocs_anomalies.append(df_anomalies)
+                    erreurs = erreurs or bool((df_anomalies['Gravité'] == ERREUR).any())
+            # Après une erreur, les blocs suivants sont seulement contrôlés
+            if erreurs:
+                continue
+
+            debut = time.perf_counter()
+            cumuler_totaux(totaux_source, totaux_journal(df_bloc))
+            durees['rapprochement'] += time.perf_counter() - debut
+
+            debut = time.perf_counter()
+            df_data = construire_lignes_balance(df_bloc, date_fichier, mode_reglement_precedent, index_clients)
+            mode_reglement_precedent = df_data['Mode de règlement'].iloc[-1]
+            durees['balance'] += time.perf_counter() - debut
+
+            debut = time.perf_counter()
+            est_fr = masque_clients_fr(df_data['Code client'], index_clients).to_numpy()
+            codes_cedants = df_data['Code vendeur cédant'].to_numpy(dtype=object)
+            durees['separation'] += time.perf_counter() - debut
+
+            for code in pd.unique(codes_cedants):
+                du_cedant = codes_cedants == code
+                for suffixe, masque, compteur in [('1A', est_fr, 'lignes_fr'), ('1B', ~est_fr, 'lignes_etranger')]:
+                    lignes = df_data[du_cedant & masque]
+                    if lignes.empty:
+                        continue
+                    compteurs[code][compteur] += len(lignes)
+
+                    # Tiers : uniquement les clients pas encore rencontrés
+                    debut = time.perf_counter()
+                    vus = clients_vus.setdefault((code, suffixe), set())
+                    nouveaux = [client for client in lignes['Code client'].drop_duplicates() if client not in vus]
+                    vus.update(nouveaux)
+                    df_tiers, clients_non_identifies = construire_lignes_tiers(pd.Series(nouveaux, dtype=object), profils[code])
+                    tous_clients_non_identifies.update(clients_non_identifies)
+                    durees['tiers'] += time.perf_counter() - debut
+
+                    debut = time.perf_counter()
+                    fichiers = ouvrir_sorties((code, suffixe))
+                    ecrire(lignes, fichiers['balance'])
+                    if len(df_tiers):
+                        ecrire(df_tiers, fichiers['tiers'])
+                    durees['export'] += time.perf_counter() - debut
+
+                    debut = time.perf_counter()
+                    totaux = totaux_branches.setdefault((code, suffixe), {'balance': {}, 'tiers': {}})
+                    cumuler_totaux(totaux['balance'], totaux_balance(lignes))
+                    cumuler_totaux(totaux['tiers'], totaux_tiers(df_tiers, clients_non_identifies))
+                    durees['rapprochement'] += time.perf_counter() - debut
+
+        # Écrire les lignes de fin
+        if not erreurs:
+            debut = time.perf_counter()
+            for (code, _), fichiers in sorties.items():
+                ecrire(ligne_balance_speciale('999999', 'FIN', date_fichier), fichiers['balance'])
+                ecrire(ligne_tiers_speciale('999999', 'FIN', profils[code]), fichiers['tiers'])
+            durees['export'] += time.perf_counter() - debut
+    except Exception as e:
+        # Ne jamais laisser de fichier partiel
+        for fichiers in sorties.values():
+            for fichier in fichiers.values():
+                fichier.close()
+                os.remove(fichier.name)
+        return False, f"Erreur lors de la conversion en flux : {str(e)}"
+
+    anomalies = None
+    if blocs_anomalies:
+        anomalies = rapporter_anomalies(pd.concat(blocs_anomalies, ignore_index=True), dossier_destination, chemin_fichier)
+    if erreurs:
+        # Aucun fichier publié tant que le journal n'est pas corrigé
+        for fichiers in sorties.values():
+            for fichier in fichiers.values():
+                fichier.close()
+                os.remove(fichier.name)
+        return False, anomalies['message']
+
+    fichiers_exportes = []
+    totaux_fichiers = []
+    for branche in [(code, suffixe) for code in profils for suffixe in ['1A', '1B']]:
+        for type, fichier in sorties.get(branche, {}).items():
+            fichier.close()
+            chemin = fichier.name[:-len('.tmp')]
+            os.replace(fichier.name, chemin)
+            fichiers_exportes.append(chemin)
+            totaux = totaux_branches[branche][type]
+            if type == 'balance':
+                totaux['clients'] = len(clients_vus[branche])
+            else:
+                totaux['clients'] = totaux['lignes']
+            totaux_fichiers.append({'fichier': os.path.basename(chemin), 'type': type, 'cedant': branche[0], 'branche': branche[1], **totaux})
+
+    if registre is not None and nb_lignes == 0:
+        return False, f"Aucune nouvelle facture : les {lignes_deja_exportees} factures du journal ont déjà été exportées"
+
+    # Rapprocher les totaux des fichiers exportés (cumulés bloc par bloc) de ceux du journal
+    debut = time.perf_counter()
+    rapprochement = rapporter_rapprochement(totaux_source, totaux_fichiers, dossier_destination, chemin_fichier)
+    durees['rapprochement'] += time.perf_counter() - debut
+
+    # Enregistrer les factures exportées, une fois le flux rapproché sans écart
+    factures_registre = None
+    if registre is not None:
+        factures_registre = {'enregistrees': 0, 'clients_non_identifies': factures_non_identifiees, 'ecarts': bool(rapprochement['ecarts'])}
+        if not rapprochement['ecarts']:
+            factures_registre['enregistrees'] = attente.enregistrer(chemin_fichier)
+
+    # Filtrer les valeurs vides
+    clients_valides = {c for c in tous_clients_non_identifies if c and str(c).strip() and str(c) not in ['000000', '999999']}
+
+    return True, {
+        'fichier': chemin_fichier,
+        'lignes': nb_lignes,
+        'lignes_deja_exportees': lignes_deja_exportees,
+        'anomalies': anomalies,
+        'rapprochement': rapprochement,
+        'registre': factures_registre,
+        'lignes_fr': sum(lignes['lignes_fr'] for lignes in compteurs.values()),
+        'lignes_etranger': sum(lignes['lignes_etranger'] for lignes in compteurs.values()),
+        'cedants': {code: lignes for code, lignes in compteurs.items() if lignes['lignes_fr'] or lignes['lignes_etranger']},
+        'fichiers_exportes': fichiers_exportes,
+        'clients_non_identifies': sorted(clients_valides),
+        'lecture': {'moteur': 'openpyxl (flux)', 'taille_bloc': taille_bloc},
+        'durees': durees
+    }
@@ -0,0 +1,300 @@
+"""
+Contrôle du contenu des journaux
+Vérifie en une seule passe vectorisée toutes les lignes d'un journal avant
+la génération des fichiers (dates, codes règlement, montants, N° de facture,
+clients) et rassemble toutes les anomalies dans un même rapport.
+"""
+
+import os
+import sqlite3
+
+from base_clients import COLONNE_CONFLITS
+from traitement import CODES_REGLEMENT, COLONNES_JOURNAL, convertir_dates, get_cedants, get_index_pays, normaliser_pays, resoudre_pays
+
+# Gravité des anomalies : une erreur bloque la conversion, un avertissement est seulement signalé
+ERREUR = 'erreur'
+AVERTISSEMENT = 'avertissement'
+
+COLONNES_ANOMALIES = ['Fichier', 'Feuille', 'Ligne', 'Colonne', 'Valeur', 'Anomalie', 'Gravité']
+
+
+def origine_lignes(df_source, premiere_ligne=2):
+    """
+    Retrouve, pour chaque ligne du journal, son fichier, sa feuille et son numéro de ligne.
+
+    Les lignes sont repérées par leur index (position dans le journal lu) :
+    les numéros restent exacts après le retrait des factures déjà exportées.
+
+    Args:
+        df_source (DataFrame): Journal lu par convertir_fichier ou convertir_fichiers.
+        premiere_ligne (int): Numéro de ligne Excel de la première ligne de données
+            (2 : la ligne 1 contient les en-têtes).
+
+    Returns:
+        tuple: (fichiers, feuilles, lignes) — tableaux alignés sur les lignes du journal.
+    """
+    import numpy as np
+    import pandas as pd
+
+    nb_lignes = len(df_source)
+    if pd.api.types.is_integer_dtype(df_source.index):
+        positions = df_source.index.to_numpy(dtype=np.int64)
+    else:
+        positions = np.arange(nb_lignes)
+
+    sources = [source for source in (df_source.attrs.get('lecture') or {}).get('sources') or [] if source['lignes']]
+    if not sources:
+        fichiers = np.full(nb_lignes, '', dtype=object)
+        feuilles = np.full(nb_lignes, '', dtype=object)
+        return fichiers, feuilles, positions + premiere_ligne
+
+    # Journal fusionné : les feuilles sont concaténées dans l'ordre des sources
+    debuts = np.cumsum([0] + [source['lignes'] for source in sources[:-1]])
+    numeros_sources = np.clip(np.searchsorted(debuts, positions, side='right') - 1, 0, len(sources) - 1)
+    fichiers = np.array([os.path.basename(source['fichier']) for source in sources], dtype=object)[numeros_sources]
+    feuilles = np.array([str(source['feuille']) for source in sources], dtype=object)[numeros_sources]
+
+    return fichiers, feuilles, positions - debuts[numeros_sources] + premiere_ligne
+
+
+class FacturesVues:
+    """
+    N° de facture des blocs déjà contrôlés (lecture par blocs), pour signaler
+    les doublons d'un bloc à l'autre.
+
+    Les N° sont conservés dans une base SQLite temporaire sur disque,
+    supprimée à la fermeture : la mémoire utilisée ne dépend pas de la
+    longueur du journal.
+    """
+
+    def __init__(self):
+        # Nom vide : base temporaire privée, sur disque au-delà du cache de pages
+        self._connexion = sqlite3.connect('')
+        with self._connexion:
+            self._connexion.execute("CREATE TABLE vues (numero TEXT PRIMARY KEY)")
+
+    def marquer(self, numeros):
+        """
+        Indique les N° déjà vus dans les blocs précédents, puis les ajoute.
+
+        Args:
+            numeros (Series): N° de facture du bloc (sans valeurs manquantes).
+
+        Returns:
+            ndarray: Masque booléen (True pour les N° déjà vus).
+        """
+        import numpy as np
+
+        from registre import normaliser_codes
+
+        cles = normaliser_codes(numeros).tolist()
+        with self._connexion:
+            self._connexion.execute("CREATE TEMP TABLE bloc (position INTEGER, numero TEXT)")
+            self._connexion.executemany("INSERT INTO bloc VALUES (?, ?)", enumerate(cles))
+            positions = [position for (position,) in self._connexion.execute(
+                "SELECT b.position FROM bloc b JOIN vues v ON v.numero = b.numero"
+            )]
+            self._connexion.execute("INSERT OR IGNORE INTO vues SELECT numero FROM bloc")
+            self._connexion.execute("DROP TABLE bloc")
+
+        vues = np.zeros(len(cles), dtype=bool)
+        vues[positions] = True
+        return vues
+
+    def close(self):
+        """Ferme (et supprime) la base temporaire."""
+        self._connexion.close()
+
+
+def controler_journal(df_source, index_clients=None, premiere_ligne=2, factures_vues=None):
+    """
+    Contrôle toutes les lignes d'un journal avant la génération des fichiers.
+
+    Erreurs (bloquantes) : colonne absente, date ou échéance manquante ou
+    invalide, code règlement manquant ou inconnu, montant manquant ou non
+    numérique, N° de facture manquant, client rattaché à un vendeur cédant
+    absent de cedants.csv, code client désignant plusieurs clients de
+    clients_siret.csv (codes distincts de même valeur : '012050' et '12050').
+    Avertissements : N° de facture en double, client manquant ou absent de la
+    base clients, pays du client non renseigné, introuvable dans codes_pays.csv
+    ou résolu par rapprochement (voir resoudre_pays).
+
+    Args:
+        df_source (DataFrame): Journal.
+        index_clients (DataFrame): Index construit par construire_index_clients
+            (optionnel : sans index, les clients ne sont pas contrôlés).
+        premiere_ligne (int): Numéro de ligne Excel de la première ligne de données.
+        factures_vues (FacturesVues): N° de facture des blocs précédents (lecture
+            par blocs), complété par ceux du journal (optionnel).
+
+    Returns:
+        DataFrame: Anomalies (colonnes COLONNES_ANOMALIES), dans l'ordre des lignes.
+    """
+    import numpy as np
+    import pandas as pd
+
+    fichiers, feuilles, lignes = origine_lignes(df_source, premiere_ligne)
+    anomalies = []
+
+    def signaler(masque, colonne, anomalie, gravite):
+        positions = np.flatnonzero(masque)
+        if len(positions):
+            anomalies.append(pd.DataFrame({
+                'Fichier': fichiers[positions],
+                'Feuille': feuilles[positions],
+                'Ligne': lignes[positions],
+                'Colonne': colonne,
+                'Valeur': df_source[colonne].to_numpy(dtype=object)[positions],
+                'Anomalie': anomalie,
+                'Gravité': gravite
+            }))
+
+    colonnes_absentes = [colonne for colonne in COLONNES_JOURNAL if colonne not in df_source.columns]
+    for colonne in colonnes_absentes:
+        anomalies.append(pd.DataFrame([['', '', None, colonne, None, "Colonne absente du journal", ERREUR]], columns=COLONNES_ANOMALIES))
+
+    # Dates de pièce et d'échéance
+    for colonne in ['Date', 'Echéance']:
+        if colonne in colonnes_absentes:
+            continue
+        manquantes = df_source[colonne].isna().to_numpy()
+        # Un texte ('05/01/2024') n'est pas une date : jour et mois pourraient être inversés
+        _, invalides = convertir_dates(df_source[colonne])
+        signaler(manquantes, colonne, "Date manquante", ERREUR)
+        signaler(invalides & ~manquantes, colonne, "Date invalide (cellule au format date attendue)", ERREUR)
+
+    # Codes règlement : seule la première lettre compte (C, V ou A)
+    if 'Règlement' not in colonnes_absentes:
+        codes, reglements = pd.factorize(df_source['Règlement'], use_na_sentinel=False)
+        vides = np.array([reglement is None or reglement != reglement or not str(reglement).strip() for reglement in reglements], dtype=bool)
+        # Même lecture que construire_lignes_balance : première lettre, sans conversion de casse
+        inconnus = np.array([str(reglement)[:1] not in CODES_REGLEMENT for reglement in reglements], dtype=bool) & ~vides
+        signaler(vides[codes], 'Règlement', "Code règlement manquant", ERREUR)
+        signaler(inconnus[codes], 'Règlement', "Code règlement inconnu (attendu : C..., V... ou A...)", ERREUR)
+
+    # Montants
+    if 'Montant T.T.C.' not in colonnes_absentes:
+        manquants = df_source['Montant T.T.C.'].isna().to_numpy()
+        montants = pd.to_numeric(df_source['Montant T.T.C.'], errors='coerce')
+        signaler(manquants, 'Montant T.T.C.', "Montant manquant", ERREUR)
+        signaler(montants.isna().to_numpy() & ~manquants, 'Montant T.T.C.', "Montant non numérique", ERREUR)
+
+    # N° de facture
+    if 'N°Fact.' not in colonnes_absentes:
+        numeros = df_source['N°Fact.']
+        manquants = numeros.isna().to_numpy()
+        doublons = numeros.duplicated(keep=False).to_numpy() & ~manquants
+        if factures_vues is not None:
+            doublons[~manquants] |= factures_vues.marquer(numeros[~manquants])
+        signaler(manquants, 'N°Fact.', "N° de facture manquant", ERREUR)
+        signaler(doublons, 'N°Fact.', "N° de facture en double", AVERTISSEMENT)
+
+    # Clients
+    if 'Client' not in colonnes_absentes:
+        manquants = df_source['Client'].isna().to_numpy()
+        signaler(manquants, 'Client', "Client manquant", AVERTISSEMENT)
+        if index_clients is not None:
+            codes, clients = pd.factorize(df_source['Client'])
+            positions = index_clients.index.get_indexer(np.asarray(clients, dtype=object))
+            inconnus = positions < 0
+            # Pays vide ou introuvable dans codes_pays.csv : client classé à l'étranger, code pays FR dans le Tiers
+            sans_pays = np.array([normaliser_pays(pays) == '' for pays in index_clients['Pays']], dtype=bool)
+            sans_code_pays = index_clients['Code pays'].isna().to_numpy() & ~sans_pays
+            signaler(np.append(inconnus, False)[codes], 'Client', "Client absent de la base clients", AVERTISSEMENT)
+            signaler(np.append(np.append(sans_pays, False)[positions], False)[codes], 'Client', "Pays du client non renseigné (client classé à l'étranger, code pays FR dans le fichier Tiers)", AVERTISSEMENT)
+            signaler(np.append(np.append(sans_code_pays, False)[positions], False)[codes], 'Client', "Pays du client introuvable dans codes_pays.csv (client classé à l'étranger, code pays FR dans le fichier Tiers)", AVERTISSEMENT)
+            # Pays résolus par rapprochement (fautes de frappe) : le pays retenu peut être le mauvais
+            _, rapproches = resoudre_pays(index_clients['Pays'], get_index_pays(), avec_rapprochements=True)
+            pays_rapproches = np.append(np.where(rapproches, [f"{pays} → {code}" for pays, code in zip(index_clients['Pays'], index_clients['Code pays'])], ''), '')[positions]
+            for rapprochement in pd.unique(pays_rapproches[pays_rapproches != '']):
+                signaler((pays_rapproches == rapprochement)[codes], 'Client', f"Pays du client rapproché par approximation ({rapprochement}) : à vérifier, ou ajouter le nom dans codes_pays.csv", AVERTISSEMENT)
+            if 'Cédant' in index_clients.columns:
+                cedants = get_cedants()
+                cedant_inconnu = np.array([str(cedant).strip() not in cedants and bool(str(cedant).strip()) for cedant in index_clients['Cédant']], dtype=bool)
+                signaler(np.append(np.append(cedant_inconnu, False)[positions], False)[codes], 'Client', "Cédant du client absent de cedants.csv", ERREUR)
+            if COLONNE_CONFLITS in index_clients.columns:
+                # Codes distincts de clients_siret.csv confondus par la normalisation ('012050' et '12050')
+                conflits = np.append(index_clients[COLONNE_CONFLITS].to_numpy(dtype=object), '')[positions]
+                for codes_en_conflit in pd.unique(conflits[conflits != '']):
+                    signaler((conflits == codes_en_conflit)[codes], 'Client', f"Code client ambigu : plusieurs clients de clients_siret.csv ({codes_en_conflit})", ERREUR)
+
+    if not anomalies:
+        return pd.DataFrame(columns=COLONNES_ANOMALIES)
+
+    return pd.concat(anomalies, ignore_index=True).sort_values(['Fichier', 'Feuille', 'Ligne'], kind='stable', na_position='first', ignore_index=True)
+
+
+def resumer_anomalies(df_anomalies, exemples=5):
+    """
+    Résume les anomalies par type, avec les premières lignes concernées.
+
+    Args:
+        df_anomalies (DataFrame): Anomalies retournées par controler_journal.
+        exemples (int): Nombre de lignes citées par type d'anomalie.
+
+    Returns:
+        str: Résumé (une ligne par type d'anomalie).
+    """
+    resume = []
+    for (colonne, anomalie, gravite), groupe in df_anomalies.groupby(['Colonne', 'Anomalie', 'Gravité'], sort=False):
+        lignes = [
+            f"{ligne['Fichier']} (feuille {ligne['Feuille']}) l.{ligne['Ligne']}" if ligne['Fichier'] else f"l.{ligne['Ligne']}"
+            for _, ligne in groupe.head(exemples).iterrows()
+            if ligne['Ligne'] is not None and ligne['Ligne'] == ligne['Ligne']
+        ]
+        suite = ', ...' if len(groupe) > exemples else ''
+        detail = f" ({', '.join(lignes)}{suite})" if lignes else ''
+        resume.append(f"- {anomalie} [{colonne}] : {len(groupe)}{detail}")
+
+    return '\n'.join(resume)
+
+
+def ecrire_anomalies(df_anomalies, dossier_destination, chemin_fichier):
+    """
+    Écrit le rapport détaillé des anomalies (CSV ';', UTF-8 avec BOM, lisible par Excel)
+    dans le dossier d'export.
+
+    Args:
+        df_anomalies (DataFrame): Anomalies retournées par controler_journal.
+        dossier_destination (str): Dossier des fichiers exportés.
+        chemin_fichier (str): Journal contrôlé.
+
+    Returns:
+        str: Chemin du rapport écrit.
+    """
+    from datetime import datetime
+    from pathlib import Path
+
+    os.makedirs(dossier_destination, exist_ok=True)
+    chemin = os.path.join(dossier_destination, f"anomalies-{Path(chemin_fichier).stem}-{datetime.now().strftime('%H%M%S')}.csv")
+    df_anomalies.to_csv(chemin, sep=';', index=False, encoding='utf-8-sig')
+    return chemin
+
+
+def rapporter_anomalies(df_anomalies, dossier_destination=None, chemin_fichier=None):
+    """
+    Compte les anomalies par gravité, écrit le rapport détaillé et prépare le message affiché.
+
+    Args:
+        df_anomalies (DataFrame): Anomalies retournées par controler_journal.
+        dossier_destination (str): Dossier du rapport détaillé (optionnel : sans
+            dossier, seul le résumé est produit).
+        chemin_fichier (str): Journal contrôlé.
+
+    Returns:
+        dict: erreurs, avertissements (nombres), rapport (chemin ou None) et message.
+    """
+    erreurs = int((df_anomalies['Gravité'] == ERREUR).sum())
+    avertissements = len(df_anomalies) - erreurs
+    rapport = ecrire_anomalies(df_anomalies, dossier_destination, chemin_fichier) if dossier_destination and len(df_anomalies) else None
+
+    if erreurs:
+        message = f"Le journal contient {erreurs} erreur(s), aucun fichier n'a été généré :\n"
+        message += resumer_anomalies(df_anomalies[df_anomalies['Gravité'] == ERREUR])
+    else:
+        message = f"Le journal contient {avertissements} avertissement(s) :\n"
+        message += resumer_anomalies(df_anomalies)
+    if rapport:
+        message += f"\nRapport détaillé : {rapport}"
+
+    return {'erreurs': erreurs, 'avertissements': avertissements, 'rapport': rapport, 'message': message}